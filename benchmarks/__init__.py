@@ -0,0 +1 @@
+"""Benchmarks module, the scripts are run by hand and are not part of the test suite"""
@@ -0,0 +1,195 @@
+"""
+Load test of the api. The app is driven in process through httpx.AsyncClient by concurrent clients, each request is
+drawn from a mix of routes which resembles real traffic: pages of the following postings, read and unread marks,
+follow and unfollow of stored feeds and the user listing.
+
+The report holds the requests/sec and the p50/p95/p99 latency of every route. It is written to --output, and a
+previous report given as --baseline adds the change of every route, so a regression of feeds_router shows up:
+
+    python -m benchmarks.bench_api --users 200 --follows 20 --requests 5000 --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from sendcloud.apps.api_service import app
+from sendcloud.utils import settings
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, SeededDataset, latency_summary, reset_database, seed_dataset
+
+# the share of every route in the requests
+DEFAULT_MIX = {
+    "following_postings": 50,
+    "read": 15,
+    "unread": 10,
+    "follow": 7,
+    "unfollow": 7,
+    "users": 11,
+}
+
+Route = Callable[[httpx.AsyncClient, random.Random, int], Awaitable[httpx.Response]]
+
+
+def __routes(dataset: SeededDataset) -> Dict[str, Route]:
+    """
+    The requests of every route, the follows of the dataset are kept up to date by follow and unfollow
+    :param dataset: the seeded dataset
+    :return: the request functions by route
+    """
+    feed_pks = list(dataset.feed_links)
+
+    def posting_of(rng: random.Random, user_pk: int) -> str:
+        feed_pk = rng.choice(dataset.follows[user_pk] or feed_pks)
+        return rng.choice(dataset.posting_links[feed_pk])
+
+    async def following_postings(http: httpx.AsyncClient, rng: random.Random, user_pk: int) -> httpx.Response:
+        params = {"username": f"user_{user_pk}", "limit": 20, "offset": rng.choice([0, 0, 0, 20, 40])}
+        return await http.get("/v1.0/feeds/following/postings", params=params)
+
+    async def read(http: httpx.AsyncClient, rng: random.Random, user_pk: int) -> httpx.Response:
+        body = {"username": f"user_{user_pk}", "link": posting_of(rng, user_pk)}
+        return await http.patch("/v1.0/feeds/postings/read", json=body)
+
+    async def unread(http: httpx.AsyncClient, rng: random.Random, user_pk: int) -> httpx.Response:
+        body = {"username": f"user_{user_pk}", "link": posting_of(rng, user_pk)}
+        return await http.patch("/v1.0/feeds/postings/unread", json=body)
+
+    async def follow(http: httpx.AsyncClient, rng: random.Random, user_pk: int) -> httpx.Response:
+        feed_pk = rng.choice(feed_pks)
+        body = {"username": f"user_{user_pk}", "link": dataset.feed_links[feed_pk]}
+        response = await http.post("/v1.0/feeds/follow", json=body)
+        if response.status_code == 200 and feed_pk not in dataset.follows[user_pk]:
+            dataset.follows[user_pk].append(feed_pk)
+        return response
+
+    async def unfollow(http: httpx.AsyncClient, rng: random.Random, user_pk: int) -> httpx.Response:
+        feed_pk = rng.choice(dataset.follows[user_pk] or feed_pks)
+        body = {"username": f"user_{user_pk}", "link": dataset.feed_links[feed_pk]}
+        response = await http.request("DELETE", "/v1.0/feeds/unfollow", json=body)
+        if response.status_code == 200 and feed_pk in dataset.follows[user_pk]:
+            dataset.follows[user_pk].remove(feed_pk)
+        return response
+
+    async def users(http: httpx.AsyncClient, rng: random.Random, _: int) -> httpx.Response:
+        return await http.get("/v1.0/users/", params={"offset": rng.choice([0, 0, 100]), "limit": 100})
+
+    return {
+        "following_postings": following_postings,
+        "read": read,
+        "unread": unread,
+        "follow": follow,
+        "unfollow": unfollow,
+        "users": users,
+    }
+
+
+def __compare(report: Dict, baseline: Dict) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    The change of every route against a previous report in percent, positive is slower for the latencies and faster
+    for the requests/sec
+    :param report: the current report
+    :param baseline: the previous report
+    :return: the changes by route
+    """
+    changes = {}
+    for route, current in report["routes"].items():
+        if (previous := baseline.get("routes", {}).get(route)) is None:
+            continue
+        changes[route] = {
+            key: round((current[key] - previous[key]) / previous[key] * 100, 1) if previous[key] else None
+            for key in ["requests_per_second", "p50_ms", "p95_ms", "p99_ms"]
+        }
+    return changes
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and sends the requests
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    settings.database_url = args.database_url
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    dataset = await seed_dataset(engine, args)
+    routes = __routes(dataset)
+    names = list(mix)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    remaining = iter(range(args.requests))
+
+    async def client(http: httpx.AsyncClient, rng: random.Random) -> None:
+        for _ in remaining:
+            name = rng.choices(names, [mix[name] for name in names])[0]
+            started = time.perf_counter()
+            response = await routes[name](http, rng, rng.randint(1, args.users))
+            latencies[name].append(time.perf_counter() - started)
+            statuses[name][response.status_code] += 1
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[client(http, random.Random(args.seed + index)) for index in range(args.clients)])
+        elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    report: Dict[str, Any] = {
+        "database": engine.dialect.name,
+        "dataset": {
+            "users": args.users,
+            "feeds": args.feeds,
+            "follows": args.follows,
+            "postings_per_feed": args.postings,
+            "read_ratio": args.read_ratio,
+        },
+        "clients": args.clients,
+        "requests": args.requests,
+        "requests_per_second": round(args.requests / elapsed, 1),
+        "routes": {
+            name: {
+                "requests_per_second": round(len(latencies[name]) / elapsed, 1),
+                **latency_summary(latencies[name]),
+                "statuses": dict(statuses[name]),
+            }
+            for name in names
+            if latencies[name]
+        },
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            report["baseline_change_percent"] = __compare(report, json.load(baseline))
+    return report
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--feeds", type=int, default=100)
+    parser.add_argument("--follows", type=int, default=20, help="feeds followed by every user")
+    parser.add_argument("--postings", type=int, default=200, help="postings per feed")
+    parser.add_argument("--read-ratio", type=float, default=0.3, help="share of the followed postings read by a user")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--mix", help=f"weights of the routes as JSON, {json.dumps(DEFAULT_MIX)} by default")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="writes the report to this JSON file")
+    parser.add_argument("--baseline", help="a previous report to compare with")
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Latency of concurrent api reads of the posting list during a scheduler cycle, with the default SQLite setup and with
+the embedded mode of settings.sqlite_embedded.
+
+The cycle runs in a process of its own like the scheduler service, every feed is refreshed by a task of its own and
+the refreshed postings come from memory instead of the network. Meanwhile the clients keep reading
+GET /v1.0/feeds/following/postings through the ASGI app of this process until the cycle is over. SQLite only.
+
+    python -m benchmarks.bench_embedded --feeds 50 --postings 200 --clients 20
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from sendcloud.apps.api_service import app
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import get_session, settings
+from sendcloud.utils.db_manager import get_db_engine, get_embedded_engine
+from .common import BENCHMARK_DATABASE_URL, latency_summary, reset_database, seed_followed_postings
+
+# the scheduler process starts afresh instead of inheriting the engines and the event loop of the benchmark
+SPAWN = multiprocessing.get_context("spawn")
+
+
+async def __refresh_feed(feed_pk: int, args: argparse.Namespace) -> bool:
+    """
+    Stores a refresh of a feed like a task of the scheduler
+    :param feed_pk: the feed of the seeded postings
+    :param args: command line arguments
+    :return: True if the refresh has been stored
+    """
+    feed = FeedItemCreate(
+        link=f"https://feeds.example.com/{feed_pk}.rss",
+        title=f"feed {feed_pk}",
+        lang="en",
+        copyright_text="-",
+        description="-",
+        category="-",
+    )
+    postings = [
+        PostingItemCreate(
+            link=f"https://feeds.example.com/{feed_pk}/{index}",
+            title=f"posting {index} refreshed",
+            author="benchmark",
+            published_at=datetime(2023, 1, 1) + timedelta(minutes=index),
+            description="benchmark posting " * 20,
+        )
+        for index in range(args.postings)
+    ]
+    try:
+        async with get_session() as session:
+            await feed_services.insert_or_update_feed(feed, postings, session)
+        return True
+    except SQLAlchemyError:
+        return False
+
+
+async def __refresh_feeds(args: argparse.Namespace) -> Tuple[float, int]:
+    """
+    Refreshes all the feeds at the same time
+    :param args: command line arguments
+    :return: the seconds of the cycle and the failed refreshes
+    """
+    started = time.perf_counter()
+    refreshed = await asyncio.gather(*[__refresh_feed(feed_pk, args) for feed_pk in range(1, args.feeds + 1)])
+    return time.perf_counter() - started, refreshed.count(False)
+
+
+def scheduler_cycle(args: argparse.Namespace, embedded: bool, results: multiprocessing.Queue) -> None:
+    """
+    Entry point of the scheduler process
+    :param args: command line arguments
+    :param embedded: whether the embedded mode is used
+    :param results: receives the seconds of the cycle and the failed refreshes
+    :return: None
+    """
+    settings.database_url, settings.sqlite_embedded = args.database_url, embedded
+    results.put(asyncio.run(__refresh_feeds(args)))
+
+
+async def __seed_database(args: argparse.Namespace, embedded: bool) -> AsyncEngine:
+    """
+    Recreates the benchmark database in the journal mode of the setup and seeds the followed postings
+    :param args: command line arguments
+    :param embedded: whether the embedded mode is used
+    :return: the benchmark database engine
+    """
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    async with engine.connect() as conn:
+        await conn.execute(text(f"PRAGMA journal_mode={'WAL' if embedded else 'DELETE'}"))
+    await seed_followed_postings(engine, args.clients, args.feeds, args.postings)
+    return engine
+
+
+async def __cycle(args: argparse.Namespace, embedded: bool) -> Dict:
+    """
+    Runs one scheduler cycle while the clients read
+    :param args: command line arguments
+    :param embedded: whether the embedded mode is used
+    :return: the report of the cycle
+    """
+    settings.sqlite_embedded = embedded
+    engine = await __seed_database(args, embedded)
+
+    latencies: List[float] = []
+    read_errors = 0
+    cycle_over = asyncio.Event()
+
+    async def client(http: httpx.AsyncClient, username: str) -> None:
+        nonlocal read_errors
+        while not cycle_over.is_set():
+            started = time.perf_counter()
+            try:
+                response = await http.get("/v1.0/feeds/following/postings", params={"username": username, "limit": 20})
+                read_errors += response.status_code != 200
+            except SQLAlchemyError:
+                read_errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    results = SPAWN.Queue()
+    scheduler = SPAWN.Process(target=scheduler_cycle, args=(args, embedded, results))
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as http:
+        clients = [asyncio.create_task(client(http, f"user_{user_pk}")) for user_pk in range(1, args.clients + 1)]
+        started = time.perf_counter()
+        scheduler.start()
+        cycle_seconds, refresh_errors = await asyncio.get_running_loop().run_in_executor(None, results.get)
+        elapsed = time.perf_counter() - started
+        cycle_over.set()
+        await asyncio.gather(*clients)
+    scheduler.join()
+
+    await engine.dispose()
+    if embedded:
+        await get_embedded_engine(args.database_url, readers=True).dispose()
+    return {
+        "cycle_seconds": round(cycle_seconds, 2),
+        "refresh_errors": refresh_errors,
+        "reads_per_second": round(len(latencies) / elapsed, 1),
+        "read_errors": read_errors,
+        "reads": latency_summary(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Benchmarks the scheduler cycle with the default setup and with the embedded mode
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    if not args.database_url.startswith("sqlite"):
+        raise SystemExit("the embedded mode benchmark needs a SQLite --database-url")
+    settings.database_url = args.database_url
+    return {
+        "feeds": args.feeds,
+        "postings_per_feed": args.postings,
+        "clients": args.clients,
+        "default": await __cycle(args, False),
+        "embedded": await __cycle(args, True),
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, default=50)
+    parser.add_argument("--postings", type=int, default=200, help="postings per feed")
+    parser.add_argument("--clients", type=int, default=20, help="users which read at the same time")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
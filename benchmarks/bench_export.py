@@ -0,0 +1,104 @@
+"""
+Memory and throughput of the NDJSON export of GET /v1.0/feeds/following/postings/export.
+
+The export is consumed through the ASGI app while tracemalloc tracks the python allocations, the peak should stay
+the same whatever the number of postings is, only --batch-size changes it.
+
+    python -m benchmarks.bench_export --feeds 50 --postings 10000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from sendcloud.apps.api_service import app
+from sendcloud.utils import get_session_injector, settings
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, reset_database, seed_followed_postings
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and consumes one export
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    await seed_followed_postings(engine, 1, args.feeds, args.postings)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def shared_session() -> Any:
+        yield sessionmaker()
+
+    app.dependency_overrides[get_session_injector] = shared_session
+    settings.export_batch_size = args.batch_size
+
+    # the app is called directly, httpx.ASGITransport would buffer the whole response body
+    counted = {"lines": 0, "bytes": 0}
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/v1.0/feeds/following/postings/export",
+        "raw_path": b"/v1.0/feeds/following/postings/export",
+        "query_string": b"username=user_1",
+        "headers": [],
+        "server": ("bench", 80),
+        "client": ("bench", 1234),
+        "root_path": "",
+    }
+
+    requested, finished = asyncio.Event(), asyncio.Event()
+
+    async def receive() -> Dict:
+        if not requested.is_set():
+            requested.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict) -> None:
+        if message["type"] == "http.response.body":
+            counted["lines"] += message.get("body", b"").count(b"\n")
+            counted["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return {
+        "database": engine.dialect.name,
+        "postings": counted["lines"],
+        "batch_size": args.batch_size,
+        "postings_per_second": round(counted["lines"] / elapsed, 1),
+        "megabytes": round(counted["bytes"] / 2**20, 2),
+        "peak_traced_megabytes": round(peak / 2**20, 2),
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, default=10)
+    parser.add_argument("--postings", type=int, default=10000, help="postings per feed")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Peak memory of fetch_feed on growing RSS feeds served by the stub feed server, measured with tracemalloc: the whole body
+parsed by feedparser as the loader used to, compared with the body streamed through the fast path without caps, where
+only the kept postings grow, and with the default settings.feed_max_bytes and a settings.feed_max_entries of 1000.
+The stub runs in a process of its own, so only the memory of the client is measured. feedparser takes minutes on the
+largest feed under tracemalloc.
+
+    python -m benchmarks.bench_feed_stream --entries 1000 10000 50000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Dict
+from unittest.mock import patch
+
+import aiohttp
+
+from sendcloud.utils import fetch_feed, settings
+from .feed_stub import StubConfig, start_stub
+
+MODES = {
+    "feedparser": {
+        "feed_streaming": False,
+        "fast_feed_parser": False,
+        "feed_max_bytes": 2**40,
+        "feed_max_entries": None,
+    },
+    "streamed_uncapped": {
+        "feed_streaming": True,
+        "fast_feed_parser": True,
+        "feed_max_bytes": 2**40,
+        "feed_max_entries": None,
+    },
+    "streamed": {"feed_streaming": True, "fast_feed_parser": True, "feed_max_entries": 1000},
+}
+
+
+async def __measure(url: str, mode: Dict) -> Dict:
+    """
+    Fetches a feed once in a mode
+    :param url: the url of the feed
+    :param mode: the settings of the mode
+    :return: the measures
+    """
+    async with aiohttp.ClientSession() as client:
+        with patch.multiple(settings, **mode):
+            tracemalloc.start()
+            started = time.perf_counter()
+            _, postings = await fetch_feed(url, client)
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {"postings": len(postings or []), "peak_bytes": peak, "seconds": round(seconds, 3)}
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Measures every size of feed in every mode
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    results = []
+    for entries in args.entries:
+        stub, base_url = start_stub(StubConfig(entries=entries, latency=0.0))
+        try:
+            result = {"entries": entries}
+            for name, mode in MODES.items():
+                result[name] = await __measure(f"{base_url}/feeds/ok/1.rss", mode)
+            results.append(result)
+        finally:
+            stub.terminate()
+    return {
+        "feed_max_bytes": settings.feed_max_bytes,
+        "feed_max_entries": MODES["streamed"]["feed_max_entries"],
+        "results": results,
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000])
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
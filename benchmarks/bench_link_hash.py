@@ -0,0 +1,120 @@
+"""
+Index size and lookup latency of the link hash of the postings compared with an index on the link itself.
+
+The postings are seeded with their link hash, then an index on (link, feed_id) is built next to the unique index of
+(link_hash, feed_id) so both can be measured on the same rows. Sizes come from pg_relation_size on Postgres and from
+the dbstat table on SQLite.
+
+    python -m benchmarks.bench_link_hash --feeds 100 --postings 2000 --lookups 5000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from sqlalchemy import select, and_, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from sendcloud.models import Posting
+from sendcloud.utils import link_hashes
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, latency_summary, reset_database, seed_followed_postings
+
+LINK_INDEX = "ix_bench_postings_link"
+
+
+async def __index_bytes(conn: AsyncConnection, columns: List[str]) -> int:
+    """
+    The size of the index of the postings on the given columns
+    :param conn: the benchmark database connection
+    :param columns: the indexed columns in order
+    :return: the size in bytes
+    """
+    if conn.dialect.name == "postgresql":
+        stmt = text(
+            "SELECT pg_relation_size(indexrelid) FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name"
+        )
+        name = LINK_INDEX if columns[0] == "link" else "postings_link_hash_key"
+        # a partitioned index has no storage of its own, its partitions are summed up
+        partitions = text(
+            "SELECT coalesce(sum(pg_relation_size(inhrelid)), 0) FROM pg_inherits "
+            "JOIN pg_class ON pg_class.oid = pg_inherits.inhparent WHERE pg_class.relname = :name"
+        )
+        return int((await conn.execute(stmt, {"name": name})).scalar() or 0) + int(
+            (await conn.execute(partitions, {"name": name})).scalar() or 0
+        )
+    for index in (await conn.execute(text("PRAGMA index_list('postings')"))).all():
+        indexed = [row[2] for row in (await conn.execute(text(f"PRAGMA index_info('{index[1]}')"))).all()]
+        if indexed == columns:
+            stmt = text("SELECT sum(pgsize) FROM dbstat WHERE name = :name")
+            return int((await conn.execute(stmt, {"name": index[1]})).scalar() or 0)
+    return 0
+
+
+async def __lookups(conn: AsyncConnection, links: List[str], by_hash: bool) -> Dict[str, float]:
+    """
+    Looks the postings up one after another
+    :param conn: the benchmark database connection
+    :param links: the links to look up
+    :param by_hash: through the link hash index or through the link index
+    :return: the latency summary
+    """
+    latencies = []
+    for link in links:
+        if by_hash:
+            stmt = select(Posting.pk).where(and_(Posting.link_hash.in_(link_hashes(link)), Posting.link == link))
+        else:
+            stmt = select(Posting.pk).where(Posting.link == link)
+        started = time.perf_counter()
+        (await conn.execute(stmt)).one()
+        latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and measures both indexes
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    links = await seed_followed_postings(engine, 1, args.feeds, args.postings)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE INDEX {LINK_INDEX} ON postings (link, feed_id)"))
+        await conn.execute(text("ANALYZE"))
+
+    sample = random.Random(args.seed).choices(links, k=args.lookups)
+    async with engine.connect() as conn:
+        report = {
+            "database": engine.dialect.name,
+            "postings": len(links),
+            "index_bytes": {
+                "link": await __index_bytes(conn, ["link", "feed_id"]),
+                "link_hash": await __index_bytes(conn, ["link_hash", "feed_id"]),
+            },
+            "lookup": {
+                "link": await __lookups(conn, sample, False),
+                "link_hash": await __lookups(conn, sample, True),
+            },
+        }
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, default=100)
+    parser.add_argument("--postings", type=int, default=2000, help="postings per feed")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Entries/sec of the fast feed parser compared with feedparser on the RSS and Atom documents of the stub feed server,
+at several numbers of entries per document. Both paths are checked to read the same fields before they are timed.
+
+    python -m benchmarks.bench_parser --entries 10 50 200 --seconds 2
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+import feedparser
+
+from sendcloud.utils import parse_fast
+from .feed_stub import StubConfig, render_atom, render_rss
+
+FORMATS = {"rss": render_rss, "atom": render_atom}
+
+
+def __rate(parse: Callable[[bytes], Dict], document: bytes, entries: int, seconds: float) -> float:
+    """
+    Parses a document over and over for the given time
+    :param parse: the parser
+    :param document: the document
+    :param entries: the entries of the document
+    :param seconds: how long to parse
+    :return: entries per second
+    """
+    parsed, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        parse(document)
+        parsed += entries
+    return parsed / elapsed
+
+
+def __parse_with_feedparser(document: bytes) -> Dict:
+    """
+    Parses a document the way the loader did before the fast path
+    :param document: the document
+    :return: the parsed document
+    """
+    return feedparser.parse(document.decode())
+
+
+def __fields(parsed: Dict) -> list:
+    """
+    The fields of the entries which the loader keeps
+    :param parsed: a parsed document
+    :return: the fields
+    """
+    keys = ["link", "title", "summary", "published_parsed", "author"]
+    return [[entry.get(key, "-") for key in keys] for entry in parsed["entries"]]
+
+
+def run(args: argparse.Namespace) -> Dict:
+    """
+    Measures every format and number of entries
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    results = []
+    for name, render in FORMATS.items():
+        for entries in args.entries:
+            document = render(1, 0, StubConfig(entries=entries), "https://example.com").encode()
+            assert __fields(parse_fast(document)) == __fields(__parse_with_feedparser(document))
+            fast_rate = __rate(parse_fast, document, entries, args.seconds)
+            feedparser_rate = __rate(__parse_with_feedparser, document, entries, args.seconds)
+            results.append(
+                {
+                    "format": name,
+                    "entries": entries,
+                    "bytes": len(document),
+                    "fast_entries_per_sec": round(fast_rate),
+                    "feedparser_entries_per_sec": round(feedparser_rate),
+                    "speedup": round(fast_rate / feedparser_rate, 1),
+                }
+            )
+    return {"results": results}
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on every measure")
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Latency of the hot postings queries before and after the postings are partitioned by hash of feed_id.
+
+The queries run against the plain table first, then the table is converted the way the migration does it and they run
+again. Postgres only, the other databases have no declarative partitioning.
+
+    python -m benchmarks.bench_partitions --database-url postgresql+asyncpg://... --feeds 200 --postings 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import Connection, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from sendcloud.models import Posting
+from sendcloud.schemas import OrderByLastUpdate
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import link_hash
+from sendcloud.utils.db_manager import get_db_engine
+from sendcloud.utils.partitions import create_postings_partitions, postings_partitions
+from .common import BENCHMARK_DATABASE_URL, latency_summary, reset_database, seed_followed_postings
+
+
+def __partition_postings(connection: Connection, modulus: int) -> None:
+    """
+    Moves the postings into a table partitioned by hash of feed_id with the statements of the partitioning migration,
+    the link key is the hash of the link of the current schema
+    :param connection: a connection to Postgres
+    :param modulus: number of partitions
+    :return: None
+    """
+    for statement in [
+        "ALTER TABLE read_postings DROP CONSTRAINT IF EXISTS read_postings_posting_pk_fkey",
+        "ALTER SEQUENCE postings_pk_seq OWNED BY NONE",
+        "CREATE TABLE postings_partitioned (LIKE postings INCLUDING DEFAULTS) PARTITION BY HASH (feed_id)",
+        "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_pkey PRIMARY KEY (pk, feed_id)",
+        "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_link_hash_key "
+        "UNIQUE (link_hash, feed_id)",
+        "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_feed_id_fkey "
+        "FOREIGN KEY (feed_id) REFERENCES feeds (pk)",
+    ]:
+        connection.execute(text(statement))
+    create_postings_partitions(connection, modulus, "postings_partitioned")
+    for statement in [
+        "INSERT INTO postings_partitioned SELECT * FROM postings",
+        "DROP TABLE postings",
+        "ALTER TABLE postings_partitioned RENAME TO postings",
+        "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_pkey TO postings_pkey",
+        "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_link_hash_key TO postings_link_hash_key",
+        "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_feed_id_fkey TO postings_feed_id_fkey",
+        "CREATE INDEX ix_postings_pk ON postings (pk)",
+        "CREATE INDEX ix_postings_feed_id_published_at ON postings (feed_id, published_at)",
+        "ALTER SEQUENCE postings_pk_seq OWNED BY postings.pk",
+        "ANALYZE postings",
+    ]:
+        connection.execute(text(statement))
+
+
+async def __measure(call: Callable[[], Awaitable], rounds: int) -> Dict[str, float]:
+    """
+    Runs a query many times one after another
+    :param call: runs the query once
+    :param rounds: number of runs
+    :return: the latency summary
+    """
+    latencies: List[float] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies)
+
+
+async def __hot_queries(engine: AsyncEngine, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the queries of the posting list, the scan of one feed, the upsert of a feed refresh and the selection of
+    the retention
+    :param engine: the benchmark database engine
+    :param args: command line arguments
+    :return: the latency summaries by query
+    """
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    feed_pk = args.feeds // 2 or 1
+    refreshed = [
+        {
+            "link": f"https://feeds.example.com/{feed_pk}/{index}",
+            "link_hash": link_hash(f"https://feeds.example.com/{feed_pk}/{index}"),
+            "title": f"posting {index} refreshed",
+            "description": "benchmark posting " * 20,
+            "author": "benchmark",
+            "published_at": datetime(2023, 1, 1) + timedelta(minutes=index),
+            "feed_id": feed_pk,
+        }
+        for index in range(100)
+    ]
+    upsert = insert(Posting).values(refreshed)
+    upsert = upsert.on_conflict_do_update(
+        constraint="postings_link_hash_key",
+        set_={column: upsert.excluded[column] for column in refreshed[0]},
+        where=Posting.link == upsert.excluded.link,
+    )
+    feed_scan = select(Posting.pk, Posting.title).where(Posting.feed_id == feed_pk)
+    feed_scan = feed_scan.order_by(Posting.published_at.desc()).limit(100)
+    retention = select(Posting.pk).where(Posting.feed_id == feed_pk, Posting.published_at < datetime(2023, 1, 2))
+    retention = retention.order_by(Posting.pk).limit(500)
+
+    async with sessionmaker() as session:
+
+        async def following_postings() -> None:
+            await feed_services.filter_following_feed_postings(
+                "user_1", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session, 0, 100
+            )
+
+        async def refresh_upsert() -> None:
+            await session.execute(upsert)
+            await session.commit()
+
+        return {
+            "following_postings": await __measure(following_postings, args.rounds),
+            "feed_scan": await __measure(lambda: session.execute(feed_scan), args.rounds),
+            "refresh_upsert": await __measure(refresh_upsert, args.rounds),
+            "retention_select": await __measure(lambda: session.execute(retention), args.rounds),
+        }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and benchmarks the hot queries before and after the partitioning
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    engine = get_db_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("the partitioning benchmark needs a Postgres --database-url")
+    await reset_database(engine)
+    await seed_followed_postings(engine, 1, args.feeds, args.postings)
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+    plain = await __hot_queries(engine, args)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(__partition_postings, args.partitions)
+    migration_seconds = time.perf_counter() - started
+    partitioned = await __hot_queries(engine, args)
+    async with engine.connect() as conn:
+        partitions = await conn.run_sync(postings_partitions)
+
+    await reset_database(engine)
+    await engine.dispose()
+    return {
+        "postings": args.feeds * args.postings,
+        "partitions": args.partitions,
+        "migration_seconds": round(migration_seconds, 2),
+        "largest_partition_rows": max(partitions.values(), default=0),
+        "plain": plain,
+        "partitioned": partitioned,
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, default=100)
+    parser.add_argument("--postings", type=int, default=2000, help="postings per feed")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=200, help="runs of every query")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
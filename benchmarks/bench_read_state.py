@@ -0,0 +1,91 @@
+"""
+Latency benchmark of make_posting_read / make_posting_unread with concurrent clients.
+
+Every client owns a session of a shared engine and alternates between marking a random followed posting read and
+unread, the latencies are reported per operation together with the statements sent per call.
+
+    python -m benchmarks.bench_read_state --database-url postgresql+asyncpg://... --clients 32 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, StatementCounter, latency_summary, reset_database, seed_followed_postings
+
+
+async def __client(
+    sessionmaker: async_sessionmaker, username: str, links: List[str], requests: int, latencies: Dict[str, List[float]]
+) -> None:
+    """
+    A client which alternates between read and unread calls
+    :param sessionmaker: session factory of the shared engine
+    :param username: the user of this client
+    :param links: the posting links to choose from
+    :param requests: number of calls
+    :param latencies: collected latencies per operation
+    :return: None
+    """
+    for index in range(requests):
+        link = random.choice(links)
+        operation = feed_services.make_posting_read if index % 2 == 0 else feed_services.make_posting_unread
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await operation(username, link, session)
+            latencies[operation.__name__].append(time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and runs the concurrent clients
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    links = await seed_followed_postings(engine, args.users, args.feeds, args.postings)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    counter = StatementCounter(engine)
+    latencies: Dict[str, List[float]] = {"make_posting_read": [], "make_posting_unread": []}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[
+            __client(sessionmaker, f"user_{client % args.users + 1}", links, args.requests, latencies)
+            for client in range(args.clients)
+        ]
+    )
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    calls = args.clients * args.requests
+    return {
+        "database": engine.dialect.name,
+        "clients": args.clients,
+        "calls": calls,
+        "calls_per_second": round(calls / elapsed, 1),
+        "statements_per_call": round(counter.count / calls, 2),
+        "latency": {operation: latency_summary(values) for operation, values in latencies.items()},
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="calls per client")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--feeds", type=int, default=20)
+    parser.add_argument("--postings", type=int, default=100, help="postings per feed")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
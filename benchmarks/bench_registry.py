@@ -0,0 +1,162 @@
+"""
+Memory of the schedulable feeds which the scheduler keeps between its cycles, measured with tracemalloc: the rows of
+all the active feeds as the scheduler used to load them every cycle, compared with the FeedRegistry which is synced page
+by page. The tasks of a cycle are measured as well, a Task with its unstarted coroutine for every due feed.
+
+    python -m benchmarks.bench_registry --feeds 100000 1000000 --hosts 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from sendcloud.models import Feed
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import FeedRegistry, ScheduledFeed, link_hash, settings
+from sendcloud.utils.db_manager import get_db_engine
+from sendcloud.utils.scheduler import Task
+from .common import BENCHMARK_DATABASE_URL, reset_database
+
+
+async def __seed_feeds(engine: Any, feeds: int, hosts: int) -> None:
+    """
+    Seeds active feeds which are spread over the hosts, none of them has been refreshed yet
+    :param engine: the benchmark database engine
+    :param feeds: number of feeds
+    :param hosts: number of distinct hosts
+    :return: None
+    """
+    await reset_database(engine)
+    for start in range(1, feeds + 1, 10000):
+        rows = []
+        for feed_pk in range(start, min(start + 10000, feeds + 1)):
+            link = f"https://feeds{feed_pk % hosts}.example.com/{feed_pk}.rss"
+            rows.append(
+                {
+                    "pk": feed_pk,
+                    "link": link,
+                    "link_hash": link_hash(link),
+                    "title": f"feed {feed_pk}",
+                    "lang": "en",
+                    "copyright_text": "-",
+                    "description": "-",
+                    "category": "-",
+                    "active": True,
+                }
+            )
+        async with engine.begin() as conn:
+            await conn.execute(insert(Feed), rows)
+
+
+def __close_tasks(tasks: List[Tuple[Task, Any]]) -> None:
+    """
+    Closes the coroutines of the measured tasks which are never run
+    :param tasks: the tasks and their coroutines
+    :return: None
+    """
+    for _, coroutine in tasks:
+        coroutine.close()
+
+
+async def __measure(load: Callable[[], Any], release: Callable[[Any], None] = lambda _: None) -> Tuple[Any, Dict]:
+    """
+    Measures the memory which is kept by the result of a load and the peak while it runs, the time is measured by a
+    run of its own since tracemalloc slows down every allocation
+    :param load: the coroutine function to be measured
+    :param release: releases the result of the untraced run
+    :return: the result and its measures
+    """
+    started = time.perf_counter()
+    untraced = await load()
+    seconds = time.perf_counter() - started
+    release(untraced)
+    del untraced
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = await load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"retained_bytes": current - before, "peak_bytes": peak - before, "seconds": round(seconds, 3)}
+
+
+async def __scale(engine: Any, feeds: int, args: argparse.Namespace) -> Dict:
+    """
+    Measures the rows, the registry and the tasks of one number of feeds
+    :param engine: the benchmark database engine
+    :param feeds: number of feeds
+    :param args: command line arguments
+    :return: the report of the scale
+    """
+    await __seed_feeds(engine, feeds, args.hosts)
+
+    async def load_rows() -> List:
+        async with AsyncSession(engine) as session:
+            stmt = select(Feed.pk, Feed.link, Feed.active).where(Feed.active == True)  # pylint: disable=C0121
+            return (await session.execute(stmt)).all()
+
+    async def load_registry() -> FeedRegistry:
+        registry, after_pk = FeedRegistry(), 0
+        async with AsyncSession(engine) as session:
+            while rows := await feed_services.get_schedulable_feeds(
+                after_pk, settings.feed_registry_sync_batch, session
+            ):
+                for feed_pk, link, _ in rows:
+                    registry.upsert(feed_pk, link, 0.0)
+                after_pk = rows[-1][0]
+        return registry
+
+    rows, rows_report = await __measure(load_rows)
+    registry, registry_report = await __measure(load_registry)
+
+    async def create_tasks() -> List:
+        tasks = [Task(ScheduledFeed(feed_pk, link)) for feed_pk, link, _ in rows]
+        return [(task, task.start()) for task in tasks]
+
+    tasks, tasks_report = await __measure(create_tasks, __close_tasks)
+    __close_tasks(tasks)
+    started = time.perf_counter()
+    due = registry.take_due(1.0, 2.0)
+    take_due_seconds = time.perf_counter() - started
+    assert len(due) == len(registry) == len(rows) == feeds
+
+    return {
+        "feeds": feeds,
+        "rows": {**rows_report, "bytes_per_feed": round(rows_report["retained_bytes"] / feeds, 1)},
+        "registry": {**registry_report, "bytes_per_feed": round(registry_report["retained_bytes"] / feeds, 1)},
+        "tasks": {**tasks_report, "bytes_per_feed": round(tasks_report["retained_bytes"] / feeds, 1)},
+        "take_due_seconds": round(take_due_seconds, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Measures every number of feeds
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    settings.database_url = args.database_url
+    engine = get_db_engine(args.database_url)
+    scales = [await __scale(engine, feeds, args) for feeds in args.feeds]
+    await engine.dispose()
+    return {"database": engine.dialect.name, "hosts": args.hosts, "scales": scales}
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--hosts", type=int, default=5000, help="distinct hosts of the feeds")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
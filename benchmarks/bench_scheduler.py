@@ -0,0 +1,220 @@
+"""
+End-to-end throughput of the scheduler: the real Scheduler and Task fetch synthetic feeds with fetch_feed from the
+stub server of benchmarks.feed_stub and store them with insert_or_update_feed in the local database.
+
+A share of the feeds is served with a fault, 503 errors, answers slower than settings.feed_fetch_timeout or oversized
+bodies. A cycle ends when every scheduled feed has been stored or deactivated, the retries of the failed feeds are not
+waited for. The failed feeds are deactivated by the scheduler, so the later cycles only refresh the healthy ones.
+
+    python -m benchmarks.bench_scheduler --feeds 200 --entries 50 --change-rate 0.2 --cycles 3 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from sqlalchemy import insert, select, func, update
+
+from sendcloud.models import Feed
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import fetch_feed, settings
+from sendcloud.utils import scheduler
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, StatementCounter, latency_summary, reset_database
+from .feed_stub import StubConfig, start_stub
+
+
+def __feed_links(args: argparse.Namespace, base_url: str) -> Dict[int, str]:
+    """
+    Assigns a fault and a format to every feed
+    :param args: command line arguments
+    :param base_url: the url of the stub server
+    :return: the links of the stub by feed pk
+    """
+    rng = random.Random(args.seed)
+    weights = [1 - args.error_rate - args.timeout_rate - args.oversized_rate, args.error_rate, args.timeout_rate]
+    faults = rng.choices(["ok", "error", "timeout", "oversized"], weights + [args.oversized_rate], k=args.feeds)
+    kinds = {"rss": ["rss"], "atom": ["atom"], "mixed": ["rss", "atom"]}[args.format]
+    return {
+        pk: f"{base_url}/feeds/{fault}/{pk}.{kinds[pk % len(kinds)]}"
+        for pk, fault in zip(range(1, args.feeds + 1), faults)
+    }
+
+
+class RefreshRecorder:
+    """
+    Times the refreshes of the scheduler from the start of the fetch to the stored feed or the deactivated one
+    """
+
+    def __init__(self, links: Dict[int, str]):
+        self.links = links
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.finished = 0
+        self.__started: Dict[str, float] = {}
+
+    async def fetch_feed(self, link: str, client: Optional[Any] = None) -> Any:
+        """fetch_feed which notes the start of a refresh"""
+        self.__started.setdefault(link, time.perf_counter())
+        return await fetch_feed(link, client)
+
+    def __finish(self, link: str, outcome: str) -> None:
+        self.latencies[outcome].append(time.perf_counter() - self.__started.pop(link))
+        self.outcomes[link.split("/")[-2]][outcome] += 1
+        self.finished += 1
+
+    def wrap_store(self, store: Any) -> Any:
+        """insert_or_update_feed which notes the end of a successful refresh"""
+
+        async def wrapper(feed: Any, *args: Any) -> Any:
+            result = await store(feed, *args)
+            self.__finish(feed.link, "stored")
+            return result
+
+        return wrapper
+
+    def wrap_deactivate(self, deactivate: Any) -> Any:
+        """deactivate_background_refresh which notes the end of a failed refresh"""
+
+        async def wrapper(feed_pk: int, *args: Any) -> Any:
+            result = await deactivate(feed_pk, *args)
+            self.__finish(self.links[feed_pk], "failed")
+            return result
+
+        return wrapper
+
+
+async def __cycle(recorder: RefreshRecorder, args: argparse.Namespace) -> Dict:
+    """
+    Runs one cycle of the scheduler
+    :param recorder: the recorder of the refreshes
+    :param args: command line arguments
+    :return: the report of the cycle
+    """
+    engine = get_db_engine(args.database_url)
+    async with engine.begin() as conn:
+        # the scheduler only takes the due feeds, so every cycle starts with feeds which have never been refreshed
+        await conn.execute(update(Feed).values(refreshed_at=None))
+        stmt = select(func.count()).select_from(Feed).where(Feed.active)  # pylint: disable=not-callable
+        scheduled = (await conn.execute(stmt)).scalar_one()
+    recorder.finished = 0
+
+    started = time.perf_counter()
+    runner = asyncio.create_task(scheduler.Scheduler(3600, asyncio.get_running_loop()).run())
+    while recorder.finished < scheduled and time.perf_counter() - started < args.deadline:
+        await asyncio.sleep(0.01)
+    seconds = time.perf_counter() - started
+    runner.cancel()
+    # the tasks which wait to retry a failed feed
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return {
+        "scheduled": scheduled,
+        "refreshed": recorder.finished,
+        "seconds": round(seconds, 2),
+        "feeds_per_second": round(recorder.finished / seconds, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the feeds of the stub and runs the cycles of the scheduler
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    settings.database_url = args.database_url
+    settings.feed_fetch_timeout = args.fetch_timeout
+    # the failed fetches are part of the benchmark, their errors are not
+    logging.getLogger("sendcloud").setLevel(logging.CRITICAL)
+    config = StubConfig(
+        entries=args.entries,
+        change_rate=args.change_rate,
+        latency=args.latency_ms / 1000,
+        hang_seconds=args.fetch_timeout * 4,
+        oversized_bytes=int(args.oversized_mb * 2**20),
+        seed=args.seed,
+    )
+    stub, base_url = start_stub(config)
+    links = __feed_links(args, base_url)
+
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(Feed),
+            [
+                {
+                    "pk": pk,
+                    "link": link,
+                    "title": f"feed {pk}",
+                    "lang": "en",
+                    "copyright_text": "-",
+                    "description": "-",
+                    "category": "-",
+                    "active": True,
+                }
+                for pk, link in links.items()
+            ],
+        )
+
+    recorder = RefreshRecorder(links)
+    statements = StatementCounter()
+    try:
+        with patch.object(scheduler, "fetch_feed", recorder.fetch_feed), patch.object(
+            feed_services, "insert_or_update_feed", recorder.wrap_store(feed_services.insert_or_update_feed)
+        ), patch.object(
+            feed_services,
+            "deactivate_background_refresh",
+            recorder.wrap_deactivate(feed_services.deactivate_background_refresh),
+        ):
+            cycles = [await __cycle(recorder, args) for _ in range(args.cycles)]
+    finally:
+        stub.terminate()
+
+    refreshes = sum(cycle["refreshed"] for cycle in cycles)
+    seconds = sum(cycle["seconds"] for cycle in cycles)
+    await engine.dispose()
+    return {
+        "database": engine.dialect.name,
+        "feeds": args.feeds,
+        "entries": args.entries,
+        "change_rate": args.change_rate,
+        "feeds_per_second": round(refreshes / seconds, 1) if seconds else 0.0,
+        "statements_per_feed": round(statements.count / refreshes, 1) if refreshes else 0.0,
+        "peak_rss_megabytes": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "cycles": cycles,
+        "refresh_latency": {outcome: latency_summary(values) for outcome, values in recorder.latencies.items()},
+        "outcomes_by_fault": {fault: dict(outcomes) for fault, outcomes in sorted(recorder.outcomes.items())},
+    }
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--feeds", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=50, help="entries per feed")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="share of new entries per fetch")
+    parser.add_argument("--format", choices=["rss", "atom", "mixed"], default="mixed")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20, help="mean latency of the stub")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of feeds answering 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.02, help="share of feeds answering too late")
+    parser.add_argument("--oversized-rate", type=float, default=0.01, help="share of feeds with oversized bodies")
+    parser.add_argument("--oversized-mb", type=float, default=5)
+    parser.add_argument("--fetch-timeout", type=float, default=10, help="settings.feed_fetch_timeout in seconds")
+    parser.add_argument("--deadline", type=float, default=300, help="longest cycle in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
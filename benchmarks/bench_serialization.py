@@ -0,0 +1,159 @@
+"""
+Requests per second per core of GET /v1.0/feeds/following/postings.
+
+The orjson path of the router is compared with the previous one, where the ORM postings were validated through the
+FollowingFeedPostings response model before encoding, and with the lean list view of --fields. All of them are
+measured end to end through the ASGI app in a single process, so the requests are divided by the consumed CPU
+seconds, and the encoding step alone is measured per page.
+
+    python -m benchmarks.bench_serialization --requests 2000 --limit 100
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import orjson
+from fastapi import Depends, FastAPI
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session, async_sessionmaker
+
+from sendcloud.apps.api_service import app
+from sendcloud.models import Posting, user_feed
+from sendcloud.schemas import FollowingFeedPostings, OrderByLastUpdate
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import get_session_injector
+from sendcloud.utils.db_manager import get_db_engine
+from .common import BENCHMARK_DATABASE_URL, latency_summary, reset_database, seed_followed_postings
+
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/v1.0/feeds/following/postings", response_model=FollowingFeedPostings)
+async def legacy_following_postings(
+    username: str, limit: int = 10, session: async_scoped_session = Depends(get_session_injector)
+) -> Dict[str, Any]:
+    """
+    The previous response path, ORM objects validated by the response model
+    :param username: the user
+    :param limit: page size
+    :param session: database session which is being injected by fastapi
+    :return: the postings
+    """
+    stmt = (
+        select(Posting)
+        .join(user_feed, user_feed.c.feed_pk == Posting.feed_id)
+        .where(user_feed.c.user_pk == int(username.split("_")[1]))
+        .order_by(Posting.updated_at.desc())
+        .limit(limit)
+    )
+    return {"postings": (await session.scalars(stmt)).all()}
+
+
+async def __serve(target: FastAPI, username: str, args: argparse.Namespace, fields: Optional[str] = None) -> Dict:
+    """
+    Sends the requests one after another to an app
+    :param target: the ASGI app
+    :param username: the user whose postings are requested
+    :param args: command line arguments
+    :param fields: the fields parameter of the requests
+    :return: throughput and latencies
+    """
+    latencies = []
+    params = {"username": username, "limit": args.limit, **({"fields": fields} if fields else {})}
+    async with httpx.AsyncClient(app=target, base_url="http://bench") as client:
+        for _ in range(args.warmup):
+            (await client.get("/v1.0/feeds/following/postings", params=params)).raise_for_status()
+        cpu_started, started = time.process_time(), time.perf_counter()
+        for _ in range(args.requests):
+            request_started = time.perf_counter()
+            response = await client.get("/v1.0/feeds/following/postings", params=params)
+            latencies.append(time.perf_counter() - request_started)
+            response.raise_for_status()
+        cpu_elapsed, elapsed = time.process_time() - cpu_started, time.perf_counter() - started
+    return {
+        "requests_per_second": round(args.requests / elapsed, 1),
+        "requests_per_cpu_second": round(args.requests / cpu_elapsed, 1),
+        "response_bytes": len(response.content),
+        "latency": latency_summary(latencies),
+    }
+
+
+def __encodes_per_second(encode: Callable[[], bytes], rounds: int) -> float:
+    """
+    Measures how many times a page can be encoded per CPU second
+    :param encode: encodes one page
+    :param rounds: number of encodings
+    :return: pages per CPU second
+    """
+    started = time.process_time()
+    for _ in range(rounds):
+        encode()
+    return round(rounds / (time.process_time() - started), 1)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """
+    Seeds the database and benchmarks both response paths
+    :param args: command line arguments
+    :return: the benchmark report
+    """
+    engine = get_db_engine(args.database_url)
+    await reset_database(engine)
+    await seed_followed_postings(engine, 1, args.feeds, args.postings)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def shared_session() -> Any:
+        async with sessionmaker() as session:
+            yield session
+
+    # a shared engine, so the connection setup is not part of the measurement
+    app.dependency_overrides[get_session_injector] = shared_session
+    legacy_app.dependency_overrides[get_session_injector] = shared_session
+
+    async with sessionmaker() as session:
+        orm_postings = (await session.scalars(select(Posting).limit(args.limit))).all()
+        rows = await feed_services.filter_following_feed_postings(
+            "user_1", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session, 0, args.limit
+        )
+
+    report = {
+        "database": engine.dialect.name,
+        "page_size": args.limit,
+        "encode_pages_per_cpu_second": {
+            "pydantic": __encodes_per_second(
+                lambda: json.dumps(jsonable_encoder(FollowingFeedPostings(postings=orm_postings))).encode(),
+                args.requests,
+            ),
+            "orjson": __encodes_per_second(
+                lambda: orjson.dumps({"postings": [row._asdict() for row in rows]}), args.requests
+            ),
+        },
+        "pydantic": await __serve(legacy_app, "user_1", args),
+        "orjson": await __serve(app, "user_1", args),
+        "orjson_fields": await __serve(app, "user_1", args, args.fields),
+    }
+    app.dependency_overrides.clear()
+    legacy_app.dependency_overrides.clear()
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per response path")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100, help="postings per page")
+    parser.add_argument("--feeds", type=int, default=10)
+    parser.add_argument("--postings", type=int, default=100, help="postings per feed")
+    parser.add_argument("--fields", default="title,link,published_at,updated_at", help="fields of the lean list view")
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
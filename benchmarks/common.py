@@ -0,0 +1,202 @@
+"""
+Shared helpers for the benchmark scripts. Every benchmark runs against a throwaway database which gets dropped and
+recreated, so never point them to a database with real data
+"""
+import argparse
+import math
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import Engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from sendcloud.utils import Base
+from sendcloud.models import Feed, Posting, User, user_feed, read_postings
+
+BENCHMARK_DATABASE_URL = os.environ.get("BENCHMARK_DATABASE_URL", "sqlite+aiosqlite:///benchmark.db")
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """
+    Nearest-rank percentile
+    :param values: the measured values
+    :param percent: the percentile between 0 and 100
+    :return: the percentile value or 0 for no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies: Sequence[float]) -> Dict[str, float]:
+    """
+    Summarizes latencies given in seconds as milliseconds
+    :param latencies: the measured latencies
+    :return: count and p50/p95/p99/max in milliseconds
+    """
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+# the counter is only read, the engine events update it
+class StatementCounter:  # pylint: disable=too-few-public-methods
+    """
+    Counts the statements which are sent to the database by an engine, or by all the engines when none is given
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine] = None):
+        self.count = 0
+        event.listen(engine.sync_engine if engine is not None else Engine, "before_cursor_execute", self.__on_execute)
+
+    def __on_execute(self, *_: Any) -> None:
+        self.count += 1
+
+
+async def reset_database(engine: AsyncEngine) -> None:
+    """
+    Drops and creates all the tables
+    :param engine: the benchmark database engine
+    :return: None
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_followed_postings(engine: AsyncEngine, users: int, feeds: int, postings_per_feed: int) -> List[str]:
+    """
+    Seeds users which follow all the feeds, each feed has the same number of postings
+    :param engine: the benchmark database engine
+    :param users: number of users, named user_1 ... user_N
+    :param feeds: number of feeds
+    :param postings_per_feed: number of postings of each feed
+    :return: all the posting links
+    """
+    feed_rows = [
+        {
+            "pk": feed_pk,
+            "link": f"https://feeds.example.com/{feed_pk}.rss",
+            "title": f"feed {feed_pk}",
+            "lang": "en",
+            "copyright_text": "-",
+            "description": "-",
+            "category": "-",
+            "active": True,
+        }
+        for feed_pk in range(1, feeds + 1)
+    ]
+    posting_rows = [
+        {
+            "link": f"https://feeds.example.com/{feed_pk}/{index}",
+            "title": f"posting {index}",
+            "description": "benchmark posting " * 20,
+            "author": "benchmark",
+            "published_at": datetime(2023, 1, 1) + timedelta(minutes=index),
+            "feed_id": feed_pk,
+        }
+        for feed_pk in range(1, feeds + 1)
+        for index in range(postings_per_feed)
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(insert(Feed), feed_rows)
+        await conn.execute(insert(Posting), posting_rows)
+        await conn.execute(insert(User), [{"pk": pk, "username": f"user_{pk}"} for pk in range(1, users + 1)])
+        await conn.execute(
+            insert(user_feed),
+            [
+                {"user_pk": user_pk, "feed_pk": feed_pk}
+                for user_pk in range(1, users + 1)
+                for feed_pk in range(1, feeds + 1)
+            ],
+        )
+    return [row["link"] for row in posting_rows]
+
+
+@dataclass
+class SeededDataset:
+    """
+    What seed_dataset has stored, so the benchmarks can pick existing users, feeds and postings
+    """
+
+    feed_links: Dict[int, str] = field(default_factory=dict)
+    posting_links: Dict[int, List[str]] = field(default_factory=dict)
+    follows: Dict[int, List[int]] = field(default_factory=dict)
+
+
+async def seed_dataset(engine: AsyncEngine, args: argparse.Namespace) -> SeededDataset:
+    """
+    Seeds users which follow some of the feeds and have read some of their postings. The feeds count as refreshed
+    right now, so following them does not fetch them again
+    :param engine: the benchmark database engine
+    :param args: command line arguments with the number of users, named user_1 ... user_N, the number of feeds, the
+    number of random feeds followed by every user, the number of postings of each feed, the share of the postings of
+    the followed feeds which each user has read and the seed of the random choices
+    :return: the seeded dataset
+    """
+    rng = random.Random(args.seed)
+    dataset = SeededDataset()
+    feed_rows, posting_rows = [], []
+    for feed_pk in range(1, args.feeds + 1):
+        dataset.feed_links[feed_pk] = f"https://feeds.example.com/{feed_pk}.rss"
+        dataset.posting_links[feed_pk] = [
+            f"https://feeds.example.com/{feed_pk}/{index}" for index in range(args.postings)
+        ]
+        feed_rows.append(
+            {
+                "pk": feed_pk,
+                "link": dataset.feed_links[feed_pk],
+                "title": f"feed {feed_pk}",
+                "lang": "en",
+                "copyright_text": "-",
+                "description": "-",
+                "category": "-",
+                "active": True,
+                "refreshed_at": datetime.utcnow(),
+            }
+        )
+        posting_rows.extend(
+            {
+                "pk": (feed_pk - 1) * args.postings + index + 1,
+                "link": link,
+                "title": f"posting {index}",
+                "description": "benchmark posting " * 20,
+                "author": "benchmark",
+                "published_at": datetime(2023, 1, 1) + timedelta(minutes=index),
+                "feed_id": feed_pk,
+            }
+            for index, link in enumerate(dataset.posting_links[feed_pk])
+        )
+    read_rows = []
+    for user_pk in range(1, args.users + 1):
+        dataset.follows[user_pk] = rng.sample(range(1, args.feeds + 1), min(args.follows, args.feeds))
+        for feed_pk in dataset.follows[user_pk]:
+            read = rng.sample(range(args.postings), round(args.postings * args.read_ratio))
+            read_rows.extend(
+                {"posting_pk": (feed_pk - 1) * args.postings + index + 1, "user_pk": user_pk} for index in read
+            )
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(Feed), feed_rows)
+        for start in range(0, len(posting_rows), 10000):
+            await conn.execute(insert(Posting), posting_rows[start : start + 10000])
+        await conn.execute(insert(User), [{"pk": pk, "username": f"user_{pk}"} for pk in range(1, args.users + 1)])
+        await conn.execute(
+            insert(user_feed),
+            [
+                {"user_pk": user_pk, "feed_pk": feed_pk}
+                for user_pk, feed_pks in dataset.follows.items()
+                for feed_pk in feed_pks
+            ],
+        )
+        for start in range(0, len(read_rows), 10000):
+            await conn.execute(insert(read_postings), read_rows[start : start + 10000])
+    return dataset
@@ -0,0 +1,169 @@
+"""
+Stub feed server for the scheduler benchmarks. It serves synthetic RSS and Atom feeds from an aiohttp app, so the
+benchmarks run offline. Every fetch of a feed moves its window of entries forward by the change rate, and the fault in
+the path of a feed makes the server inject it:
+
+    /feeds/ok/<id>.rss          a valid feed after the configured latency
+    /feeds/error/<id>.atom      503 Service Unavailable
+    /feeds/timeout/<id>.rss     no answer for hang_seconds, longer than the fetch timeout of the client
+    /feeds/oversized/<id>.rss   a valid feed padded to oversized_bytes
+
+The server runs in a process of its own, so it takes neither the event loop nor the memory of the benchmark.
+"""
+import asyncio
+import multiprocessing
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from multiprocessing.process import BaseProcess
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+FAULTS = ["ok", "error", "timeout", "oversized"]
+
+
+@dataclass
+class StubConfig:
+    """
+    What the stub serves and which faults it injects
+    """
+
+    entries: int = 50
+    change_rate: float = 0.2
+    latency: float = 0.02
+    hang_seconds: float = 60.0
+    oversized_bytes: int = 5 * 2**20
+    seed: int = 1
+
+
+def __entries(feed_id: int, revision: int, config: StubConfig) -> List[Tuple[int, datetime]]:
+    """
+    The entries of a revision of a feed, the newest first
+    :param feed_id: the feed
+    :param revision: the number of fetches of the feed so far
+    :param config: the stub config
+    :return: the entry numbers and their publishing time
+    """
+    newest = revision * round(config.entries * config.change_rate) + config.entries
+    return [
+        (number, datetime(2023, 1, 1) + timedelta(minutes=number + feed_id))
+        for number in range(newest - 1, newest - config.entries - 1, -1)
+    ]
+
+
+def render_rss(feed_id: int, revision: int, config: StubConfig, base_url: str) -> str:
+    """
+    Renders an RSS 2.0 feed
+    :param feed_id: the feed
+    :param revision: the number of fetches of the feed so far
+    :param config: the stub config
+    :param base_url: the url of the stub server
+    :return: the document
+    """
+    items = "".join(
+        f"<item><title>entry {number} of feed {feed_id}</title>"
+        f"<link>{base_url}/posts/{feed_id}/{number}</link>"
+        f"<description>{escape('synthetic <b>entry</b> ' * 10)}</description>"
+        f"<author>author{feed_id}@example.com (author {feed_id})</author>"
+        f"<pubDate>{format_datetime(published)}</pubDate></item>"
+        for number, published in __entries(feed_id, revision, config)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>feed {feed_id}</title><link>{base_url}/feeds/{feed_id}</link>"
+        f"<description>synthetic feed {feed_id}</description><language>en</language>"
+        f"<copyright>-</copyright><category>synthetic</category>{items}</channel></rss>"
+    )
+
+
+def render_atom(feed_id: int, revision: int, config: StubConfig, base_url: str) -> str:
+    """
+    Renders an Atom 1.0 feed
+    :param feed_id: the feed
+    :param revision: the number of fetches of the feed so far
+    :param config: the stub config
+    :param base_url: the url of the stub server
+    :return: the document
+    """
+    entries = "".join(
+        f"<entry><title>entry {number} of feed {feed_id}</title>"
+        f'<link href="{base_url}/posts/{feed_id}/{number}"/><id>{base_url}/posts/{feed_id}/{number}</id>'
+        f"<published>{published.isoformat()}Z</published><updated>{published.isoformat()}Z</updated>"
+        f"<summary>{escape('synthetic <b>entry</b> ' * 10)}</summary>"
+        f"<author><name>author {feed_id}</name></author></entry>"
+        for number, published in __entries(feed_id, revision, config)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom" xml:lang="en">'
+        f"<title>feed {feed_id}</title><subtitle>synthetic feed {feed_id}</subtitle>"
+        f"<id>{base_url}/feeds/{feed_id}</id><updated>2023-01-01T00:00:00Z</updated>"
+        f"<rights>-</rights>{entries}</feed>"
+    )
+
+
+def create_app(config: StubConfig) -> web.Application:
+    """
+    Creates the stub app
+    :param config: the stub config
+    :return: the aiohttp app
+    """
+    revisions: Dict[str, int] = defaultdict(int)
+    jitter = random.Random(config.seed)
+
+    async def feed(request: web.Request) -> web.Response:
+        fault, name = request.match_info["fault"], request.match_info["name"]
+        feed_id, _, kind = name.partition(".")
+        await asyncio.sleep(config.latency * jitter.uniform(0.5, 1.5))
+        if fault == "error":
+            return web.Response(status=503)
+        if fault == "timeout":
+            await asyncio.sleep(config.hang_seconds)
+        revision = revisions[request.path]
+        revisions[request.path] += 1
+        render = render_atom if kind == "atom" else render_rss
+        body = render(int(feed_id), revision, config, f"{request.scheme}://{request.host}")
+        if fault == "oversized":
+            # a comment keeps the feed valid however large it is
+            body = body.replace("?>", f"?><!-- {'x' * config.oversized_bytes} -->", 1)
+        content_type = "application/atom+xml" if kind == "atom" else "application/rss+xml"
+        return web.Response(text=body, content_type=content_type)
+
+    app = web.Application()
+    app.router.add_get("/feeds/{fault}/{name}", feed)
+    return app
+
+
+def serve(config: StubConfig, ports: multiprocessing.Queue) -> None:
+    """
+    Entry point of the stub process, it serves until the process is terminated
+    :param config: the stub config
+    :param ports: receives the port the server listens on
+    :return: None
+    """
+
+    async def run() -> None:
+        runner = web.AppRunner(create_app(config), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ports.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def start_stub(config: StubConfig) -> Tuple[BaseProcess, str]:
+    """
+    Starts the stub server in a process of its own
+    :param config: the stub config
+    :return: the process, which has to be terminated by the caller, and the url of the server
+    """
+    context = multiprocessing.get_context("spawn")
+    ports = context.Queue()
+    process = context.Process(target=serve, args=(config, ports), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ports.get(timeout=30)}"
@@ -0,0 +1,75 @@
+"""read watermark
+
+Revision ID: 372b07bb8fbd
+Revises: 0a1f01ac20d6
+Create Date: 2026-10-19 09:12:41.203114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "372b07bb8fbd"
+down_revision = "0a1f01ac20d6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("user_feed", sa.Column("read_until", sa.DateTime(), nullable=True))
+    op.add_column("read_postings", sa.Column("is_read", sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.create_index("ix_postings_feed_id_published_at", "postings", ["feed_id", "published_at"], unique=False)
+
+    # the watermark of each followed feed becomes the newest posting before the first unread one, or the newest posting
+    # when everything is read
+    op.execute(
+        """
+        update user_feed set read_until = (
+            select max(p.published_at) from postings p
+            where p.feed_id = user_feed.feed_pk
+              and (
+                p.published_at < (
+                    select min(u.published_at) from postings u
+                    where u.feed_id = user_feed.feed_pk
+                      and not exists (
+                        select 1 from read_postings rp where rp.posting_pk = u.pk and rp.user_pk = user_feed.user_pk
+                      )
+                )
+                or not exists (
+                    select 1 from postings u
+                    where u.feed_id = user_feed.feed_pk
+                      and not exists (
+                        select 1 from read_postings rp where rp.posting_pk = u.pk and rp.user_pk = user_feed.user_pk
+                      )
+                )
+              )
+        )
+        """
+    )
+    # the read marks which are covered by the watermark are not needed anymore
+    op.execute(
+        """
+        delete from read_postings where exists (
+            select 1 from postings p join user_feed uf on uf.feed_pk = p.feed_id
+            where p.pk = read_postings.posting_pk and uf.user_pk = read_postings.user_pk
+              and p.published_at <= uf.read_until
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    # expand the watermarks back to one read mark per posting and forget the unread exceptions
+    op.execute(
+        """
+        insert into read_postings (posting_pk, user_pk, is_read)
+        select p.pk, uf.user_pk, true from postings p join user_feed uf on uf.feed_pk = p.feed_id
+        where p.published_at <= uf.read_until
+          and not exists (select 1 from read_postings rp where rp.posting_pk = p.pk and rp.user_pk = uf.user_pk)
+        """
+    )
+    op.execute("delete from read_postings where not is_read")
+    op.drop_index("ix_postings_feed_id_published_at", table_name="postings")
+    op.drop_column("read_postings", "is_read")
+    op.drop_column("user_feed", "read_until")
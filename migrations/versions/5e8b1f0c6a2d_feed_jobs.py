@@ -0,0 +1,42 @@
+"""feed jobs
+
+Revision ID: 5e8b1f0c6a2d
+Revises: 9c4e2d7a1b3f
+Create Date: 2026-10-19 12:24:53.061724
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5e8b1f0c6a2d"
+down_revision = "9c4e2d7a1b3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "feed_jobs",
+        sa.Column("pk", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("job_id", sa.VARCHAR(length=32), nullable=False),
+        sa.Column("kind", sa.VARCHAR(length=30), nullable=False),
+        sa.Column("username", sa.VARCHAR(length=255), nullable=False),
+        sa.Column("link", sa.VARCHAR(length=512), nullable=False),
+        sa.Column("status", sa.VARCHAR(length=30), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.VARCHAR(length=5000), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+        sa.UniqueConstraint("job_id"),
+    )
+    op.create_index(op.f("ix_feed_jobs_pk"), "feed_jobs", ["pk"], unique=False)
+    op.create_index("ix_feed_jobs_status_pk", "feed_jobs", ["status", "pk"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_feed_jobs_status_pk", table_name="feed_jobs")
+    op.drop_index(op.f("ix_feed_jobs_pk"), table_name="feed_jobs")
+    op.drop_table("feed_jobs")
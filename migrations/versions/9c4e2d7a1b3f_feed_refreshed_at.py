@@ -0,0 +1,25 @@
+"""feed refreshed at
+
+Revision ID: 9c4e2d7a1b3f
+Revises: 372b07bb8fbd
+Create Date: 2026-10-19 11:02:17.518347
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9c4e2d7a1b3f"
+down_revision = "372b07bb8fbd"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the existing feeds are left unknown, they are refreshed in the background when they are followed again
+    op.add_column("feeds", sa.Column("refreshed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("feeds", "refreshed_at")
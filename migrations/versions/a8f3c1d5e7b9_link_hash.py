@@ -0,0 +1,106 @@
+"""link hash
+
+Revision ID: a8f3c1d5e7b9
+Revises: e2c5a7f9d3b1
+Create Date: 2026-10-19 17:32:10.204665
+
+"""
+from hashlib import blake2b
+from typing import List, Optional
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a8f3c1d5e7b9"
+down_revision = "e2c5a7f9d3b1"
+branch_labels = None
+depends_on = None
+
+# the hashes a link can be stored with as of this revision
+LINK_HASH_PROBES = 3
+
+# SQLite keeps the unique constraints of the init migration unnamed, the batch operations reflect them with the names
+# Postgres gives them, so they can be dropped by name on both databases
+NAMING_CONVENTION = {"uq": "%(table_name)s_%(column_0_name)s_key"}
+
+
+def __link_hash(link: str, probe: int) -> int:
+    """
+    The signed 64-bit hash of a link as of this revision
+    :param link: the link
+    :param probe: the probe, 0 unless the hash of the previous probe is taken by another link
+    :return: the hash
+    """
+    salt = probe.to_bytes(8, "big") if probe else b""
+    return int.from_bytes(blake2b(link.encode(), digest_size=8, salt=salt).digest(), "big", signed=True)
+
+
+def __probe_link_hashes(links: List[str]) -> List[int]:
+    """
+    Assigns a distinct hash to each of the distinct links, a link takes the first probe which is still free
+    :param links: the distinct links of a unique scope, e.g. the postings of a feed
+    :return: the hashes in the order of the links
+    """
+    taken = set()
+    hashes = []
+    for link in links:
+        free = next(
+            (value for probe in range(LINK_HASH_PROBES) if (value := __link_hash(link, probe)) not in taken), None
+        )
+        if free is None:
+            raise ValueError(f"no free link hash for {link}")
+        taken.add(free)
+        hashes.append(free)
+    return hashes
+
+
+def __backfill(table: str, scope: Optional[str]) -> None:
+    """
+    Stores the link hashes of the existing rows, the links of a unique scope get distinct hashes
+    :param table: feeds or postings
+    :param scope: the column of the unique scope besides the hash, None when the hash is unique on its own
+    :return: None
+    """
+    connection = op.get_bind()
+    scopes = [None] if scope is None else connection.execute(sa.text(f"SELECT DISTINCT {scope} FROM {table}")).scalars()
+    # the rows are read one scope after another, the statement is not kept open while the rows are updated
+    select = f"SELECT pk, link FROM {table}" + (f" WHERE {scope} = :scope" if scope else "") + " ORDER BY pk"
+    # the scope is part of the condition, so a partition of the postings is updated directly
+    update = f"UPDATE {table} SET link_hash = :link_hash WHERE pk = :pk" + (f" AND {scope} = :scope" if scope else "")
+    for scope_value in list(scopes):
+        rows = connection.execute(sa.text(select), {"scope": scope_value}).all()
+        if not rows:
+            continue
+        hashes = __probe_link_hashes([row.link for row in rows])
+        connection.execute(
+            sa.text(update),
+            [{"pk": row.pk, "scope": scope_value, "link_hash": value} for row, value in zip(rows, hashes)],
+        )
+
+
+def upgrade() -> None:
+    op.add_column("feeds", sa.Column("link_hash", sa.BigInteger(), nullable=True))
+    op.add_column("postings", sa.Column("link_hash", sa.BigInteger(), nullable=True))
+    __backfill("feeds", None)
+    __backfill("postings", "feed_id")
+
+    # the link of a feed stays unique, the feeds are few and their link key keeps two rows from sharing a link
+    with op.batch_alter_table("feeds") as batch_op:
+        batch_op.alter_column("link_hash", existing_type=sa.BigInteger(), nullable=False)
+        batch_op.create_unique_constraint("feeds_link_hash_key", ["link_hash"])
+    with op.batch_alter_table("postings", naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column("link_hash", existing_type=sa.BigInteger(), nullable=False)
+        batch_op.create_unique_constraint("postings_link_hash_key", ["link_hash", "feed_id"])
+        batch_op.drop_constraint("postings_link_key", type_="unique")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("postings", naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.create_unique_constraint("postings_link_key", ["link", "feed_id"])
+        batch_op.drop_constraint("postings_link_hash_key", type_="unique")
+        batch_op.drop_column("link_hash")
+    with op.batch_alter_table("feeds") as batch_op:
+        batch_op.drop_constraint("feeds_link_hash_key", type_="unique")
+        batch_op.drop_column("link_hash")
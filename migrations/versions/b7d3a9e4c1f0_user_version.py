@@ -0,0 +1,24 @@
+"""user version
+
+Revision ID: b7d3a9e4c1f0
+Revises: 5e8b1f0c6a2d
+Create Date: 2026-10-19 13:40:08.927415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b7d3a9e4c1f0"
+down_revision = "5e8b1f0c6a2d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("version", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "version")
@@ -0,0 +1,41 @@
+"""import jobs
+
+Revision ID: c3e9f2a7b6d4
+Revises: a8f3c1d5e7b9
+Create Date: 2026-10-19 18:12:36.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c3e9f2a7b6d4"
+down_revision = "a8f3c1d5e7b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "import_jobs",
+        sa.Column("pk", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("job_id", sa.VARCHAR(length=32), nullable=False),
+        sa.Column("username", sa.VARCHAR(length=255), nullable=False),
+        sa.Column("status", sa.VARCHAR(length=30), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("reused", sa.Integer(), nullable=False),
+        sa.Column("fetched", sa.Integer(), nullable=False),
+        sa.Column("failed_links", sa.JSON(), nullable=False),
+        sa.Column("followed", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+        sa.UniqueConstraint("job_id"),
+    )
+    op.create_index(op.f("ix_import_jobs_pk"), "import_jobs", ["pk"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_import_jobs_pk"), table_name="import_jobs")
+    op.drop_table("import_jobs")
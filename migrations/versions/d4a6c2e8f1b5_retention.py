@@ -0,0 +1,45 @@
+"""retention
+
+Revision ID: d4a6c2e8f1b5
+Revises: b7d3a9e4c1f0
+Create Date: 2026-10-19 15:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d4a6c2e8f1b5"
+down_revision = "b7d3a9e4c1f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("feeds", sa.Column("retention_max_age_days", sa.Integer(), nullable=True))
+    op.add_column("feeds", sa.Column("retention_max_postings", sa.Integer(), nullable=True))
+    op.add_column("feeds", sa.Column("pruned_at", sa.DateTime(), nullable=True))
+    op.create_table(
+        "postings_archive",
+        sa.Column("pk", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("posting_pk", sa.Integer(), nullable=False),
+        sa.Column("link", sa.VARCHAR(length=512), nullable=False),
+        sa.Column("title", sa.VARCHAR(length=255), nullable=False),
+        sa.Column("description", sa.VARCHAR(length=5000), nullable=False),
+        sa.Column("author", sa.VARCHAR(length=3000), nullable=False),
+        sa.Column("published_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("feed_id", sa.Integer(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+    )
+    op.create_index(op.f("ix_postings_archive_feed_id"), "postings_archive", ["feed_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_postings_archive_feed_id"), table_name="postings_archive")
+    op.drop_table("postings_archive")
+    op.drop_column("feeds", "pruned_at")
+    op.drop_column("feeds", "retention_max_postings")
+    op.drop_column("feeds", "retention_max_age_days")
@@ -0,0 +1,108 @@
+"""partition postings
+
+Revision ID: e2c5a7f9d3b1
+Revises: d4a6c2e8f1b5
+Create Date: 2026-10-19 16:05:31.572940
+
+"""
+from typing import List
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e2c5a7f9d3b1"
+down_revision = "d4a6c2e8f1b5"
+branch_labels = None
+depends_on = None
+
+# number of hash partitions the postings are created with, the missing ones are created again with their modulus
+POSTINGS_PARTITIONS = 16
+
+POSTINGS_COLUMNS = "pk, link, title, description, author, published_at, updated_at, feed_id"
+
+
+def __execute(statements: List[str]) -> None:
+    """
+    Runs DDL statements in order
+    :param statements: the statements
+    :return: None
+    """
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade() -> None:
+    # declarative partitioning only exists on Postgres, the other databases keep a plain table
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # the primary key becomes (pk, feed_id) and the foreign key of read_postings can not reference pk alone, the read
+    # marks are deleted together with their postings by the services instead
+    __execute(
+        [
+            "ALTER TABLE read_postings DROP CONSTRAINT IF EXISTS read_postings_posting_pk_fkey",
+            "ALTER SEQUENCE postings_pk_seq OWNED BY NONE",
+            "CREATE TABLE postings_partitioned (LIKE postings INCLUDING DEFAULTS) PARTITION BY HASH (feed_id)",
+            "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_pkey PRIMARY KEY (pk, feed_id)",
+            "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_link_key UNIQUE (link, feed_id)",
+            "ALTER TABLE postings_partitioned ADD CONSTRAINT postings_partitioned_feed_id_fkey "
+            "FOREIGN KEY (feed_id) REFERENCES feeds (pk)",
+        ]
+        + [
+            f"CREATE TABLE postings_p{remainder} PARTITION OF postings_partitioned "
+            f"FOR VALUES WITH (MODULUS {POSTINGS_PARTITIONS}, REMAINDER {remainder})"
+            for remainder in range(POSTINGS_PARTITIONS)
+        ]
+        + [
+            "INSERT INTO postings_partitioned SELECT * FROM postings",
+            "DROP TABLE postings",
+            "ALTER TABLE postings_partitioned RENAME TO postings",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_pkey TO postings_pkey",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_link_key TO postings_link_key",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_partitioned_feed_id_fkey TO postings_feed_id_fkey",
+            "CREATE INDEX ix_postings_pk ON postings (pk)",
+            "CREATE INDEX ix_postings_feed_id_published_at ON postings (feed_id, published_at)",
+            "ALTER SEQUENCE postings_pk_seq OWNED BY postings.pk",
+            "ANALYZE postings",
+        ]
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # a link is unique again, so only the latest posting of a link is kept when many feeds share it, and the read marks
+    # of the dropped postings are deleted before their foreign key is restored
+    __execute(
+        [
+            "DELETE FROM postings WHERE EXISTS ("
+            "SELECT 1 FROM postings newer WHERE newer.link = postings.link AND newer.pk > postings.pk)",
+            "DELETE FROM read_postings "
+            "WHERE NOT EXISTS (SELECT 1 FROM postings WHERE postings.pk = read_postings.posting_pk)",
+            "ALTER SEQUENCE postings_pk_seq OWNED BY NONE",
+            "CREATE TABLE postings_plain ("
+            "pk INTEGER NOT NULL DEFAULT nextval('postings_pk_seq'), "
+            "link VARCHAR(512) NOT NULL, "
+            "title VARCHAR(255) NOT NULL, "
+            "description VARCHAR(5000) NOT NULL, "
+            "author VARCHAR(3000) NOT NULL, "
+            "published_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+            "updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(), "
+            "feed_id INTEGER NOT NULL, "
+            "CONSTRAINT postings_plain_pkey PRIMARY KEY (pk), "
+            "CONSTRAINT postings_plain_link_key UNIQUE (link), "
+            "CONSTRAINT postings_plain_feed_id_fkey FOREIGN KEY (feed_id) REFERENCES feeds (pk))",
+            f"INSERT INTO postings_plain ({POSTINGS_COLUMNS}) SELECT {POSTINGS_COLUMNS} FROM postings",
+            "DROP TABLE postings",
+            "ALTER TABLE postings_plain RENAME TO postings",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_plain_pkey TO postings_pkey",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_plain_link_key TO postings_link_key",
+            "ALTER TABLE postings RENAME CONSTRAINT postings_plain_feed_id_fkey TO postings_feed_id_fkey",
+            "CREATE INDEX ix_postings_pk ON postings (pk)",
+            "CREATE INDEX ix_postings_feed_id_published_at ON postings (feed_id, published_at)",
+            "ALTER SEQUENCE postings_pk_seq OWNED BY postings.pk",
+            "ALTER TABLE read_postings ADD CONSTRAINT read_postings_posting_pk_fkey "
+            "FOREIGN KEY (posting_pk) REFERENCES postings (pk)",
+        ]
+    )
@@ -0,0 +1,30 @@
+"""users version
+
+Revision ID: f1b8d3c6a9e2
+Revises: c3e9f2a7b6d4
+Create Date: 2026-10-19 18:47:52.318064
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f1b8d3c6a9e2"
+down_revision = "c3e9f2a7b6d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users_version",
+        sa.Column("pk", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+    )
+    op.execute(sa.text("INSERT INTO users_version (pk, version) VALUES (1, 0)"))
+
+
+def downgrade() -> None:
+    op.drop_table("users_version")
@@ -1,9 +1,12 @@
 """ The main app module """
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from sendcloud.routers import all_routers
-from sendcloud.utils import settings
+from sendcloud.utils import settings, QueryStatsMiddleware, ProfilingMiddleware, LoopMonitor
+from sendcloud.utils import TracingMiddleware, install_trace_log_records
 
 print(settings.database_url)
 app = FastAPI()
@@ -15,6 +18,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+install_trace_log_records()
 
 for router in all_routers:
     app.include_router(router)
+
+
+@app.on_event("startup")
+async def start_loop_monitor() -> None:
+    """Measures the lag of the event loop of the api"""
+    if settings.loop_monitor:
+        app.state.loop_monitor = asyncio.create_task(LoopMonitor().run())
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor() -> None:
+    """Stops the loop monitor"""
+    if (task := getattr(app.state, "loop_monitor", None)) is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -4,10 +4,13 @@ import signal
 import os
 import logging
 
-from sendcloud.utils.scheduler import Scheduler
+from sendcloud.utils.scheduler import Scheduler, FeedJobRunner, RetentionRunner
+from sendcloud.utils.partitions import ensure_postings_partitions
+from sendcloud.utils import LoopMonitor, settings, install_trace_log_records, metrics
 
 _LOGGER = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
+install_trace_log_records()
+logging.basicConfig(level=logging.DEBUG, format="%(levelname)s:%(name)s:%(trace_id)s:%(message)s")
 
 
 async def graceful_shutdown(loop):
@@ -20,6 +23,13 @@ async def graceful_shutdown(loop):
     loop.stop()
 
 
+async def log_metrics() -> None:
+    """Logs the metrics of the scheduler periodically in the text format of prometheus"""
+    while True:
+        await asyncio.sleep(settings.metrics_log_interval)
+        _LOGGER.info("[INFO] Scheduler metrics:\n%s", metrics.exposition())
+
+
 def run():
     """Runs the feed refresher"""
     loop = asyncio.get_event_loop()
@@ -28,8 +38,19 @@ def run():
     for sig in signals:
         loop.add_signal_handler(sig, lambda: asyncio.create_task(graceful_shutdown(loop)))
 
+    # the partitions of the postings which have been dropped by hand are created again before anything is written
+    loop.run_until_complete(ensure_postings_partitions())
+
     time_interval = int(os.environ.get("SCHEDULER_TIME_INTERVAL", 3000))
-    loop.create_task(Scheduler(time_interval, loop).run())
+    scheduler = Scheduler(time_interval, loop)
+    # kill -USR1 <pid> writes a profile of the next cycle to settings.profile_dir
+    loop.add_signal_handler(signal.SIGUSR1, scheduler.profile_next_cycle)
+    loop.create_task(scheduler.run())
+    loop.create_task(FeedJobRunner().run())
+    loop.create_task(RetentionRunner().run())
+    if settings.loop_monitor:
+        loop.create_task(LoopMonitor().run())
+    loop.create_task(log_metrics())
     loop.run_forever()
 
 
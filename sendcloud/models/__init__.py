@@ -1,6 +1,17 @@
 """Models module"""
-from .users_model import User, user_feed
-from .feeds_model import Feed, Posting, read_postings
+from .users_model import User, user_feed, users_version
+from .feeds_model import Feed, Posting, read_postings, postings_archive
+from .jobs_model import FeedJob, ImportJobRecord
 
 
-__all__ = ["User", "Feed", "Posting", "user_feed", "read_postings"]
+__all__ = [
+    "User",
+    "Feed",
+    "Posting",
+    "user_feed",
+    "users_version",
+    "read_postings",
+    "postings_archive",
+    "FeedJob",
+    "ImportJobRecord",
+]
@@ -1,12 +1,13 @@
 """FeedModel Module"""
 from typing import List
-from sqlalchemy import Column, Integer, VARCHAR, ForeignKey, TIMESTAMP, func, DateTime, Boolean
+from sqlalchemy import Column, Integer, VARCHAR, ForeignKey, TIMESTAMP, func, DateTime, Boolean, Index, true
+from sqlalchemy import UniqueConstraint, BigInteger
 from sqlalchemy.orm import relationship, Mapped
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy import Table
 
-from sendcloud.utils import Base
+from sendcloud.utils import Base, link_hash_default
 
 
 # pylint: disable=too-few-public-methods
@@ -16,9 +17,13 @@ class Feed(AsyncAttrs, Base):
     """
 
     __tablename__ = "feeds"
+    __table_args__ = (
+        UniqueConstraint("link_hash", name="feeds_link_hash_key"),
+        UniqueConstraint("link", name="feeds_link_key"),
+    )
 
     pk = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    link = Column(VARCHAR(512), nullable=False, unique=True)
+    link = Column(VARCHAR(512), nullable=False)
     title = Column(VARCHAR(255), nullable=False)
     lang = Column(VARCHAR(30), nullable=False)
     copyright_text = Column(VARCHAR(5000), nullable=False)
@@ -26,6 +31,15 @@ class Feed(AsyncAttrs, Base):
     category = Column(VARCHAR(255), nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())  # pylint: disable=not-callable
     active = Column(Boolean, default=True)
+    # the last time the feed has been fetched and stored
+    refreshed_at = Column(DateTime, nullable=True)
+    # the retention policy of the feed, settings.retention_max_age and settings.retention_max_postings when not set
+    retention_max_age_days = Column(Integer, nullable=True)
+    retention_max_postings = Column(Integer, nullable=True)
+    # the last time postings of the feed have been pruned by the retention
+    pruned_at = Column(DateTime, nullable=True)
+    # the links are unique and looked up by their hash, see sendcloud.utils.link_hash
+    link_hash = Column(BigInteger, nullable=False, default=link_hash_default)
 
     postings: Mapped[List["Posting"]] = relationship("Posting", back_populates="feed", cascade="all, delete-orphan")
 
@@ -42,11 +56,14 @@ class Feed(AsyncAttrs, Base):
         return link
 
 
+# read_postings only keeps the exceptions of the read watermark of user_feed: a posting is read when its row says so,
+# otherwise when it is published before the watermark of the followed feed
 read_postings = Table(
     "read_postings",
     Base.metadata,
     Column("posting_pk", Integer, ForeignKey("postings.pk"), primary_key=True),
     Column("user_pk", Integer, ForeignKey("users.pk"), primary_key=True),
+    Column("is_read", Boolean, nullable=False, default=True, server_default=true()),
 )
 
 
@@ -56,9 +73,15 @@ class Posting(Base):
     """
 
     __tablename__ = "postings"
+    # on Postgres the table is partitioned by hash of feed_id by the migrations, see sendcloud.utils.partitions, so a
+    # link is unique per feed and the primary key of the partitioned table is (pk, feed_id)
+    __table_args__ = (
+        Index("ix_postings_feed_id_published_at", "feed_id", "published_at"),
+        UniqueConstraint("link_hash", "feed_id", name="postings_link_hash_key"),
+    )
 
     pk = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    link = Column(VARCHAR(512), nullable=False, unique=True)
+    link = Column(VARCHAR(512), nullable=False)
     title = Column(VARCHAR(255), nullable=False)
     description = Column(VARCHAR(5000), nullable=False)
     author = Column(VARCHAR(3000), nullable=False)
@@ -66,6 +89,30 @@ class Posting(Base):
     # pylint: disable=not-callable
     updated_at = Column(DateTime, server_onupdate=func.now(), server_default=func.now())  # type: ignore
     feed_id = Column(Integer, ForeignKey("feeds.pk"), nullable=False)
-    read_by: Mapped[List["User"]] = relationship("User", secondary=read_postings)  # type: ignore
+    # the links are unique per feed and looked up by their hash, see sendcloud.utils.link_hash
+    link_hash = Column(BigInteger, nullable=False, default=link_hash_default)
+    # only the explicit read marks, the postings which are read by the watermark of user_feed are not part of it
+    read_by: Mapped[List["User"]] = relationship(  # type: ignore
+        "User",
+        secondary=read_postings,
+        secondaryjoin="and_(User.pk == read_postings.c.user_pk, read_postings.c.is_read == true())",
+    )
 
     feed: Mapped[Feed] = relationship("Feed", back_populates="postings")
+
+
+# the postings which are pruned by the retention when settings.retention_archive is enabled, the read marks are not kept
+postings_archive = Table(
+    "postings_archive",
+    Base.metadata,
+    Column("pk", Integer, primary_key=True, autoincrement=True),
+    Column("posting_pk", Integer, nullable=False),
+    Column("link", VARCHAR(512), nullable=False),
+    Column("title", VARCHAR(255), nullable=False),
+    Column("description", VARCHAR(5000), nullable=False),
+    Column("author", VARCHAR(3000), nullable=False),
+    Column("published_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=True),
+    Column("feed_id", Integer, nullable=False, index=True),
+    Column("archived_at", DateTime, nullable=False),
+)
@@ -0,0 +1,48 @@
+"""JobModel Module"""
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import Column, Integer, VARCHAR, DateTime, Index, JSON
+
+from sendcloud.utils import Base
+
+
+# pylint: disable=too-few-public-methods
+class FeedJob(Base):
+    """
+    FeedJob model class to store the fetches which are requested by the api and run by the scheduler service
+    """
+
+    __tablename__ = "feed_jobs"
+    __table_args__ = (Index("ix_feed_jobs_status_pk", "status", "pk"),)
+
+    pk = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    job_id = Column(VARCHAR(32), nullable=False, unique=True, default=lambda: uuid4().hex)
+    kind = Column(VARCHAR(30), nullable=False)
+    username = Column(VARCHAR(255), nullable=False)
+    link = Column(VARCHAR(512), nullable=False)
+    status = Column(VARCHAR(30), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(VARCHAR(5000), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# pylint: disable=too-few-public-methods
+class ImportJobRecord(Base):
+    """
+    ImportJobRecord model class to store the progress of the OPML imports, so every api process can report it
+    """
+
+    __tablename__ = "import_jobs"
+
+    pk = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    job_id = Column(VARCHAR(32), nullable=False, unique=True, default=lambda: uuid4().hex)
+    username = Column(VARCHAR(255), nullable=False)
+    status = Column(VARCHAR(30), nullable=False, default="pending")
+    total = Column(Integer, nullable=False, default=0)
+    reused = Column(Integer, nullable=False, default=0)
+    fetched = Column(Integer, nullable=False, default=0)
+    failed_links = Column(JSON, nullable=False, default=list)
+    followed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
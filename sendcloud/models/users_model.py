@@ -1,6 +1,6 @@
 """UserModel Module"""
 from typing import List
-from sqlalchemy import Column, Integer, VARCHAR, ForeignKey
+from sqlalchemy import Column, Integer, VARCHAR, ForeignKey, DateTime
 from sqlalchemy.orm import validates, relationship, Mapped
 from sqlalchemy import Table
 from sqlalchemy.ext.asyncio import AsyncAttrs
@@ -13,6 +13,16 @@ user_feed = Table(
     Base.metadata,
     Column("feed_pk", Integer, ForeignKey("feeds.pk"), primary_key=True),
     Column("user_pk", Integer, ForeignKey("users.pk"), primary_key=True),
+    # every posting of the feed published up to this moment is read, unless read_postings says otherwise
+    Column("read_until", DateTime, nullable=True),
+)
+
+# a single row whose version is bumped by every change of the user list, it is part of the ETag of the list
+users_version = Table(
+    "users_version",
+    Base.metadata,
+    Column("pk", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, default=0, server_default="0"),
 )
 
 
@@ -26,6 +36,8 @@ class User(AsyncAttrs, Base):
 
     pk = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(VARCHAR(255), nullable=False, unique=True)
+    # bumped whenever the user follows, unfollows or reads, it is part of the ETag of the user's responses
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     followed_feeds: Mapped[List[Feed]] = relationship("Feed", secondary=user_feed)
 
@@ -1,16 +1,31 @@
 """
 Contains the feed related routes
 """
-from typing import Optional, Sequence, Dict
-from fastapi import Depends, APIRouter, Query
+from datetime import datetime
+from typing import Optional, Dict, AsyncIterator, Sequence
+import orjson
+from fastapi import Depends, APIRouter, Query, Request, BackgroundTasks, Header, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import async_scoped_session
 
 from sendcloud.utils import get_session_injector
-from sendcloud.utils import value_error
+from sendcloud.utils import value_error, parse_opml
+from sendcloud.utils import make_etag, etag_matches, not_modified, cache_headers
 from sendcloud.services import feeds_services as feed_services
-from sendcloud.schemas import FollowingFeedsCreateResult, FollowingFeedPostings, FollowingFeedInput, OrderByLastUpdate
-from sendcloud.models import Feed
+from sendcloud.services import jobs_services, users_services
+from sendcloud.schemas import (
+    FollowingFeedsCreateResult,
+    FollowingFeedPostings,
+    FollowingFeedInput,
+    OrderByLastUpdate,
+    BulkReadInput,
+    BulkReadResult,
+    ImportJob,
+    FeedJobKind,
+    FeedJobItem,
+)
+from sendcloud.models import Feed, FeedJob
 
 router_v1_0 = APIRouter(prefix="/v1.0/feeds")
 
@@ -43,6 +58,38 @@ async def mark_posting_unread(
         value_error("not allowed to unread this posting")
 
 
+@router_v1_0.patch("/postings/read/bulk", status_code=200, response_model=BulkReadResult)
+async def mark_postings_read(
+    body: BulkReadInput, session: async_scoped_session = Depends(get_session_injector)
+) -> Dict[str, int]:
+    """
+    Mark many postings of the followed feeds as read for a specific user
+    :param body: the username and the links, feed link or until filters
+    :param session: the database session which is being injected by fastapi
+    :return: number of affected rows
+    """
+    if body.links is None and body.feed_link is None and body.until is None:
+        value_error("at least one of links, feed_link or until is required")
+    affected = await feed_services.make_postings_read(body.username, session, body.links, body.feed_link, body.until)
+    return {"affected": affected}
+
+
+@router_v1_0.patch("/postings/unread/bulk", status_code=200, response_model=BulkReadResult)
+async def mark_postings_unread(
+    body: BulkReadInput, session: async_scoped_session = Depends(get_session_injector)
+) -> Dict[str, int]:
+    """
+    Mark many postings of the followed feeds as unread for a specific user
+    :param body: the username and the links, feed link or until filters
+    :param session: the database session which is being injected by fastapi
+    :return: number of affected rows
+    """
+    if body.links is None and body.feed_link is None and body.until is None:
+        value_error("at least one of links, feed_link or until is required")
+    affected = await feed_services.make_postings_unread(body.username, session, body.links, body.feed_link, body.until)
+    return {"affected": affected}
+
+
 @router_v1_0.post("/follow", status_code=200, response_model=FollowingFeedsCreateResult)
 async def follow_new_feed(
     new_feed: FollowingFeedInput, session: async_scoped_session = Depends(get_session_injector)
@@ -58,6 +105,21 @@ async def follow_new_feed(
     return value_error("feed or user not found")
 
 
+@router_v1_0.post("/follow/async", status_code=202, response_model=FeedJobItem)
+async def follow_new_feed_async(
+    new_feed: FollowingFeedInput, session: async_scoped_session = Depends(get_session_injector)
+) -> FeedJob:
+    """
+    Follow a new feed in the background of the scheduler service, the progress can be followed by the returned job
+    :param new_feed: contains the feed link and the username
+    :param session: database session which is being injected by fastapi
+    :return: the pending job
+    """
+    if job := await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, new_feed.username, new_feed.link, session):
+        return job
+    return value_error("user not found")
+
+
 @router_v1_0.delete("/unfollow", status_code=200)
 async def unfollow_feed(
     feed_to_be_deleted: FollowingFeedInput, session: async_scoped_session = Depends(get_session_injector)
@@ -72,32 +134,101 @@ async def unfollow_feed(
         value_error("feed or user not found")
 
 
+@router_v1_0.get("/jobs/{job_id}", status_code=200, response_model=FeedJobItem)
+async def get_feed_job(job_id: str, session: async_scoped_session = Depends(get_session_injector)) -> FeedJob:
+    """
+    Retrieve the status of a follow or force-update job
+    :param job_id: job unique identifier
+    :param session: database session which is being injected by fastapi
+    :return: the job
+    """
+    if job := await jobs_services.get_feed_job(job_id, session):
+        return job
+    return value_error("job not found")
+
+
 @router_v1_0.get("/following/postings", status_code=200, response_model=FollowingFeedPostings)
 async def get_all_following_feed_postings(
     username: str,
+    request: Request,
     feed_link: Optional[str] = None,
     is_read: Optional[bool] = Query(default=None),
     order_by: OrderByLastUpdate = OrderByLastUpdate.LAST_UPDATE_DESCENDING,
     offset: int = 0,
     limit: int = 10,
+    fields: Optional[str] = Query(default=None, description="comma separated posting fields, e.g. title,link"),
+    if_none_match: Optional[str] = Header(default=None),
     session: async_scoped_session = Depends(get_session_injector),
-) -> Dict[str, Sequence[Row]]:
+) -> Response:
     # pylint: disable=too-many-arguments
     """
-    Retrieve the all postings for the feeds which has been followed by a user
+    Retrieve the all postings for the feeds which has been followed by a user. The rows already have the shape of
+    FollowingFeedPostings, so they are encoded by orjson directly and the response model is only used for the docs.
+    The response carries an ETag of the user's version token, a client which sends it back as If-None-Match gets 304
+    as long as nothing has changed
     :param username:
+    :param request: the request which is being injected by fastapi
     :param feed_link: the unique feed identifier
     :param is_read: indicates the retrieved posting should be read or unread
     :param order_by: indicates the order parameter
     :param offset: pagination offset
     :param limit: pagination limit
+    :param fields: only these fields of the postings are selected and returned, all of them by default
+    :param if_none_match: the ETag of the client's copy
     :param session: database session which is being injected by fastapi
-    :return: None
+    :return: the postings or 304
     """
+    etag = make_etag(
+        await feed_services.get_following_postings_version(username, session),
+        sorted(request.query_params.multi_items()),
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    selected = None if fields is None else [field.strip() for field in fields.split(",") if field.strip()]
     postings = await feed_services.filter_following_feed_postings(
-        username, feed_link, is_read, order_by, session, offset, limit
+        username, feed_link, is_read, order_by, session, offset, limit, selected
     )
-    return {"postings": postings}
+    return ORJSONResponse({"postings": [posting._asdict() for posting in postings]}, headers=cache_headers(etag))
+
+
+async def __ndjson_lines(batches: AsyncIterator[Sequence[Row]], session: async_scoped_session) -> AsyncIterator[bytes]:
+    """
+    Encodes the row batches as NDJSON, one chunk per batch, and gives the connection back to the pool as soon as the
+    stream is finished or the client has gone
+    :param batches: the row batches of the export
+    :param session: the session which holds the server side cursor
+    :return: async iterator of NDJSON chunks
+    """
+    try:
+        async for batch in batches:
+            yield b"".join(orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE) for row in batch)
+    finally:
+        await session.close()
+
+
+@router_v1_0.get("/following/postings/export", status_code=200, response_class=StreamingResponse)
+async def export_following_feed_postings(
+    username: str,
+    feed_link: Optional[str] = None,
+    is_read: Optional[bool] = Query(default=None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session: async_scoped_session = Depends(get_session_injector),
+) -> StreamingResponse:
+    # pylint: disable=too-many-arguments
+    """
+    Export all the postings of the feeds which has been followed by a user as NDJSON, one PostingItem per line. The
+    postings are streamed from a server side cursor, so the memory usage does not depend on the number of postings
+    :param username:
+    :param feed_link: the unique feed identifier
+    :param is_read: indicates the exported postings should be read or unread
+    :param since: only the postings which are published at or after this moment
+    :param until: only the postings which are published at or before this moment
+    :param session: database session which is being injected by fastapi
+    :return: the NDJSON stream
+    """
+    batches = await feed_services.stream_following_feed_postings(username, feed_link, is_read, since, until, session)
+    return StreamingResponse(__ndjson_lines(batches, session), media_type="application/x-ndjson")
 
 
 @router_v1_0.post("/feed/force-update", status_code=200)
@@ -113,3 +244,61 @@ async def force_update_feed(
     """
     if not await feed_services.force_update_feed(feed_to_be_updated.username, feed_to_be_updated.link, session):
         value_error("Unfortunately update was not successful")
+
+
+@router_v1_0.post("/feed/force-update/async", status_code=202, response_model=FeedJobItem)
+async def force_update_feed_async(
+    feed_to_be_updated: FollowingFeedInput, session: async_scoped_session = Depends(get_session_injector)
+) -> FeedJob:
+    """
+    Force update a feed in the background of the scheduler service, the progress can be followed by the returned job
+    :param feed_to_be_updated: the feed link which should be updated
+    :param session: database session which is being injected by fastapi
+    :return: the pending job
+    """
+    if job := await jobs_services.enqueue_feed_job(
+        FeedJobKind.FORCE_UPDATE, feed_to_be_updated.username, feed_to_be_updated.link, session
+    ):
+        return job
+    return value_error("user not found")
+
+
+@router_v1_0.post("/import/opml", status_code=202, response_model=ImportJob)
+async def import_opml(
+    username: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    session: async_scoped_session = Depends(get_session_injector),
+) -> ImportJob:
+    """
+    Follow all the feeds of an OPML subscription list which is sent as the request body. The feeds are imported in the
+    background and the progress can be followed by the returned job
+    :param username: the user who follows the feeds
+    :param request: the request with the OPML document as body
+    :param background_tasks: the tasks which run after the response is sent
+    :param session: database session which is being injected by fastapi
+    :return: the pending import job
+    """
+    try:
+        links = parse_opml(await request.body())
+    except ValueError as error:
+        value_error(str(error))
+    if await users_services.get_user_by_username(username, session) is None:
+        value_error("user not found")
+    job = await jobs_services.create_import_job(username, len(links), session)
+    # the session of the request is closed once the response is sent, the import opens a session of its own
+    background_tasks.add_task(feed_services.import_feeds, job.job_id, links)
+    return job
+
+
+@router_v1_0.get("/import/jobs/{job_id}", status_code=200, response_model=ImportJob)
+async def get_import_job(job_id: str, session: async_scoped_session = Depends(get_session_injector)) -> ImportJob:
+    """
+    Retrieve the progress of an OPML import job
+    :param job_id: job unique identifier
+    :param session: database session which is being injected by fastapi
+    :return: the import job
+    """
+    if job := await jobs_services.get_import_job(job_id, session):
+        return job
+    return value_error("import job not found")
@@ -0,0 +1,16 @@
+"""
+Exposes the metrics of the api process to a prometheus scraper
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from sendcloud.utils import metrics
+
+# routers
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """the counters, gauges and histograms of the process in the text format of prometheus"""
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
@@ -1,15 +1,15 @@
 """
 Contains the user related routes
 """
-from typing import List, Sequence
-from fastapi import Depends, APIRouter
+from typing import List, Sequence, Optional, Union
+from fastapi import Depends, APIRouter, Header, Response
 from sqlalchemy import Row
 
 from sqlalchemy.ext.asyncio import async_scoped_session
 
 from sendcloud.schemas import UserItem, UserInput
 from sendcloud.services import users_services
-from sendcloud.utils import get_session_injector
+from sendcloud.utils import get_session_injector, make_etag, etag_matches, not_modified, cache_headers
 
 # routers
 router_v1_0 = APIRouter(prefix="/v1.0/users")
@@ -17,15 +17,26 @@ router_v1_0 = APIRouter(prefix="/v1.0/users")
 
 @router_v1_0.get("/", status_code=200, response_model=List[UserItem])
 async def list_users(
-    offset: int = 0, limit: int = 100, session: async_scoped_session = Depends(get_session_injector)
-) -> Sequence[Row]:
+    response: Response,
+    offset: int = 0,
+    limit: int = 100,
+    if_none_match: Optional[str] = Header(default=None),
+    session: async_scoped_session = Depends(get_session_injector),
+) -> Union[Sequence[Row], Response]:
     """
-    Retrieves the list of all user's information
+    Retrieves the list of all user's information. The response carries an ETag of the version token of the users, a
+    client which sends it back as If-None-Match gets 304 as long as nothing has changed
+    :param response: the response which is being injected by fastapi to set the headers
     :param offset: pagination offset
     :param limit: pagination limit
+    :param if_none_match: the ETag of the client's copy
     :param session: database session which is being injected by fastapi
-    :return:
+    :return: the users or 304
     """
+    etag = make_etag(await users_services.get_users_version(session), offset, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
     return await users_services.get_users(session, offset=offset, limit=limit)
 
 
@@ -3,11 +3,19 @@ from .users_schema import UserItem, UserCreateOutput, UserInput
 from .feeds_schema import (
     FeedItem,
     FeedItemCreate,
+    PostingItem,
     PostingItemCreate,
     FollowingFeedPostings,
     FollowingFeedInput,
     FollowingFeedsCreateResult,
     OrderByLastUpdate,
+    BulkReadInput,
+    BulkReadResult,
+    ImportJob,
+    JobStatus,
+    FeedJobKind,
+    FeedJobItem,
+    RetentionStats,
 )
 
 __all__ = [
@@ -17,8 +25,16 @@ __all__ = [
     "FeedItem",
     "FollowingFeedsCreateResult",
     "FeedItemCreate",
+    "PostingItem",
     "PostingItemCreate",
     "FollowingFeedInput",
     "FollowingFeedPostings",
     "OrderByLastUpdate",
+    "BulkReadInput",
+    "BulkReadResult",
+    "ImportJob",
+    "JobStatus",
+    "FeedJobKind",
+    "FeedJobItem",
+    "RetentionStats",
 ]
@@ -2,7 +2,7 @@
 Contains all the schema related to feed and postings
 """
 from enum import Enum
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel  # pylint: disable=no-name-in-module
 
@@ -98,6 +98,27 @@ class FollowingFeedInput(BaseModel):
     link: str
 
 
+# pylint: disable=too-few-public-methods
+class BulkReadInput(BaseModel):
+    """
+    Schema for marking many postings read or unread at once, the given filters are combined together
+    """
+
+    username: str
+    links: Optional[List[str]] = None
+    feed_link: Optional[str] = None
+    until: Optional[datetime] = None
+
+
+# pylint: disable=too-few-public-methods
+class BulkReadResult(BaseModel):
+    """
+    Schema for returning the number of affected rows of a bulk read or unread
+    """
+
+    affected: int = 0
+
+
 # pylint: disable=too-few-public-methods
 class FollowingFeedsCreateResult(BaseModel):
     """
@@ -125,3 +146,80 @@ class OrderByLastUpdate(Enum):
 
     LAST_UPDATE_ASCENDING = "last_update"
     LAST_UPDATE_DESCENDING = "-last_update"
+
+
+class JobStatus(Enum):
+    """
+    The states of a background job
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+# pylint: disable=too-few-public-methods
+class ImportJob(BaseModel):
+    """
+    Schema for the progress of an OPML import job
+    """
+
+    job_id: str
+    username: str
+    status: JobStatus = JobStatus.PENDING
+    total: int = 0
+    reused: int = 0
+    fetched: int = 0
+    failed_links: List[str] = []
+    followed: int = 0
+
+    class Config:
+        """schema config"""
+
+        orm_mode = True
+
+
+class FeedJobKind(Enum):
+    """
+    The kinds of feed jobs which are run by the scheduler service
+    """
+
+    FOLLOW = "follow"
+    FORCE_UPDATE = "force_update"
+
+
+# pylint: disable=too-few-public-methods
+class FeedJobItem(BaseModel):
+    """
+    Schema for the status of a feed job
+    """
+
+    job_id: str
+    kind: FeedJobKind
+    username: str
+    link: str
+    status: JobStatus
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        """schema config"""
+
+        orm_mode = True
+
+
+# pylint: disable=too-few-public-methods
+class RetentionStats(BaseModel):
+    """
+    Schema for the result of a retention run
+    """
+
+    feeds: int = 0
+    pruned: int = 0
+    archived: int = 0
+    read_marks: int = 0
+    batches: int = 0
+    seconds: float = 0.0
@@ -1,18 +1,155 @@
 """
 Feed database Service, containing functions to fetch data
 """
-from typing import List, Optional, Sequence, Tuple
-import pydash as _
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type, cast
+import aiohttp
 from sqlalchemy.ext.asyncio import async_scoped_session
-from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import select, text, Row, delete, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, text, Row, delete, update, tuple_, func, Select, ColumnElement, DateTime
+from sqlalchemy import and_, or_, not_, true, false, literal, case
+from sqlalchemy.orm import selectinload, InstrumentedAttribute
 
 from sendcloud.models import Feed, User, Posting, user_feed, read_postings
-from sendcloud.schemas import FeedItemCreate, PostingItemCreate, OrderByLastUpdate
-from sendcloud.utils import fetch_feed
-from sendcloud.utils import value_error
-from .users_services import get_user_by_username
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate, PostingItem, OrderByLastUpdate
+from sendcloud.schemas import ImportJob, JobStatus
+from sendcloud.utils import fetch_feed, get_session, SingleFlight, read_only, Base
+from sendcloud.utils import link_hashes
+from sendcloud.utils import settings
+from sendcloud.utils import upsert_insert, conflict_target
+from sendcloud.utils import value_error, execute_rowcount
+from sendcloud.utils import span
+from .users_services import get_user_by_username, bump_user_version, bump_users_version
+from .jobs_services import get_import_job, save_import_job
+from .retention_services import feed_retention_policy, retained_postings
+
+logger = logging.getLogger(__name__)
+
+# the fetches and upserts of the same feed which run at the same time in this process are shared
+feed_refreshes: SingleFlight[Optional[int]] = SingleFlight(settings.single_flight_ttl)
+
+# the feeds which are being refreshed in the background by follow_new_feed
+__background_refreshes: Dict[str, asyncio.Task] = {}
+
+# rows of a multi row insert, it keeps the bind parameters of the postings below the limits of the drivers
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+def __has_link(model: Type[Base], link: str) -> ColumnElement[bool]:
+    """
+    Matches the row of a link through the index of its hash, the link itself is compared in case of a collision
+    :param model: Feed or Posting
+    :param link: the link
+    :return: boolean sql expression
+    """
+    return and_(model.link_hash.in_(link_hashes(link)), model.link == link)
+
+
+def __has_links(model: Type[Base], links: Sequence[str]) -> ColumnElement[bool]:
+    """
+    Matches the rows of many links through the index of their hashes
+    :param model: Feed or Posting
+    :param links: the links
+    :return: boolean sql expression
+    """
+    return and_(model.link_hash.in_([value for link in links for value in link_hashes(link)]), model.link.in_(links))
+
+
+async def __link_hash_candidates(
+    model: Type[Base], rows: List[Dict[str, Any]], key: Sequence[str], session: async_scoped_session
+) -> List[List[int]]:
+    """
+    The link hashes a row may be stored with, the hash of a stored link or the probes of a new one
+    :param model: Feed or Posting
+    :param rows: the rows with distinct keys
+    :param key: the columns which identify a row, the link and the other columns of the constraint
+    :param session: database session
+    :return: the candidate hashes of every row, in the order of the rows
+    """
+    stmt = select(model.link_hash, *[getattr(model, column) for column in key])
+    stmt = stmt.where(__has_links(model, [row["link"] for row in rows]))
+    for column in key:
+        if column != "link":
+            stmt = stmt.where(getattr(model, column).in_({row[column] for row in rows}))
+    # the stored rows are locked, so they are not pruned before they are updated
+    known = {tuple(values): value for value, *values in (await session.execute(stmt.with_for_update())).all()}
+    return [
+        [known[row_key]] if (row_key := tuple(row[column] for column in key)) in known else link_hashes(row["link"])
+        for row in rows
+    ]
+
+
+def __probe_batch(
+    rows: List[Dict[str, Any]], key: Sequence[str], candidates: List[List[int]], probes: Dict[int, int]
+) -> Dict[int, Dict[str, Any]]:
+    """
+    The rows of the next upsert, each with the hash of its current probe
+    :param rows: the rows with distinct keys
+    :param key: the columns which identify a row, the link and the other columns of the constraint
+    :param candidates: the candidate hashes of every row
+    :param probes: the current probe by the index of the rows which are not stored yet
+    :return: the rows to be upserted by their index
+    :raise ValueError: in case a row has no candidate hash left
+    """
+    batch: Dict[int, Dict[str, Any]] = {}
+    targets = set()
+    for index, probe in probes.items():
+        if probe >= len(candidates[index]):
+            raise ValueError(f"no free link hash for {rows[index]['link']}")
+        value = candidates[index][probe]
+        # a statement can only touch a conflict target once, a colliding row waits for the next round
+        if (target := (value, *[rows[index][column] for column in key if column != "link"])) not in targets:
+            targets.add(target)
+            batch[index] = {**rows[index], "link_hash": value}
+    return batch
+
+
+async def __upsert_by_link(
+    model: Type[Base], rows: List[Dict[str, Any]], constraint: str, key: Sequence[str], session: async_scoped_session
+) -> Dict[Tuple, int]:
+    """
+    Inserts or updates rows whose conflict target is the hash of their link. A stored link keeps the hash it has been
+    stored with, the probe before it may have been freed since, e.g. by the retention. The conflict only updates the
+    row of the same link, a new row whose hash is taken by another link is tried again with the next probe of its link
+    :param model: Feed or Posting
+    :param rows: the rows with distinct keys
+    :param constraint: the unique constraint of the link hash
+    :param key: the columns which identify a row, the link and the other columns of the constraint
+    :param session: database session
+    :return: the primary keys by the values of the key columns
+    """
+    candidates = await __link_hash_candidates(model, rows, key, session)
+    stored: Dict[Tuple, int] = {}
+    probes = dict.fromkeys(range(len(rows)), 0)
+    while probes:
+        batch = __probe_batch(rows, key, candidates, probes)
+        stmt = upsert_insert(model, session).values(list(batch.values()))
+        stmt = stmt.on_conflict_do_update(
+            **conflict_target(model, constraint, session),
+            set_={column: stmt.excluded[column] for column in rows[0]},
+            where=model.link == stmt.excluded.link,
+        ).returning(model.pk, *[getattr(model, column) for column in key])
+        for row_pk, *values in (await session.execute(stmt)).all():
+            stored[tuple(values)] = row_pk
+        for index in batch:
+            if tuple(rows[index][column] for column in key) in stored:
+                del probes[index]
+            else:
+                probes[index] += 1
+    return stored
+
+
+async def __upsert_postings(posting_rows: List[Dict[str, Any]], session: async_scoped_session) -> None:
+    """
+    Inserts or updates postings in chunks
+    :param posting_rows: the postings with distinct (link, feed_id)
+    :param session: database session
+    :return: None
+    """
+    for start in range(0, len(posting_rows), BULK_INSERT_CHUNK_SIZE):
+        chunk = posting_rows[start : start + BULK_INSERT_CHUNK_SIZE]
+        await __upsert_by_link(Posting, chunk, "postings_link_hash_key", ["link", "feed_id"], session)
 
 
 async def insert_or_update_feed(
@@ -25,22 +162,24 @@ async def insert_or_update_feed(
     :param session: databse session
     :return: the primary key of the newly added feed
     """
-    feed_dict = feed.dict(exclude={"postings"})
-    feed_stmt = insert(Feed).values(feed_dict).on_conflict_do_update(constraint="feeds_link_key", set_=feed_dict)
-    res = await session.execute(feed_stmt)
-
-    feed_pk: int = res.inserted_primary_key[0]  # type: ignore
-    for cur in postings:
-        postings_dict = cur.dict()
-        postings_dict.update({"feed_id": feed_pk})
-        postings_stmt = (
-            insert(Posting)
-            .values(postings_dict)
-            .on_conflict_do_update(constraint="postings_link_key", set_=postings_dict)
+    with span("upsert_feed", link=feed.link, entries=len(postings)):
+        refreshed_at = datetime.utcnow()
+        feed_dict = {**feed.dict(exclude={"postings"}), "refreshed_at": refreshed_at}
+        # the title of the feed is part of the user list, a new feed is not followed by anyone yet
+        stored_title = await session.scalar(select(Feed.title).where(__has_link(Feed, feed.link)).with_for_update())
+        feed_pk = (await __upsert_by_link(Feed, [feed_dict], "feeds_link_hash_key", ["link"], session))[(feed.link,)]
+        # the postings the retention would prune are not stored again at every refresh
+        policy_stmt = select(Feed.retention_max_age_days, Feed.retention_max_postings).where(Feed.pk == feed_pk)
+        max_age_days, max_postings = (await session.execute(policy_stmt)).one()
+        postings = retained_postings(postings, *feed_retention_policy(max_age_days, max_postings), refreshed_at)
+        # a link can only be upserted once per statement, the posting which comes last wins as it would one by one
+        await __upsert_postings(
+            list({posting.link: {**posting.dict(), "feed_id": feed_pk} for posting in postings}.values()), session
         )
-        await session.execute(postings_stmt)
-    await session.commit()
-    return feed_pk
+        if stored_title is not None and stored_title != feed.title:
+            await bump_users_version(session)
+        await session.commit()
+        return feed_pk
 
 
 async def get_feed_by_pk(feed_pk: int, session: async_scoped_session) -> Optional[Row[Tuple[Feed]]]:
@@ -50,44 +189,95 @@ async def get_feed_by_pk(feed_pk: int, session: async_scoped_session) -> Optiona
     :param session: database session
     :return: returns a feed if exists
     """
-    stmt = select(Feed).where(Feed.pk == feed_pk).options(selectinload(Feed.postings))
-    return (await session.execute(stmt)).one_or_none()
+    with span("get_feed_by_pk", feed_pk=feed_pk):
+        stmt = select(Feed).where(Feed.pk == feed_pk).options(selectinload(Feed.postings))
+        return (await session.execute(stmt)).one_or_none()
+
+
+async def __fetch_and_store_feed(link: str) -> Optional[int]:
+    """
+    Fetches a feed and stores the update of the feed and its postings in a session of its own
+    :param link: feed unique identifier
+    :return: the primary key of the feed or None if it could not be fetched
+    """
+    with span("refresh_feed", link=link):
+        loaded_feed, loaded_postings = await fetch_feed(link)
+        if not loaded_feed or not loaded_postings:
+            return None
+        session: async_scoped_session
+        async with get_session() as session:
+            return await insert_or_update_feed(loaded_feed, loaded_postings, session)
+
+
+async def refresh_feed(link: str) -> Optional[int]:
+    """
+    Fetches and stores a feed, the concurrent refreshes of the same feed in this process share one fetch and upsert
+    :param link: feed unique identifier
+    :return: the primary key of the feed or None if it could not be fetched
+    """
+    return await feed_refreshes.run(link, lambda: __fetch_and_store_feed(link))
+
+
+def __queue_background_refresh(link: str) -> None:
+    """
+    Refreshes a feed in the background of the running loop, a feed is only refreshed once at a time
+    :param link: feed unique identifier
+    :return: None
+    """
+    if link in __background_refreshes:
+        return
+    task = asyncio.get_running_loop().create_task(refresh_feed(link))
+    __background_refreshes[link] = task
+    task.add_done_callback(lambda _task: __background_refreshes.pop(link, None))
 
 
 async def follow_new_feed(username: str, link: str, session: async_scoped_session) -> Optional[Feed]:
     """
-    Follow a new existing feed or completely new feed which need to be fetched
+    Follow a new existing feed or completely new feed which need to be fetched. A stored feed is followed right away,
+    when it has not been refreshed within settings.feed_freshness_window it is refreshed in the background, so only
+    the feeds which are not stored yet are fetched while the user waits
     :param username: user unique identifier
     :param link: feed unique identifier
     :param session: database session
     :return: returns the followed feed if possible otherwise returns None
     """
-    # checking if the user exists and if the feed has been followed already or not!
-    stmt = (
-        select(User)
-        .where(User.username == username)
-        .options(selectinload(User.followed_feeds).options(selectinload(Feed.postings)))
-    )
-    user = (await session.execute(stmt)).one_or_none()
-    if user is None:
-        return None
-    user_pk = user[0].pk
-    # return the feed if it was already followed
-    if retrieved_feed := _.find(user[0].followed_feeds, lambda item: item.link == link):
-        return retrieved_feed
-    # in case the feed is new then we try to fetch it (we haven't check if it already exists because for the
-    # first time user would like to see the most updated posts)
-    loaded_feed, loaded_postings = await fetch_feed(link)
-    if loaded_feed and loaded_postings:
-        feed_pk = await insert_or_update_feed(loaded_feed, loaded_postings, session)
-        if feed_pk is not None:
-            values = {"user_pk": user_pk, "feed_pk": feed_pk}
-            stmt_rel = insert(user_feed).values(values).on_conflict_do_nothing(constraint="user_feed_pkey")
-            await session.execute(stmt_rel)
+    with span("follow_new_feed", link=link, username=username) as follow_span:
+        with span("get_user"):
+            user = await get_user_by_username(username, session)
+        if user is None:
+            return None
+        user_pk = user.pk
+
+        with span("lookup_feed", link=link):
+            stmt = (
+                select(Feed, user_feed.c.user_pk)
+                .outerjoin(user_feed, and_(user_feed.c.feed_pk == Feed.pk, user_feed.c.user_pk == user_pk))
+                .where(__has_link(Feed, link))
+                .options(selectinload(Feed.postings))
+            )
+            feed, followed_by = (await session.execute(stmt)).one_or_none() or (None, None)
+        follow_span.set_attribute("stored", feed is not None)
+        # return the feed if it was already followed
+        if followed_by is not None:
+            return feed
+        if feed is None:
+            feed_pk = await refresh_feed(link)
+            if feed_pk is None or (loaded := await get_feed_by_pk(feed_pk, session)) is None:
+                return None
+            feed = loaded[0]
+        elif feed.refreshed_at is None or feed.refreshed_at < datetime.utcnow() - settings.feed_freshness_window:
+            __queue_background_refresh(link)
+
+        with span("insert_follow", feed_pk=feed.pk):
+            values = {"user_pk": user_pk, "feed_pk": feed.pk}
+            follow_stmt = upsert_insert(user_feed, session).values(values)
+            await session.execute(
+                follow_stmt.on_conflict_do_nothing(**conflict_target(user_feed, "user_feed_pkey", session))
+            )
+            await bump_user_version(username, session)
+            await bump_users_version(session)
             await session.commit()
-            if feed := await get_feed_by_pk(feed_pk, session):
-                return feed[0]
-    return None
+        return feed
 
 
 async def unfollow_feed(username: str, feed_link: str, session: async_scoped_session) -> bool:
@@ -104,99 +294,289 @@ async def unfollow_feed(username: str, feed_link: str, session: async_scoped_ses
         return False
 
     # Second fetch the feed
-    stmt = select(Feed).options(selectinload(Feed.postings)).where(Feed.link == feed_link)
-    feed = (await session.execute(stmt)).one_or_none()
+    stmt = select(Feed).where(__has_link(Feed, feed_link))
+    feed = (await session.execute(stmt)).scalar_one_or_none()
     if feed is None:
         return False
 
-    # Third if all checks passed then we can unfollow the feed!
-    feed = feed[0]
+    # Third if all checks passed then we can unfollow the feed, the read watermark goes away with the relationship
     unfollow_feed_stmt = text("delete from user_feed where user_pk=:user_pk and feed_pk=:feed_pk")
     await session.execute(unfollow_feed_stmt, {"user_pk": user.pk, "feed_pk": feed.pk})  # type: ignore
 
     # Forth we need to clean the read history
     delete_stmt = delete(read_postings).where(
-        User.pk == user.pk, Posting.pk.in_(_.map_(feed.postings, lambda index: index.pk))  # type: ignore
+        read_postings.c.user_pk == user.pk,
+        read_postings.c.posting_pk.in_(select(Posting.pk).where(Posting.feed_id == feed.pk)),
     )
     await session.execute(delete_stmt)
+    await bump_user_version(username, session)
+    await bump_users_version(session)
     await session.commit()
     return True
 
 
+def __followed_postings_stmt(
+    username: str, links: Optional[List[str]], feed_link: Optional[str], until: Optional[datetime]
+) -> Select:
+    """
+    Selects (posting_pk, user_pk) of the postings which belong to the feeds followed by the user
+    :param username: the user unique identifier
+    :param links: only the postings with these links
+    :param feed_link: only the postings of this feed
+    :param until: only the postings published up to this moment
+    :return: select statement
+    """
+    stmt = (
+        select(Posting.pk.label("posting_pk"), User.pk.label("user_pk"))
+        .join(user_feed, user_feed.c.feed_pk == Posting.feed_id)
+        .join(User, User.pk == user_feed.c.user_pk)
+        .where(User.username == username)
+    )
+    if links is not None:
+        stmt = stmt.where(__has_links(Posting, links))
+    if feed_link is not None:
+        stmt = stmt.join(Feed, Feed.pk == Posting.feed_id).where(__has_link(Feed, feed_link))
+    if until is not None:
+        stmt = stmt.where(Posting.published_at <= until)
+    return stmt
+
+
+def __is_read_clause() -> ColumnElement[bool]:
+    """
+    A posting is read when its read_postings exception says so, otherwise when it is published before the read
+    watermark of the followed feed, it needs postings joined with user_feed and outer joined with read_postings
+    :return: boolean sql expression
+    """
+    # pylint: disable=not-callable
+    return func.coalesce(read_postings.c.is_read, Posting.published_at <= user_feed.c.read_until, false())
+
+
+def __user_feeds_clause(username: str, feed_link: Optional[str]) -> ColumnElement[bool]:
+    """
+    Filters the user_feed rows of a user and optionally a single feed
+    :param username: the user unique identifier
+    :param feed_link: only the relationship with this feed
+    :return: boolean sql expression
+    """
+    clause = user_feed.c.user_pk == select(User.pk).where(User.username == username).scalar_subquery()
+    if feed_link is not None:
+        clause = and_(
+            clause, user_feed.c.feed_pk == select(Feed.pk).where(__has_link(Feed, feed_link)).scalar_subquery()
+        )
+    return clause
+
+
+async def __upsert_read_exceptions(postings_stmt: Select, is_read: bool, session: async_scoped_session) -> int:
+    """
+    Writes the read state of the selected (posting_pk, user_pk) as read_postings exceptions
+    :param postings_stmt: the selected postings
+    :param is_read: the read state to write
+    :param session: database async session
+    :return: number of affected rows
+    """
+    upsert_stmt = upsert_insert(read_postings, session).from_select(
+        ["posting_pk", "user_pk", "is_read"], postings_stmt.add_columns(true() if is_read else false())
+    )
+    upsert_stmt = upsert_stmt.on_conflict_do_update(
+        **conflict_target(read_postings, "read_postings_pkey", session), set_={"is_read": upsert_stmt.excluded.is_read}
+    )
+    return await execute_rowcount(upsert_stmt, session)
+
+
 async def make_posting_read(username: str, posting_link: str, session: async_scoped_session) -> bool:
     """
-    Adds a posting to user seen collection postings
+    Adds a posting to user seen collection postings. The user, the posting and the followed feed are resolved by the
+    same statement which writes the read mark, an already read posting is updated so it still counts as qualified
     :param username: the user unique identifier
     :param posting_link: the posting unique identifier
     :param session: database async session
     :return: True if user is eligible to read the posting
     """
-    # First we fetch the user
-    user = await get_user_by_username(username, session)
-    if user is None:
-        return False
-
-    # Second we check posting existence
-    stmt = select(Posting).where(Posting.link == posting_link)
-    posting = (await session.execute(stmt)).one_or_none()
-    if posting is None:
-        return False
-
-    # Third we check the related feed is followed by the user
-    user_feed_stmt = text("select * from user_feed where feed_pk = :feed_pk and user_pk = :user_pk")
-    user_is_allowed_to_read = (
-        await session.execute(user_feed_stmt, {"feed_pk": posting[0].feed_id, "user_pk": user.pk})
-    ).one_or_none()
-    if user_is_allowed_to_read is None:
-        return False
-
-    # Forth if all check passed then we can make the posting read!
-    posting_read_stmt = (
-        insert(read_postings)
-        .values({"user_pk": user.pk, "posting_pk": posting[0].pk})
-        .on_conflict_do_nothing(constraint="read_postings_pkey")
+    affected = await __upsert_read_exceptions(
+        __followed_postings_stmt(username, [posting_link], None, None), True, session
     )
-    await session.execute(posting_read_stmt)
+    if affected:
+        await bump_user_version(username, session)
     await session.commit()
-    return True
+    return affected > 0
 
 
 async def make_posting_unread(username: str, posting_link: str, session: async_scoped_session) -> bool:
     """
-    Removes a posting from users seen collection
+    Removes a posting from users seen collection. The user, the posting and the followed feed are resolved by the
+    same statement which writes the unread mark, so the read marks of the other users stay untouched
     :param username: the user unique identifier
     :param posting_link: the posting unique identifier
     :param session: database async session
     :return: True if user is eligible to unread the posting
     """
-    # First we fetch the user
-    user = await get_user_by_username(username, session)
-    if user is None:
-        return False
+    affected = await __upsert_read_exceptions(
+        __followed_postings_stmt(username, [posting_link], None, None), False, session
+    )
+    if affected:
+        await bump_user_version(username, session)
+    await session.commit()
+    return affected > 0
 
-    # Second fetch the posting id and also check if it exists
-    stmt = select(Posting).where(Posting.link == posting_link)
-    posting = (await session.execute(stmt)).one_or_none()
-    if posting is None:
-        return False
 
-    # Third if all checks passed then we can make the posting unread!
-    posting_unread_stmt = delete(read_postings).where(Posting.link == posting_link)
-    await session.execute(posting_unread_stmt)
+async def make_postings_read(
+    username: str,
+    session: async_scoped_session,
+    links: Optional[List[str]] = None,
+    feed_link: Optional[str] = None,
+    until: Optional[datetime] = None,
+) -> int:
+    """
+    Marks all the matching postings of the followed feeds as read. The given links are written as exceptions, a whole
+    feed or everything up to a moment moves the read watermark forward and drops the exceptions it covers
+    :param username: the user unique identifier
+    :param session: database async session
+    :param links: only the postings with these links
+    :param feed_link: only the postings of this feed
+    :param until: only the postings published up to this moment
+    :return: number of affected rows
+    """
+    if links is not None:
+        affected = await __upsert_read_exceptions(
+            __followed_postings_stmt(username, links, feed_link, until), True, session
+        )
+        if affected:
+            await bump_user_version(username, session)
+        await session.commit()
+        return affected
+
+    # the watermark of a whole feed moves to its newest posting, feeds without postings are left alone
+    # pylint: disable=not-callable
+    read_until = (
+        literal(until, DateTime)
+        if until is not None
+        else select(func.max(Posting.published_at)).where(Posting.feed_id == user_feed.c.feed_pk).scalar_subquery()
+    )
+    watermark_stmt = (
+        update(user_feed)
+        .where(
+            __user_feeds_clause(username, feed_link),
+            true() if until is not None else read_until.isnot(None),
+            or_(user_feed.c.read_until.is_(None), user_feed.c.read_until < read_until),
+        )
+        .values({"read_until": read_until})
+    )
+    exceptions_stmt = delete(read_postings).where(
+        tuple_(read_postings.c.posting_pk, read_postings.c.user_pk).in_(
+            __followed_postings_stmt(username, None, feed_link, until)
+        )
+    )
+    affected = await execute_rowcount(watermark_stmt, session) + await execute_rowcount(exceptions_stmt, session)
+    if affected:
+        await bump_user_version(username, session)
     await session.commit()
-    return True
+    return affected
+
+
+async def make_postings_unread(
+    username: str,
+    session: async_scoped_session,
+    links: Optional[List[str]] = None,
+    feed_link: Optional[str] = None,
+    until: Optional[datetime] = None,
+) -> int:
+    """
+    Marks all the matching postings of the followed feeds as unread. The given links are written as exceptions, a
+    whole feed or everything up to a moment resets the read watermarks which don't reach past it and only writes
+    exceptions for the postings of the watermarks which do
+    :param username: the user unique identifier
+    :param session: database async session
+    :param links: only the postings with these links
+    :param feed_link: only the postings of this feed
+    :param until: only the postings published up to this moment
+    :return: number of affected rows
+    """
+    affected = 0
+    if links is not None:
+        affected = await __upsert_read_exceptions(
+            __followed_postings_stmt(username, links, feed_link, until), False, session
+        )
+        if affected:
+            await bump_user_version(username, session)
+        await session.commit()
+        return affected
+
+    if until is not None:
+        # the watermarks which reach past the moment stay, so their postings need explicit unread marks
+        affected += await __upsert_read_exceptions(
+            __followed_postings_stmt(username, None, feed_link, until).where(user_feed.c.read_until > until),
+            False,
+            session,
+        )
+    watermark_stmt = (
+        update(user_feed)
+        .where(
+            __user_feeds_clause(username, feed_link),
+            user_feed.c.read_until.isnot(None),
+            user_feed.c.read_until <= until if until is not None else true(),
+        )
+        .values({"read_until": None})
+    )
+    affected += await execute_rowcount(watermark_stmt, session)
+    exceptions_stmt = delete(read_postings).where(
+        tuple_(read_postings.c.posting_pk, read_postings.c.user_pk).in_(
+            __followed_postings_stmt(username, None, feed_link, until).where(user_feed.c.read_until.is_(None))
+        )
+    )
+    affected += await execute_rowcount(exceptions_stmt, session)
+    if affected:
+        await bump_user_version(username, session)
+    await session.commit()
+    return affected
 
 
-def __get_feed_ids(feed_link: Optional[str], feed_collection: List[Feed]) -> List[int]:
-    filtered_feeds = (
-        _.filter_(feed_collection, lambda index: index.link == feed_link and index.active)
-        if feed_link is not None
-        else _.filter_(feed_collection, lambda index: index.active)
+def __posting_columns(fields: Optional[Sequence[str]]) -> List[InstrumentedAttribute]:
+    """
+    The posting columns of the requested PostingItem fields
+    :param fields: names of the fields, all the fields of PostingItem when None
+    :return: the columns in the requested order
+    """
+    if fields is None:
+        return [getattr(Posting, field) for field in PostingItem.__fields__]
+    if unknown := [field for field in fields if field not in PostingItem.__fields__]:
+        value_error(f"unknown fields: {', '.join(unknown)}")
+    if not fields:
+        value_error("at least one field is required")
+    return [getattr(Posting, field) for field in dict.fromkeys(fields)]
+
+
+def __following_postings_stmt(
+    username: str, feed_link: Optional[str], is_read: Optional[bool], fields: Optional[Sequence[str]] = None
+) -> Select:
+    """
+    The PostingItem columns of the postings of the active feeds followed by a user. The read status is resolved in the
+    same query from the read watermark of user_feed and the read_postings exceptions
+    :param username: user unique identifier
+    :param feed_link: only the postings of this feed
+    :param is_read: posting has been read by the user or not
+    :param fields: only these columns are selected, all the fields of PostingItem when None
+    :return: the select statement
+    """
+    stmt = (
+        select(*__posting_columns(fields))
+        .join(user_feed, user_feed.c.feed_pk == Posting.feed_id)
+        .join(User, User.pk == user_feed.c.user_pk)
+        .join(Feed, Feed.pk == Posting.feed_id)
+        .where(User.username == username, Feed.active == True)  # pylint: disable=singleton-comparison
     )
-    return _.map_(filtered_feeds, lambda index: int(index.pk))
+    if feed_link is not None:
+        stmt = stmt.where(__has_link(Feed, feed_link))
+
+    if is_read is not None:
+        stmt = stmt.outerjoin(
+            read_postings,
+            and_(read_postings.c.posting_pk == Posting.pk, read_postings.c.user_pk == user_feed.c.user_pk),
+        ).where(__is_read_clause() if is_read else not_(__is_read_clause()))
+    return stmt
 
 
 # pylint: disable=too-many-arguments
+@read_only
 async def filter_following_feed_postings(
     username: str,
     feed_link: Optional[str],
@@ -205,9 +585,11 @@ async def filter_following_feed_postings(
     session: async_scoped_session,
     offset: int = 0,
     limit: int = 10,
+    fields: Optional[Sequence[str]] = None,
 ) -> Sequence[Row]:
     """
-    Filters the user's postings based on the last update, read status and feed
+    Filters the user's postings based on the last update, read status and feed. Only the columns of PostingItem are
+    selected, so the rows can be encoded without loading and validating the ORM objects
     :param username: user unique identifier
     :param feed_link: user unique identifier
     :param is_read: posting has been read by the user or not
@@ -215,32 +597,97 @@ async def filter_following_feed_postings(
     :param session: database session
     :param offset:
     :param limit:
+    :param fields: only these fields of PostingItem are selected, e.g. without the large description for list views
     :return:
     """
-    user_detailed_stmt = select(User).options(selectinload(User.followed_feeds)).where(User.username == username)
-    user_detailed = await session.scalar(user_detailed_stmt)
-    if user_detailed is None:
-        value_error("user not found")
-        return []
-
     order_stm = (
         Posting.updated_at.desc() if order_by == OrderByLastUpdate.LAST_UPDATE_DESCENDING else Posting.updated_at.asc()
     )
 
-    stmt = select(Posting).where(Posting.feed_id.in_(__get_feed_ids(feed_link, user_detailed.followed_feeds)))
-
-    if is_read is not None:
-        read_posting_ids_stmt = text("select posting_pk from read_postings where user_pk = :user_pk")
-        read_posting_ids = [
-            cur[0] for cur in (await session.execute(read_posting_ids_stmt, {"user_pk": user_detailed.pk})).all()
-        ]
-        stmt = stmt.where(Posting.pk.in_(read_posting_ids) if is_read else Posting.pk.notin_(read_posting_ids))
-
+    stmt = __following_postings_stmt(username, feed_link, is_read, fields)
     stmt = stmt.order_by(order_stm).offset(offset).limit(limit)
-    postings = (await session.scalars(stmt)).all()
+    postings = (await session.execute(stmt)).all()
+    # the user is only looked up when there is nothing to return
+    if not postings and await get_user_by_username(username, session) is None:
+        value_error("user not found")
     return postings
 
 
+@read_only
+async def get_following_postings_version(username: str, session: async_scoped_session) -> Optional[Tuple[Any, ...]]:
+    """
+    A version token of the postings of a user, it changes when the user follows, unfollows or reads, when a followed
+    feed is refreshed, pruned by the retention or when it is activated or deactivated. It is resolved from the user's
+    row and the followed feeds only, without touching the postings
+    :param username: user unique identifier
+    :param session: database session
+    :return: the token or None if the user doesn't exist
+    """
+    # pylint: disable=not-callable
+    stmt = (
+        select(
+            User.pk,
+            User.version,
+            func.count(Feed.pk),
+            func.max(Feed.refreshed_at),
+            func.max(Feed.pruned_at),
+            func.sum(case((Feed.active == True, 1), else_=0)),  # pylint: disable=singleton-comparison
+        )
+        .outerjoin(user_feed, user_feed.c.user_pk == User.pk)
+        .outerjoin(Feed, Feed.pk == user_feed.c.feed_pk)
+        .where(User.username == username)
+        .group_by(User.pk, User.version)
+    )
+    if token := (await session.execute(stmt)).one_or_none():
+        return tuple(token)
+    return None
+
+
+async def __partitions(stmt: Select, session: async_scoped_session) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams the result of a statement from a server side cursor
+    :param stmt: the select statement with the yield_per execution option
+    :param session: database session
+    :return: the partitions of yield_per rows
+    """
+    result = await session.stream(stmt)
+    async for partition in result.partitions():
+        yield partition
+
+
+# pylint: disable=too-many-arguments
+async def stream_following_feed_postings(
+    username: str,
+    feed_link: Optional[str],
+    is_read: Optional[bool],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    session: async_scoped_session,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams all the postings of the followed feeds in batches of settings.export_batch_size rows, the postings are
+    ordered by their primary key and fetched from a server side cursor, so only one batch is kept in memory. The user
+    is checked before streaming, so an invalid user is still rejected with a proper response
+    :param username: user unique identifier
+    :param feed_link: only the postings of this feed
+    :param is_read: posting has been read by the user or not
+    :param since: only the postings which are published at or after this moment
+    :param until: only the postings which are published at or before this moment
+    :param session: database session, it holds the connection until the stream is consumed
+    :return: async iterator of row batches
+    """
+    if await get_user_by_username(username, session) is None:
+        value_error("user not found")
+
+    stmt = __following_postings_stmt(username, feed_link, is_read)
+    if since is not None:
+        stmt = stmt.where(Posting.published_at >= since)
+    if until is not None:
+        stmt = stmt.where(Posting.published_at <= until)
+    stmt = stmt.order_by(Posting.pk).execution_options(yield_per=settings.export_batch_size)
+    return __partitions(stmt, session)
+
+
 async def get_feeds_to_be_scheduled(session: async_scoped_session) -> List[Feed]:
     """
     Returns a list of feed links to be scheduled
@@ -251,6 +698,47 @@ async def get_feeds_to_be_scheduled(session: async_scoped_session) -> List[Feed]
     return (await session.execute(stmt)).all()  # type: ignore
 
 
+async def get_schedulable_feeds(
+    after_pk: int,
+    limit: int,
+    session: async_scoped_session,
+    refreshed_since: Optional[datetime] = None,
+    up_to_pk: Optional[int] = None,
+) -> Sequence[Row[Tuple[int, str, Optional[datetime]]]]:
+    """
+    A page of the active feeds in the order of their pks, to sync the registry of the scheduler
+    :param after_pk: the page starts after this pk
+    :param limit: the size of the page
+    :param session: the database session
+    :param refreshed_since: only the feeds which have been refreshed since this time
+    :param up_to_pk: only the feeds up to this pk
+    :return: the pk, the link and the refresh time of the feeds
+    """
+    stmt = (
+        select(Feed.pk, Feed.link, Feed.refreshed_at)
+        .where(Feed.active == True, Feed.pk > after_pk)  # pylint: disable=singleton-comparison
+        .order_by(Feed.pk)
+        .limit(limit)
+    )
+    if refreshed_since is not None:
+        stmt = stmt.where(Feed.refreshed_at >= refreshed_since)
+    if up_to_pk is not None:
+        stmt = stmt.where(Feed.pk <= up_to_pk)
+    # refreshed_at is None for a feed which has never been refreshed, its column is not typed as nullable
+    return cast(Sequence[Row[Tuple[int, str, Optional[datetime]]]], (await session.execute(stmt)).all())
+
+
+async def get_feed_links(feed_pks: Sequence[int], session: async_scoped_session) -> Sequence[Row[Tuple[int, str]]]:
+    """
+    The links of the active feeds among the given ones
+    :param feed_pks: the feeds
+    :param session: the database session
+    :return: the pk and the link of the feeds
+    """
+    active = Feed.active == True  # pylint: disable=singleton-comparison
+    return (await session.execute(select(Feed.pk, Feed.link).where(Feed.pk.in_(feed_pks), active))).all()
+
+
 async def deactivate_background_refresh(feed_pk: int, session: async_scoped_session) -> None:
     """
     This function deactivates the background refresh for a feed unless someone updates it by force
@@ -280,13 +768,134 @@ async def force_update_feed(username: str, feed_link: str, session: async_scoped
         return False
     user_pk = user.pk
 
-    loaded_feed, loaded_postings = await fetch_feed(feed_link)
-    if loaded_feed and loaded_postings:
-        feed_pk = await insert_or_update_feed(loaded_feed, loaded_postings, session)
-        if feed_pk is not None:
-            values = {"user_pk": user_pk, "feed_pk": feed_pk}
-            stmt_rel = insert(user_feed).values(values).on_conflict_do_nothing(constraint="user_feed_pkey")
-            await session.execute(stmt_rel)
-            await session.commit()
-            return True
+    feed_pk = await refresh_feed(feed_link)
+    if feed_pk is not None:
+        values = {"user_pk": user_pk, "feed_pk": feed_pk}
+        stmt_rel = upsert_insert(user_feed, session).values(values)
+        stmt_rel = stmt_rel.on_conflict_do_nothing(**conflict_target(user_feed, "user_feed_pkey", session))
+        await session.execute(stmt_rel)
+        await bump_user_version(username, session)
+        await bump_users_version(session)
+        await session.commit()
+        return True
     return False
+
+
+async def __fetch_feeds(job: ImportJob, links: List[str]) -> List[Tuple[FeedItemCreate, List[PostingItemCreate]]]:
+    """
+    Fetches the feeds concurrently, at most settings.opml_import_concurrency at the same time over a shared http client
+    :param job: the import job which reports the progress
+    :param links: the feed links to be fetched
+    :return: the successfully loaded feeds with their postings
+    """
+    semaphore = asyncio.Semaphore(settings.opml_import_concurrency)
+
+    async with aiohttp.ClientSession() as client:
+
+        async def fetch(link: str) -> Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]:
+            async with semaphore:
+                loaded_feed, loaded_postings = await fetch_feed(link, client)
+            if loaded_feed and loaded_postings:
+                job.fetched += 1
+            else:
+                job.failed_links.append(link)
+            return loaded_feed, loaded_postings
+
+        loaded = await asyncio.gather(*[fetch(link) for link in links])
+    return [(feed, postings) for feed, postings in loaded if feed and postings]
+
+
+async def __bulk_insert_feeds(
+    loaded: List[Tuple[FeedItemCreate, List[PostingItemCreate]]], session: async_scoped_session
+) -> List[int]:
+    """
+    Inserts or updates many feeds with one statement and their postings with one statement per chunk
+    :param loaded: the feeds with their postings
+    :param session: database session
+    :return: the primary keys of the feeds
+    """
+    if not loaded:
+        return []
+    refreshed_at = datetime.utcnow()
+    # the feeds are new, the global retention policy applies to them
+    policy = feed_retention_policy(None, None)
+    loaded = [(feed, retained_postings(postings, *policy, refreshed_at)) for feed, postings in loaded]
+    feed_rows = [{**feed.dict(), "refreshed_at": refreshed_at} for feed, postings in loaded]
+    stored = await __upsert_by_link(Feed, feed_rows, "feeds_link_hash_key", ["link"], session)
+    feed_pks: Dict[str, int] = {link: pk for (link,), pk in stored.items()}
+
+    # a link of a feed can only be upserted once per statement, the posting which comes last wins as it would one by one
+    posting_rows = list(
+        {
+            (posting.link, feed.link): {**posting.dict(), "feed_id": feed_pks[feed.link]}
+            for feed, postings in loaded
+            for posting in postings
+        }.values()
+    )
+    await __upsert_postings(posting_rows, session)
+    return list(feed_pks.values())
+
+
+async def import_feeds(job_id: str, links: List[str]) -> None:
+    """
+    Follows many feeds at once for the user of an import job. It runs after the response of the request is sent, so
+    it works in a session of its own
+    :param job_id: the import job unique identifier
+    :param links: the feed links to be followed
+    :return: None
+    """
+    session: async_scoped_session
+    async with get_session() as session:
+        job = await get_import_job(job_id, session)
+        if job is None:
+            logger.warning("[WARNING] Import job %s does not exist", job_id)
+            return
+        await __import_feeds(job, links, session)
+
+
+async def __import_feeds(job: ImportJob, links: List[str], session: async_scoped_session) -> None:
+    """
+    The feeds which are already stored are reused, the unknown ones are fetched concurrently and written in bulk
+    together with the user_feed rows. The progress is reported on the job and stored with it
+    :param job: the import job
+    :param links: the feed links to be followed
+    :param session: database session
+    :return: None
+    """
+    job.status = JobStatus.RUNNING
+    try:
+        user = await get_user_by_username(job.username, session)
+        if user is None:
+            job.status = JobStatus.FAILED
+            await save_import_job(job, session)
+            await session.commit()
+            return
+        user_pk = user.pk
+        stored_rows = (await session.execute(select(Feed.link, Feed.pk).where(__has_links(Feed, links)))).all()
+        stored_feeds: Dict[str, int] = {row.link: row.pk for row in stored_rows}
+        job.reused = len(stored_feeds)
+        await save_import_job(job, session)
+        # the connection goes back to the pool while the feeds are fetched
+        await session.commit()
+
+        loaded = await __fetch_feeds(job, [link for link in links if link not in stored_feeds])
+        feed_pks = list(stored_feeds.values()) + await __bulk_insert_feeds(loaded, session)
+        if feed_pks:
+            user_feed_stmt = (
+                upsert_insert(user_feed, session)
+                .values([{"user_pk": user_pk, "feed_pk": feed_pk} for feed_pk in feed_pks])
+                .on_conflict_do_nothing(**conflict_target(user_feed, "user_feed_pkey", session))
+            )
+            await session.execute(user_feed_stmt)
+            await bump_user_version(job.username, session)
+            await bump_users_version(session)
+        job.followed = len(feed_pks)
+        job.status = JobStatus.COMPLETED
+        await save_import_job(job, session)
+        await session.commit()
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        logger.error("[ERROR] Import job %s failed, kind: %s, message : %s", job.job_id, type(error), str(error))
+        await session.rollback()
+        job.status = JobStatus.FAILED
+        await save_import_job(job, session)
+        await session.commit()
@@ -0,0 +1,152 @@
+"""
+Jobs Service. The OPML import jobs run in the background tasks of the api process and their progress is stored in the
+database, so any api process can report it, the feed jobs are stored in the database and run by the scheduler service
+"""
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.ext.asyncio import async_scoped_session
+
+from sendcloud.models import FeedJob, ImportJobRecord
+from sendcloud.schemas import ImportJob, JobStatus, FeedJobKind
+from sendcloud.utils import settings
+from .users_services import get_user_by_username
+
+# a feed job which is still running after settings.feed_job_timeout is claimed again, at most this many times
+FEED_JOB_MAX_ATTEMPTS = 3
+
+
+async def create_import_job(username: str, total: int, session: async_scoped_session) -> ImportJob:
+    """
+    Stores a new pending import job
+    :param username: the user who imports the feeds
+    :param total: number of feeds to be imported
+    :param session: database session
+    :return: the new job
+    """
+    record = ImportJobRecord(username=username, status=JobStatus.PENDING.value, total=total)
+    session.add(record)
+    await session.flush()
+    job = ImportJob.from_orm(record)
+    await session.commit()
+    return job
+
+
+async def get_import_job(job_id: str, session: async_scoped_session) -> Optional[ImportJob]:
+    """
+    Retrieves an import job
+    :param job_id: job unique identifier
+    :param session: database session
+    :return: the job or None if it does not exist
+    """
+    stmt = select(ImportJobRecord).where(ImportJobRecord.job_id == job_id)
+    record = (await session.scalars(stmt)).one_or_none()
+    return None if record is None else ImportJob.from_orm(record)
+
+
+async def save_import_job(job: ImportJob, session: async_scoped_session) -> None:
+    """
+    Writes the progress of an import job, it is committed together with the rest of the transaction of the session
+    :param job: the import job
+    :param session: database session
+    :return: None
+    """
+    stmt = (
+        update(ImportJobRecord)
+        .where(ImportJobRecord.job_id == job.job_id)
+        .values(
+            status=job.status.value,
+            reused=job.reused,
+            fetched=job.fetched,
+            failed_links=job.failed_links,
+            followed=job.followed,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    await session.execute(stmt)
+
+
+async def enqueue_feed_job(
+    kind: FeedJobKind, username: str, link: str, session: async_scoped_session
+) -> Optional[FeedJob]:
+    """
+    Stores a pending feed job for the scheduler service
+    :param kind: what should be done with the feed
+    :param username: user unique identifier
+    :param link: feed unique identifier
+    :param session: database session
+    :return: the new job or None if the user does not exist
+    """
+    if await get_user_by_username(username, session) is None:
+        return None
+    job = FeedJob(kind=kind.value, username=username, link=link, status=JobStatus.PENDING.value)
+    session.add(job)
+    await session.flush()
+    # the job is returned as it has been stored, it is not loaded again after the commit
+    session.expunge(job)
+    await session.commit()
+    return job
+
+
+async def get_feed_job(job_id: str, session: async_scoped_session) -> Optional[FeedJob]:
+    """
+    Retrieves a feed job
+    :param job_id: job unique identifier
+    :param session: database session
+    :return: the job or None if it does not exist
+    """
+    return (await session.scalars(select(FeedJob).where(FeedJob.job_id == job_id))).one_or_none()
+
+
+async def claim_feed_jobs(limit: int, session: async_scoped_session) -> Sequence[FeedJob]:
+    """
+    Marks the oldest pending jobs as running, together with the running jobs which have timed out. The rows are
+    locked with SKIP LOCKED, so many scheduler services can claim jobs at the same time
+    :param limit: maximum number of jobs
+    :param session: database session
+    :return: the claimed jobs
+    """
+    timed_out = and_(
+        FeedJob.status == JobStatus.RUNNING.value, FeedJob.updated_at < datetime.utcnow() - settings.feed_job_timeout
+    )
+    give_up_stmt = (
+        update(FeedJob)
+        .where(timed_out, FeedJob.attempts >= FEED_JOB_MAX_ATTEMPTS)
+        .values(status=JobStatus.FAILED.value, error="timed out", updated_at=datetime.utcnow())
+    )
+    await session.execute(give_up_stmt)
+
+    stmt = (
+        select(FeedJob)
+        .where(or_(FeedJob.status == JobStatus.PENDING.value, timed_out))
+        .order_by(FeedJob.pk)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = (await session.scalars(stmt)).all()
+    for job in jobs:
+        job.status = JobStatus.RUNNING.value  # type: ignore
+        job.attempts += 1  # type: ignore
+    await session.commit()
+    return jobs
+
+
+async def finish_feed_job(job_pk: int, error: Optional[str], session: async_scoped_session) -> None:
+    """
+    Marks a running job as completed or as failed
+    :param job_pk: the primary key of the job
+    :param error: the reason of the failure or None when the job has been successful
+    :param session: database session
+    :return: None
+    """
+    stmt = (
+        update(FeedJob)
+        .where(FeedJob.pk == job_pk)
+        .values(
+            status=JobStatus.COMPLETED.value if error is None else JobStatus.FAILED.value,
+            error=error,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    await session.execute(stmt)
+    await session.commit()
@@ -0,0 +1,191 @@
+"""
+Retention Service. The old postings are pruned in small batches by the scheduler service, the read marks of a batch are
+deleted in the same transaction and the postings are optionally moved to the archive
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import async_scoped_session
+from sqlalchemy import select, insert, delete, update, or_, literal, Row, Select, DateTime
+
+from sendcloud.models import Feed, Posting, read_postings, postings_archive
+from sendcloud.schemas import PostingItemCreate, RetentionStats
+from sendcloud.utils import settings, metrics, execute_rowcount
+
+logger = logging.getLogger(__name__)
+
+
+async def get_retention_policies(session: async_scoped_session) -> Sequence[Row]:
+    """
+    Retrieves the feeds which have a retention policy, all of them when a global policy is set
+    :param session: database session
+    :return: rows of the primary key, retention_max_age_days and retention_max_postings of the feeds
+    """
+    stmt = select(Feed.pk, Feed.retention_max_age_days, Feed.retention_max_postings).order_by(Feed.pk)
+    if settings.retention_max_age is None and settings.retention_max_postings is None:
+        stmt = stmt.where(or_(Feed.retention_max_age_days.is_not(None), Feed.retention_max_postings.is_not(None)))
+    return (await session.execute(stmt)).all()
+
+
+def feed_retention_policy(
+    max_age_days: Optional[int], max_postings: Optional[int]
+) -> Tuple[Optional[timedelta], Optional[int]]:
+    """
+    The retention policy of a feed, the global policy of the settings applies where the feed has none
+    :param max_age_days: the retention_max_age_days of the feed
+    :param max_postings: the retention_max_postings of the feed
+    :return: the maximum age and the maximum number of the postings, None when they are kept
+    """
+    return (
+        settings.retention_max_age if max_age_days is None else timedelta(days=max_age_days),
+        settings.retention_max_postings if max_postings is None else max_postings,
+    )
+
+
+def retained_postings(
+    postings: List[PostingItemCreate], max_age: Optional[timedelta], max_postings: Optional[int], now: datetime
+) -> List[PostingItemCreate]:
+    """
+    The postings of a fetched feed which the retention keeps, the other ones would be pruned by its next run. A posting
+    which is not among the max_postings latest fetched ones is not among the latest ones of the feed either
+    :param postings: the fetched postings
+    :param max_age: maximum age of a posting
+    :param max_postings: maximum number of postings of the feed
+    :param now: the time of the refresh
+    :return: the postings to be stored, in their order
+    """
+    if max_age is not None:
+        postings = [posting for posting in postings if posting.published_at >= now - max_age]
+    if max_postings is not None and len(postings) > max_postings:
+        latest = sorted(range(len(postings)), key=lambda index: postings[index].published_at, reverse=True)
+        kept = set(latest[:max_postings])
+        postings = [posting for index, posting in enumerate(postings) if index in kept]
+    return postings
+
+
+def __expired_postings_stmt(
+    feed_pk: int, max_age: Optional[timedelta], max_postings: Optional[int], now: datetime
+) -> Optional[Select]:
+    """
+    Selects a batch of the postings of a feed which are older than max_age or not among its max_postings latest ones.
+    The rows are locked, so a posting can not be marked as read while its read marks are deleted
+    :param feed_pk: the primary key of the feed
+    :param max_age: maximum age of a posting
+    :param max_postings: maximum number of postings of the feed
+    :param now: the time of the retention run
+    :return: the statement or None if nothing is to be pruned
+    """
+    conditions = []
+    if max_age is not None:
+        conditions.append(Posting.published_at < now - max_age)
+    if max_postings is not None:
+        kept = (
+            select(Posting.pk)
+            .where(Posting.feed_id == feed_pk)
+            .order_by(Posting.published_at.desc(), Posting.pk.desc())
+            .limit(max_postings)
+        )
+        conditions.append(Posting.pk.not_in(kept))
+    if not conditions:
+        return None
+    return (
+        select(Posting.pk)
+        .where(Posting.feed_id == feed_pk, or_(*conditions))
+        .order_by(Posting.pk)
+        .limit(settings.retention_batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def __prune_batch(
+    pks: Sequence[int], now: datetime, stats: RetentionStats, session: async_scoped_session
+) -> None:
+    """
+    Deletes the read marks of the postings, archives the postings when enabled and deletes them
+    :param pks: primary keys of the postings
+    :param now: the time of the retention run
+    :param stats: the stats of the run to be updated
+    :param session: database session
+    :return: None
+    """
+    stats.read_marks += await execute_rowcount(
+        delete(read_postings).where(read_postings.c.posting_pk.in_(pks)), session
+    )
+    if settings.retention_archive:
+        columns = ["posting_pk", "link", "title", "description", "author", "published_at", "updated_at", "feed_id"]
+        archived = select(
+            Posting.pk,
+            Posting.link,
+            Posting.title,
+            Posting.description,
+            Posting.author,
+            Posting.published_at,
+            Posting.updated_at,
+            Posting.feed_id,
+            literal(now, DateTime),
+        ).where(Posting.pk.in_(pks))
+        stats.archived += await execute_rowcount(
+            insert(postings_archive).from_select(columns + ["archived_at"], archived), session
+        )
+    stats.pruned += await execute_rowcount(
+        delete(Posting).where(Posting.pk.in_(pks)).execution_options(synchronize_session=False), session
+    )
+
+
+async def prune_feed(
+    feed_pk: int,
+    policy: Tuple[Optional[timedelta], Optional[int]],
+    now: datetime,
+    stats: RetentionStats,
+    session: async_scoped_session,
+) -> None:
+    """
+    Prunes the postings of a feed batch by batch, every batch is committed on its own and followed by a pause of
+    settings.retention_batch_pause
+    :param feed_pk: the primary key of the feed
+    :param policy: the maximum age and the maximum number of the postings as feed_retention_policy gives them, None to
+    keep the postings whatever their age or their number is
+    :param now: the time of the retention run
+    :param stats: the stats of the run to be updated
+    :param session: database session
+    :return: None
+    """
+    if (stmt := __expired_postings_stmt(feed_pk, *policy, now)) is None:
+        return
+    while pks := (await session.scalars(stmt)).all():
+        await __prune_batch(pks, now, stats, session)
+        await session.execute(update(Feed).where(Feed.pk == feed_pk).values(pruned_at=now))
+        await session.commit()
+        stats.batches += 1
+        await asyncio.sleep(settings.retention_batch_pause)
+        if len(pks) < settings.retention_batch_size:
+            break
+    # the last select keeps a transaction open, it is not needed anymore
+    await session.commit()
+
+
+async def apply_retention(session: async_scoped_session) -> RetentionStats:
+    """
+    Prunes the postings of every feed with the policy of the feed or with the global policy, and records the pruned
+    rows and the time taken in the metrics
+    :param session: database session
+    :return: the stats of the run
+    """
+    started, now = perf_counter(), datetime.utcnow()
+    stats = RetentionStats()
+    for feed_pk, max_age_days, max_postings in await get_retention_policies(session):
+        await prune_feed(feed_pk, feed_retention_policy(max_age_days, max_postings), now, stats, session)
+        stats.feeds += 1
+    stats.seconds = perf_counter() - started
+
+    metrics.increment("retention_runs_total")
+    metrics.increment("retention_postings_pruned_total", stats.pruned)
+    metrics.increment("retention_postings_archived_total", stats.archived)
+    metrics.increment("retention_read_marks_pruned_total", stats.read_marks)
+    metrics.increment("retention_seconds_total", stats.seconds)
+    metrics.set("retention_last_run_seconds", stats.seconds)
+    metrics.set("retention_last_run_pruned", stats.pruned)
+    logger.info("[INFO] Retention pruned %s postings of %s feeds in %.2fs", stats.pruned, stats.feeds, stats.seconds)
+    return stats
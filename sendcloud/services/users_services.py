@@ -4,14 +4,15 @@ User database Service, containing functions to fetch data
 from typing import Sequence, Optional
 from sqlalchemy.ext.asyncio import async_scoped_session
 from sqlalchemy.orm import selectinload
-from sqlalchemy import Row
+from sqlalchemy import Row, update
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
 
-from sendcloud.models import User
-from sendcloud.utils import value_error
+from sendcloud.models import User, users_version
+from sendcloud.utils import value_error, read_only, stick_to_primary, upsert_insert, conflict_target
 
 
+@read_only
 async def get_users(session: async_scoped_session, offset: int = 0, limit: int = 100) -> Sequence[Row]:
     """
     Function to retrieve users with limited data for following feeds
@@ -34,6 +35,7 @@ async def create_user(username: str, session: async_scoped_session) -> None:
     try:
         user = User(username=username)
         session.add(user)
+        await bump_users_version(session)
         await session.commit()
     except IntegrityError:
         value_error("User Already Exists")
@@ -50,3 +52,43 @@ async def get_user_by_username(username: str, session: async_scoped_session) ->
     if res := (await session.execute(stmt)).one_or_none():
         return res[0]
     return None
+
+
+async def bump_user_version(username: str, session: async_scoped_session) -> None:
+    """
+    Increments the version of a user, it has to be called in the transaction of every change of the user's follows
+    or read state so the cached responses of the user are invalidated, and the following reads of the user are sent
+    to the primary. The change is committed by the caller
+    :param username: user unique identifier
+    :param session: database session
+    :return: None
+    """
+    stmt = update(User).where(User.username == username).values(version=User.version + 1)
+    await session.execute(stmt.execution_options(synchronize_session=False))
+    # the user reads the change from the primary until the replicas have it
+    stick_to_primary(username)
+
+
+async def bump_users_version(session: async_scoped_session) -> None:
+    """
+    Increments the version of the user list, it has to be called in the transaction of every new user, follow or
+    unfollow and refresh which changes the title of a feed. The change is committed by the caller
+    :param session: database session
+    :return: None
+    """
+    stmt = upsert_insert(users_version, session).values(pk=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        **conflict_target(users_version, "users_version_pkey", session),
+        set_={"version": users_version.c.version + 1},
+    )
+    await session.execute(stmt)
+
+
+@read_only
+async def get_users_version(session: async_scoped_session) -> int:
+    """
+    A version token of the user list, it is read from the single row which the changes of the list bump
+    :param session: database session
+    :return: the token
+    """
+    return (await session.scalar(select(users_version.c.version).where(users_version.c.pk == 1))) or 0
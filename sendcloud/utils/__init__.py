@@ -1,8 +1,73 @@
 """utils module"""
 from .settings import settings
-from .db_manager import get_session, Base, get_session_injector
+from .db_manager import get_session, Base, get_session_injector, read_only, stick_to_primary, execute_rowcount
 from .setup_tests import setup_tests
 from .feed_loader import fetch_feed
+from .feed_parser import FastFeedParser, UnsupportedFeed, is_fast_path_encoding, parse_fast, parse_feed_document
+from .opml import parse_opml
+from .single_flight import SingleFlight
+from .http_cache import make_etag, etag_matches, not_modified, cache_headers
 from .exceptions import value_error
+from .metrics import Metrics, metrics
+from .link_hash import LINK_HASH_PROBES, link_hash, link_hashes, probe_link_hashes, link_hash_default
+from .upserts import upsert_insert, conflict_target
+from .profiler import SamplingProfiler, ProfilingMiddleware, profiled
+from .loop_monitor import LoopMonitor
+from .feed_registry import FeedRegistry, ScheduledFeed
+from .tracing import Span, SpanExporter, InMemoryExporter, FileExporter, TracingMiddleware
+from .tracing import span, current_span, set_exporter, get_exporter, install_trace_log_records
+from .sql_stats import QueryStats, QueryStatsMiddleware, track_queries, log_query_stats, statement_shape
 
-__all__ = ["settings", "get_session", "setup_tests", "Base", "get_session_injector", "fetch_feed", "value_error"]
+__all__ = [
+    "settings",
+    "get_session",
+    "setup_tests",
+    "Base",
+    "get_session_injector",
+    "read_only",
+    "stick_to_primary",
+    "execute_rowcount",
+    "fetch_feed",
+    "FastFeedParser",
+    "UnsupportedFeed",
+    "is_fast_path_encoding",
+    "parse_fast",
+    "parse_feed_document",
+    "parse_opml",
+    "SingleFlight",
+    "make_etag",
+    "etag_matches",
+    "not_modified",
+    "cache_headers",
+    "value_error",
+    "Metrics",
+    "metrics",
+    "LINK_HASH_PROBES",
+    "link_hash",
+    "link_hashes",
+    "probe_link_hashes",
+    "link_hash_default",
+    "upsert_insert",
+    "conflict_target",
+    "QueryStats",
+    "QueryStatsMiddleware",
+    "track_queries",
+    "log_query_stats",
+    "statement_shape",
+    "SamplingProfiler",
+    "ProfilingMiddleware",
+    "profiled",
+    "LoopMonitor",
+    "Span",
+    "SpanExporter",
+    "InMemoryExporter",
+    "FileExporter",
+    "TracingMiddleware",
+    "span",
+    "current_span",
+    "set_exporter",
+    "get_exporter",
+    "install_trace_log_records",
+    "FeedRegistry",
+    "ScheduledFeed",
+]
@@ -1,10 +1,22 @@
 """
 db manager module which includes all database related functions like creating session, engine and update database tables
-for tests goals
+for tests goals. The sessions route the statements of the read-only service functions to the replicas of
+settings.database_replica_urls, everything else goes to the primary.
+
+A SQLite database file is opened in the embedded mode of settings.sqlite_embedded: the engines are shared by the
+sessions of an event loop, the connections use the WAL journal, all the writes go through a single writer connection
+and the reads go to a pool of reader connections until their transaction writes
 """
+import asyncio
 import enum
-from typing import Optional, Generator
+import inspect
+import itertools
+from functools import wraps
+from time import monotonic
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar, cast
 from contextlib import asynccontextmanager
+from weakref import WeakKeyDictionary
+from sqlalchemy import event, make_url, CursorResult, Executable
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine,
@@ -12,10 +24,26 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 from .settings import settings
 
 Base = declarative_base()
 
+T = TypeVar("T")
+
+__replica_counter = itertools.count()
+# the keys, i.e. usernames, whose reads go to the primary until the given time of time.monotonic()
+__sticky_until: Dict[str, float] = {}
+# the engines of the embedded mode by event loop, then by database url and whether they are the readers
+__embedded_engines: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, bool], AsyncEngine]]" = (
+    WeakKeyDictionary()
+)
+# the engines of the replicas by event loop, then by database url, so the sessions share their pools
+__replica_engines: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncEngine]]" = WeakKeyDictionary()
+
 
 class EDatabaseManipulationType(enum.Enum):
     """
@@ -28,10 +56,12 @@ class EDatabaseManipulationType(enum.Enum):
 
 def get_db_engine(database_url: Optional[str] = None) -> AsyncEngine:
     """
-    Creates async engine for a given database url
+    Creates async engine for a given database url, the writer engine of the embedded mode for a SQLite database file
     :param database_url: the database config url
     :return: async database engine
     """
+    if is_embedded(database_url or settings.database_url):
+        return get_embedded_engine(database_url or settings.database_url)
     return create_async_engine(
         database_url or settings.database_url,
         echo=False,
@@ -39,6 +69,208 @@ def get_db_engine(database_url: Optional[str] = None) -> AsyncEngine:
     )
 
 
+def is_embedded(database_url: str) -> bool:
+    """
+    Checks whether a database is opened in the embedded mode
+    :param database_url: the database config url
+    :return: True for a SQLite database file when settings.sqlite_embedded is set, an in-memory database can not be
+    shared by many connections
+    """
+    url = make_url(database_url)
+    return (
+        settings.sqlite_embedded
+        and url.get_backend_name() == "sqlite"
+        and url.database not in (None, "", ":memory:")
+        and url.query.get("mode") != "memory"
+    )
+
+
+def __pragmas_listener(readers: bool) -> Callable[[Any, Any], None]:
+    """
+    Creates the connect listener which applies settings.sqlite_pragmas to the connections of the embedded mode
+    :param readers: the connections belong to the readers, they refuse to write
+    :return: the listener
+    """
+
+    def on_connect(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in settings.sqlite_pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if readers:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return on_connect
+
+
+def get_embedded_engine(database_url: str, readers: bool = False) -> AsyncEngine:
+    """
+    The engine of the embedded mode which is shared by the sessions of the running loop. The writer engine has a
+    single connection, the writes of the process wait for each other in its pool instead of failing on the lock of the
+    database file, the readers read next to it thanks to the WAL journal
+    :param database_url: the database config url of a SQLite database file
+    :param readers: the pool of settings.sqlite_reader_pool_size reader connections instead of the writer
+    :return: async database engine
+    """
+    try:
+        engines = __embedded_engines.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        # an engine can only be shared within a loop, without a running loop it belongs to the caller
+        engines = {}
+    if (key := (database_url, readers)) not in engines:
+        engine = create_async_engine(
+            database_url,
+            echo=False,
+            future=True,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.sqlite_reader_pool_size if readers else 1,
+            max_overflow=0,
+            pool_timeout=settings.sqlite_writer_timeout,
+        )
+        event.listen(engine.sync_engine, "connect", __pragmas_listener(readers))
+        engines[key] = engine
+    return engines[key]
+
+
+# the session only overrides the routing of its statements
+class RoutingSession(Session):  # pylint: disable=too-few-public-methods
+    """
+    A session which sends the statements to the replica of the session while a read-only service function runs,
+    the flushes and the other statements go to the primary. In the embedded mode the replica is the pool of readers
+    and every read goes to it until the transaction writes, from then on the transaction reads its own writes from
+    the writer. A locking read, i.e. SELECT ... FOR UPDATE, belongs to a write and goes to the primary as well
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):  # pylint: disable=arguments-differ
+        """
+        The engine of a statement, the replica of the session or the primary
+        :param mapper: the mapper of the statement
+        :param clause: the statement
+        :param kwargs: the other arguments of Session.get_bind
+        :return: the engine
+        """
+        replica = self.info.get("replica")
+        # a textual statement may write as well
+        writes = isinstance(clause, (UpdateBase, TextClause)) or getattr(clause, "_for_update_arg", None) is not None
+        if replica is not None and not self._flushing and not writes:
+            if self.info.get("embedded") and not self.info.get("writing"):
+                return replica
+            if not self.info.get("embedded") and self.info.get("read_only"):
+                return replica
+        if self.info.get("embedded"):
+            self.info["writing"] = True
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def __end_writing(session: Session, transaction: SessionTransaction) -> None:
+    """
+    The next transaction of an embedded session reads from the readers again
+    :param session: the ended session
+    :param transaction: the ended transaction
+    :return: None
+    """
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+
+def get_replica_engine(database_url: str) -> AsyncEngine:
+    """
+    The engine of a replica which is shared by the sessions of the running loop, it is created once per loop
+    :param database_url: the database config url of the replica
+    :return: async database engine
+    """
+    if is_embedded(database_url):
+        return get_embedded_engine(database_url)
+    try:
+        engines = __replica_engines.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        # an engine can only be shared within a loop, without a running loop it belongs to the caller
+        engines = {}
+    if database_url not in engines:
+        engines[database_url] = create_async_engine(database_url, echo=False, future=True)
+    return engines[database_url]
+
+
+def __next_replica() -> Optional[AsyncEngine]:
+    """
+    Picks the replicas of settings.database_replica_urls in turn
+    :return: a replica engine or None if there is no replica
+    """
+    if not settings.database_replica_urls:
+        return None
+    urls = settings.database_replica_urls
+    return get_replica_engine(urls[next(__replica_counter) % len(urls)])
+
+
+def __sessionmaker(engine: Optional[AsyncEngine], **kwargs: Any) -> async_sessionmaker:
+    """
+    Creates the session factory of an engine
+    :param engine: the engine of every statement or None for settings.database_url, whose read-only statements go to
+    a replica, or whose reads go to the readers in the embedded mode
+    :param kwargs: other options of the sessions
+    :return: the session factory
+    """
+    replica, embedded = None, False
+    if engine is None:
+        engine = get_db_engine(settings.database_url)
+        replica = __next_replica()
+        if replica is None and is_embedded(settings.database_url):
+            replica, embedded = get_embedded_engine(settings.database_url, readers=True), True
+    return async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        info={"replica": replica.sync_engine if replica is not None else None, "embedded": embedded},
+        **kwargs,
+    )
+
+
+def stick_to_primary(key: str) -> None:
+    """
+    Sends the reads of a key to the primary for settings.replica_sticky_window, so a user reads their own writes
+    while the replicas catch up
+    :param key: the key of the reads, i.e. the username
+    :return: None
+    """
+    now = monotonic()
+    for expired in [item for item, until in __sticky_until.items() if until <= now]:
+        del __sticky_until[expired]
+    __sticky_until[key] = now + settings.replica_sticky_window.total_seconds()
+
+
+def is_sticky(key: Optional[str]) -> bool:
+    """
+    Checks whether the reads of a key go to the primary
+    :param key: the key of the reads, i.e. the username
+    :return: True if the key has written within settings.replica_sticky_window
+    """
+    return key is not None and __sticky_until.get(key, 0) > monotonic()
+
+
+def read_only(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Marks a service function which only reads, its statements are sent to a replica unless the user of its
+    username argument has just written
+    :param func: the service function with a session argument
+    :return: the routed function
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        arguments = signature.bind(*args, **kwargs).arguments
+        session = arguments["session"]
+        previous = session.info.get("read_only", False)
+        session.info["read_only"] = not is_sticky(arguments.get("username"))
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            session.info["read_only"] = previous
+
+    return wrapper
+
+
 @asynccontextmanager
 async def get_session(engine: Optional[AsyncEngine] = None) -> "AsyncGenerator[async_scoped_session]":  # type: ignore
     """
@@ -46,23 +278,32 @@ async def get_session(engine: Optional[AsyncEngine] = None) -> "AsyncGenerator[a
     :arg engine
     :returns AsyncSession
     """
-    if engine is None:
-        engine = get_db_engine(settings.database_url)
-
-    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # the replicas and the readers belong to the configured database, a given engine is used for everything
+    async_session = __sessionmaker(engine, expire_on_commit=False)
 
     async with async_session() as session:
         yield session
 
 
-def get_session_injector() -> Generator[AsyncSession, None, None]:
+async def get_session_injector() -> AsyncGenerator[AsyncSession, None]:
     """
-    Returns a session for fastapi to inject into routers
+    Returns a session for fastapi to inject into routers, it is closed after the response so its connection goes
+    back to the pool, which the single writer connection of the embedded mode relies on. The committed objects are
+    not expired, the response is serialized after the commit and can not load them again
     :return: async database session
     """
-    engine = get_db_engine(settings.database_url)
-    async_session = async_sessionmaker(engine, class_=AsyncSession)
-    yield async_session()
+    async with __sessionmaker(None, expire_on_commit=False)() as session:
+        yield session
+
+
+async def execute_rowcount(stmt: Executable, session: async_scoped_session) -> int:
+    """
+    Executes a DML statement
+    :param stmt: the insert, update or delete statement
+    :param session: database async session
+    :return: number of affected rows
+    """
+    return cast(CursorResult, await session.execute(stmt)).rowcount
 
 
 async def update_async_database_tables(mode: EDatabaseManipulationType) -> None:
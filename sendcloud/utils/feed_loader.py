@@ -1,67 +1,243 @@
 """
 Module to fetch a feed from internet
 """
-from time import mktime
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from time import mktime, monotonic
 from datetime import datetime
 import logging
-from typing import Optional, Tuple, List
+from typing import Any, Dict, Optional, Tuple, List
 import aiohttp
-import feedparser
 
 from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from .feed_parser import FastFeedParser, UnsupportedFeed, is_fast_path_encoding, parse_feed_document
+from .settings import settings
+from .tracing import Span, span
 
 
 logger = logging.getLogger(__name__)
 
+# the links of the feeds the fast path has given up on while they streamed by the monotonic time they have fallen
+# back, they are read whole for feedparser for a while instead of being downloaded twice at every refresh
+__feedparser_links: "OrderedDict[str, float]" = OrderedDict()
 
-async def fetch_feed(link: str) -> Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]:
+
+def __feed_scheme(link: str, feed: Dict[str, Any]) -> FeedItemCreate:
     """
-    Loads a feed for a given link
-    :param link: link to be fetched
-    :return: Tuples of feed items and their associated postings
+    Creates the feed item of a parsed feed
+    :param link: link of the feed
+    :param feed: the feed as feedparser returns it
+    :return: the feed item
+    """
+    return FeedItemCreate(
+        link=link,
+        title=feed.get("title", "-"),
+        lang=feed.get("language", "-"),
+        copyright_text=feed.get("copyright", "-"),
+        description=feed.get("summary", "-"),
+        category=feed.get("category", "-"),
+    )
+
+
+def __posting_scheme(entry: Dict[str, Any]) -> PostingItemCreate:
+    """
+    Creates the posting item of a parsed entry
+    :param entry: the entry as feedparser returns it
+    :return: the posting item
+    """
+    return PostingItemCreate(
+        link=entry.get("link", "-"),
+        title=entry.get("title", "-"),
+        description=entry.get("summary", "-"),
+        published_at=datetime.fromtimestamp(mktime(entry.get("published_parsed", "-"))),
+        author=entry.get("author", "-"),
+    )
+
+
+def __encoding(response: aiohttp.ClientResponse) -> Optional[str]:
+    """
+    The encoding of a response which may not have been read yet
+    :param response: the response
+    :return: its charset or None when it has none, the document may declare its encoding itself
+    """
+    return response.get_encoding() if response.charset else None
+
+
+def __falls_back(link: str) -> bool:
+    """
+    Checks if the fast path has given up on a feed lately
+    :param link: link of the feed
+    :return: True when the feed is read whole for feedparser
     """
-    async with aiohttp.ClientSession() as session:
-        # NOTE: we used aiohttp due to the feedparser makes blocking http request itself to load xml from link then
-        # we would have lost the asynchronous feature
+    fallen_back_at = __feedparser_links.get(link)
+    if fallen_back_at is None:
+        return False
+    if monotonic() - fallen_back_at < settings.feedparser_fallback_ttl.total_seconds():
+        return True
+    del __feedparser_links[link]
+    return False
+
+
+def __remember_fallback(link: str) -> None:
+    """
+    Remembers that the fast path has given up on a feed, at most settings.feedparser_fallback_max_links are kept
+    :param link: link of the feed
+    :return: None
+    """
+    __feedparser_links[link] = monotonic()
+    __feedparser_links.move_to_end(link)
+    while len(__feedparser_links) > settings.feedparser_fallback_max_links:
+        __feedparser_links.popitem(last=False)
+
+
+async def __stream_feed(
+    link: str, response: aiohttp.ClientResponse
+) -> Optional[Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]]:
+    """
+    Parses the body with the fast path while it is downloaded, every chunk is fed to the incremental parser as it
+    comes and every entry is turned into its posting as soon as it ends, so the document is never held. The download
+    stops at settings.feed_max_entries with the postings read so far, and fails beyond settings.feed_max_bytes like
+    the download of a feed for feedparser
+    :param link: link of the feed
+    :param response: the response, whose body has not been read
+    :return: the feed item and its postings, None and None when it is too large, or None when the fast path gives up
+    """
+    parser, read = FastFeedParser(), 0
+    postings: List[PostingItemCreate] = []
+    with span("stream", link=link) as stream_span:
         try:
-            async with session.get(link) as response:
-                if response.status < 200 or response.status > 299:
-                    logger.error("[ERROR] Response received with status code: %s", str(response.status))
-                    return None, None
-                html = await response.text()
-                parsed_xml = feedparser.parse(html)
-                if parsed_xml.get("bozo"):
-                    logger.error("[ERROR] Feed couldn't be validated for link: %s", link)
+            async for chunk in response.content.iter_chunked(settings.feed_parse_chunk_size):
+                read += len(chunk)
+                if read > settings.feed_max_bytes:
+                    logger.error("[ERROR] Feed is larger than %s bytes for link: %s", settings.feed_max_bytes, link)
                     return None, None
+                postings += map(__posting_scheme, parser.feed_bytes(chunk))
+                if settings.feed_max_entries is not None and len(postings) >= settings.feed_max_entries:
+                    logger.warning("[WARNING] Feed stopped at %s entries for link: %s", settings.feed_max_entries, link)
+                    break
+            else:
+                postings += map(__posting_scheme, parser.close())
+        except UnsupportedFeed as error:
+            logger.debug("[DEBUG] Feed falls back to feedparser: %s", error)
+            return None
+        stream_span.set_attribute("bytes", read)
+        stream_span.set_attribute("entries", len(postings))
+    return __feed_scheme(link, parser.feed), postings[: settings.feed_max_entries]
 
-                feed = parsed_xml.get("feed")
 
-                if feed is None:
-                    logger.error("[ERROR] Feed couldn't be parsed for link: %s", link)
-                    return None, None
+async def __download(link: str, response: aiohttp.ClientResponse) -> Optional[bytes]:
+    """
+    Reads the whole body for feedparser, unless it is larger than settings.feed_max_bytes
+    :param link: link of the feed
+    :param response: the response
+    :return: the body or None when it is too large
+    """
+    chunks, read = [], 0
+    with span("download", link=link) as download_span:
+        async for chunk in response.content.iter_chunked(settings.feed_parse_chunk_size):
+            read += len(chunk)
+            if read > settings.feed_max_bytes:
+                logger.error("[ERROR] Feed is larger than %s bytes for link: %s", settings.feed_max_bytes, link)
+                return None
+            chunks.append(chunk)
+        download_span.set_attribute("bytes", read)
+    return b"".join(chunks)
+
+
+async def __parse_body(
+    link: str, response: aiohttp.ClientResponse, fast: bool
+) -> Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]:
+    """
+    Downloads the whole body and parses it, with the fast path first unless it has given up already
+    :param link: link of the feed
+    :param response: the response
+    :param fast: whether the fast path may be tried
+    :return: the feed item and its postings
+    """
+    if (body := await __download(link, response)) is None:
+        return None, None
+    with span("parse", link=link, bytes=len(body)) as parse_span:
+        parsed_xml = parse_feed_document(body, __encoding(response), fast=fast)
+        if parsed_xml.get("bozo"):
+            logger.error("[ERROR] Feed couldn't be validated for link: %s", link)
+            return None, None
+
+        feed = parsed_xml.get("feed")
 
-                entries = parsed_xml.get("entries", [])
-                feed_scheme = FeedItemCreate(
-                    link=link,
-                    title=feed.get("title", "-"),
-                    lang=feed.get("language", "-"),
-                    copyright_text=feed.get("copyright", "-"),
-                    description=feed.get("summary", "-"),
-                    category=feed.get("category", "-"),
-                )
-                postings_scheme = [
-                    PostingItemCreate(
-                        link=entry.get("link", "-"),
-                        title=entry.get("title", "-"),
-                        description=entry.get("summary", "-"),
-                        published_at=datetime.fromtimestamp(mktime(entry.get("published_parsed", "-"))),
-                        author=entry.get("author", "-"),
-                    )
-                    for entry in entries
-                ]
-                return feed_scheme, postings_scheme
-        except (
-            Exception  # pylint: disable=broad-exception-caught
-        ) as error:
-            logger.error("[ERROR] Exception in Feed loader , kind: %s, message : %s", type(error), str(error))
+        if feed is None:
+            logger.error("[ERROR] Feed couldn't be parsed for link: %s", link)
             return None, None
+
+        entries = parsed_xml.get("entries", [])[: settings.feed_max_entries]
+        parse_span.set_attribute("entries", len(entries))
+        return __feed_scheme(link, feed), [__posting_scheme(entry) for entry in entries]
+
+
+def __failed(response: aiohttp.ClientResponse) -> bool:
+    """
+    Checks the status of a response
+    :param response: the response
+    :return: True when it is not a success
+    """
+    if response.status < 200 or response.status > 299:
+        logger.error("[ERROR] Response received with status code: %s", str(response.status))
+        return True
+    return False
+
+
+async def __fetch(
+    link: str, client: aiohttp.ClientSession, fetch_span: Span
+) -> Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]:
+    """
+    Fetches and parses a feed, see fetch_feed
+    :param link: link to be fetched
+    :param client: the http client
+    :param fetch_span: the span of the fetch
+    :return: Tuples of feed items and their associated postings
+    """
+    # a host which does not answer in time fails the fetch instead of holding the task
+    timeout = aiohttp.ClientTimeout(total=settings.feed_fetch_timeout)
+    # NOTE: we used aiohttp due to the feedparser makes blocking http request itself to load xml from link then
+    # we would have lost the asynchronous feature
+    try:
+        async with client.get(link, timeout=timeout) as response:
+            fetch_span.set_attribute("status_code", response.status)
+            if __failed(response):
+                return None, None
+            fast = settings.fast_feed_parser and not __falls_back(link)
+            if not settings.feed_streaming or not fast or not is_fast_path_encoding(__encoding(response)):
+                return await __parse_body(link, response, fast)
+            if (streamed := await __stream_feed(link, response)) is not None:
+                return streamed
+
+        # the fast path has given up while it streamed and the bytes it read have not been kept
+        __remember_fallback(link)
+        fetch_span.set_attribute("refetched", True)
+        async with client.get(link, timeout=timeout) as response:
+            if __failed(response):
+                return None, None
+            return await __parse_body(link, response, False)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        logger.error("[ERROR] Exception in Feed loader , kind: %s, message : %s", type(error), str(error))
+        fetch_span.status = "error"
+        fetch_span.set_attribute("error", type(error).__name__)
+        return None, None
+
+
+async def fetch_feed(
+    link: str, client: Optional[aiohttp.ClientSession] = None
+) -> Tuple[Optional[FeedItemCreate], Optional[List[PostingItemCreate]]]:
+    """
+    Loads a feed for a given link, it is streamed through the fast path when settings.feed_streaming is set. A feed
+    the fast path gives up on while it streams is fetched again for feedparser, which needs the whole document, and
+    it is read whole for feedparser at the next fetches
+    :param link: link to be fetched
+    :param client: an open http client to share its connection pool between many fetches, a new one by default
+    :return: Tuples of feed items and their associated postings
+    """
+    async with AsyncExitStack() as stack:
+        fetch_span = stack.enter_context(span("fetch_feed", link=link))
+        if client is None:
+            client = await stack.enter_async_context(aiohttp.ClientSession())
+        fetched = await __fetch(link, client, fetch_span)
+    return fetched
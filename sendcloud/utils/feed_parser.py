@@ -0,0 +1,367 @@
+"""
+Feed parser module. Most feeds are well-formed RSS 2.0 or Atom 1.0 documents of which the loader only keeps a handful
+of fields, so they are parsed by a fast path built on the event based parser of the standard library (the C
+accelerated ElementTree on top of expat) which extracts just those fields into the dictionaries feedparser would have
+returned. Anything the fast path does not know exactly how feedparser would read, an unknown element, a date format,
+markup the sanitizer of feedparser would rewrite, makes it give up and the document is parsed by feedparser instead.
+"""
+import logging
+import re
+from datetime import datetime, timezone
+from email.utils import mktime_tz, parsedate_tz
+from time import gmtime, struct_time
+from typing import Any, Dict, List, Optional
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+import feedparser
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+SY = "{http://purl.org/rss/1.0/modules/syndication/}"
+XML = "{http://www.w3.org/XML/1998/namespace}"
+
+# the elements of a channel which are known not to change the kept fields, besides the ones which hold them
+RSS_CHANNEL_ELEMENTS = {"link", "description", "managingEditor", "webMaster", "pubDate", "lastBuildDate", "generator"}
+RSS_CHANNEL_ELEMENTS |= {"docs", "ttl", "image", "cloud", "rating", "textInput", "skipHours", "skipDays", f"{ATOM}link"}
+RSS_CHANNEL_ELEMENTS |= {f"{SY}updatePeriod", f"{SY}updateFrequency", f"{SY}updateBase"}
+RSS_CHANNEL_FIELDS = {"title": "title", "language": "language", "copyright": "copyright"}
+RSS_ITEM_ELEMENTS = {"category", "comments", "enclosure", "guid", "source", f"{CONTENT}encoded"}
+RSS_ITEM_ELEMENTS |= {
+    "{http://wellformedweb.org/CommentAPI/}commentRss",
+    "{http://purl.org/rss/1.0/modules/slash/}comments",
+}
+RSS_ITEM_FIELDS = {
+    "title": "title",
+    "link": "link",
+    "description": "summary",
+    "pubDate": "published_parsed",
+    "author": "author",
+    f"{DC}creator": "author",
+}
+ATOM_FEED_ELEMENTS = {f"{ATOM}{name}" for name in ["subtitle", "id", "updated", "link", "generator", "icon", "logo"]}
+ATOM_FEED_FIELDS = {f"{ATOM}title": "title", f"{ATOM}rights": "copyright"}
+ATOM_ENTRY_ELEMENTS = {f"{ATOM}{name}" for name in ["id", "updated", "category", "rights"]}
+ATOM_ENTRY_FIELDS = {f"{ATOM}title": "title", f"{ATOM}summary": "summary", f"{ATOM}published": "published_parsed"}
+
+# text which feedparser keeps as it is: a few plain tags and the entities its sanitizer does not rewrite
+SAFE_TEXT = re.compile(
+    r"(?:[^<&]|<(?:/?(?:p|b|i|em|strong|ul|ol|li|code|pre|blockquote|span|div|h[1-6])|br /)>"
+    r"|&(?:amp|lt|gt|quot|#\d+);|&(?=\s))*"
+)
+RFC822_DATE = re.compile(
+    r"(?:(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun), )?\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \d{4} "
+    r"\d{2}:\d{2}:\d{2} (?:[+-]\d{4}|GMT|UT|UTC)"
+)
+RFC3339_DATE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})")
+XML_DECLARATION = re.compile(rb"(?:\xef\xbb\xbf)?\s*<\?xml[^>]*?encoding=[\"']([A-Za-z0-9._-]+)[\"']")
+
+
+class UnsupportedFeed(Exception):
+    """
+    The fast path can't tell how feedparser would read the document
+    """
+
+
+class FastFeedParser:
+    """
+    Incremental parser of RSS 2.0 and Atom 1.0 documents, the bytes are fed as they come and every item is turned into
+    its entry and dropped from the tree as soon as it ends, so only the channel and the current item are held
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor
+        """
+        self.feed: Dict[str, Any] = {}
+        self.__parser = XMLPullParser(events=("start", "end"))
+        self.__stack: List[Element] = []
+        self.__kind: Optional[str] = None
+        # the first bytes until the XML declaration has been checked
+        self.__head: Optional[bytes] = b""
+
+    @staticmethod
+    def __text(element: Element, atom: bool = False) -> str:
+        """
+        The text of an element as feedparser returns it
+        :param element: the element
+        :param atom: whether the element is an Atom text construct, which tells its type
+        :return: the stripped text
+        """
+        if len(element) or (atom and element.get("type", "text") not in ("text", "html")):
+            raise UnsupportedFeed(f"markup in {element.tag}")
+        text = (element.text or "").strip()
+        if ("<" in text or "&" in text) and not SAFE_TEXT.fullmatch(text):
+            raise UnsupportedFeed(f"text of {element.tag}")
+        return text
+
+    @staticmethod
+    def __rss_date(text: str) -> struct_time:
+        """
+        Parses the RFC 822 date of an item
+        :param text: the date
+        :return: the UTC time
+        """
+        if not RFC822_DATE.fullmatch(text) or (parsed := parsedate_tz(text)) is None:
+            raise UnsupportedFeed(f"date {text}")
+        try:
+            # parsedate_tz does not check the day of the month, feedparser drops a date such as Feb 30
+            datetime(*parsed[:6])
+        except ValueError as error:
+            raise UnsupportedFeed(f"date {text}") from error
+        return gmtime(mktime_tz(parsed))
+
+    @staticmethod
+    def __atom_date(text: str) -> struct_time:
+        """
+        Parses the RFC 3339 date of an entry
+        :param text: the date
+        :return: the UTC time
+        """
+        if not RFC3339_DATE.fullmatch(text):
+            raise UnsupportedFeed(f"date {text}")
+        try:
+            return datetime.fromisoformat(text).astimezone(timezone.utc).utctimetuple()
+        except ValueError as error:
+            raise UnsupportedFeed(f"date {text}") from error
+
+    def __rss_item(self, item: Element) -> Dict[str, Any]:
+        """
+        The fields of an item
+        :param item: the item
+        :return: the entry as feedparser returns it
+        """
+        entry: Dict[str, Any] = {}
+        for child in item:
+            if (key := RSS_ITEM_FIELDS.get(child.tag)) is None:
+                if child.tag not in RSS_ITEM_ELEMENTS:
+                    raise UnsupportedFeed(f"item element {child.tag}")
+            elif key in entry:
+                raise UnsupportedFeed(f"repeated {child.tag}")
+            else:
+                text = self.__text(child)
+                entry[key] = self.__rss_date(text) if key == "published_parsed" else text
+        if "link" not in entry or "published_parsed" not in entry:
+            raise UnsupportedFeed("item without link or date")
+        # feedparser takes the content of an item without a description as its summary
+        if "summary" not in entry and item.find(f"{CONTENT}encoded") is not None:
+            raise UnsupportedFeed("content without description")
+        return entry
+
+    def __atom_entry(self, element: Element) -> Dict[str, Any]:
+        """
+        The fields of an entry
+        :param element: the entry
+        :return: the entry as feedparser returns it
+        """
+        entry: Dict[str, Any] = {}
+        for child in element:
+            if (key := ATOM_ENTRY_FIELDS.get(child.tag)) is not None:
+                if key in entry:
+                    raise UnsupportedFeed(f"repeated {child.tag}")
+                text = self.__text(child, atom=key != "published_parsed")
+                entry[key] = self.__atom_date(text) if key == "published_parsed" else text
+            elif child.tag == f"{ATOM}link":
+                if child.get("rel", "alternate") == "alternate" and "link" not in entry:
+                    href = child.get("href", "")
+                    if not href.startswith(("http://", "https://")) or href != href.strip():
+                        raise UnsupportedFeed(f"link {href}")
+                    entry["link"] = href
+            elif child.tag == f"{ATOM}author" and "author" not in entry:
+                names = {name.tag: self.__text(name) for name in child}
+                name, email = names.get(f"{ATOM}name"), names.get(f"{ATOM}email")
+                if not name and not email:
+                    raise UnsupportedFeed("author without name")
+                entry["author"] = f"{name} ({email})" if name and email else name or email
+            elif child.tag not in ATOM_ENTRY_ELEMENTS:
+                raise UnsupportedFeed(f"entry element {child.tag}")
+        if "link" not in entry or "published_parsed" not in entry:
+            raise UnsupportedFeed("entry without link or date")
+        return entry
+
+    def __rss_channel_element(self, element: Element) -> Optional[Dict[str, Any]]:
+        """
+        Reads an element of the channel
+        :param element: the element
+        :return: the entry of an item or None
+        """
+        if element.tag == "item":
+            return self.__rss_item(element)
+        if (key := RSS_CHANNEL_FIELDS.get(element.tag)) is not None:
+            if key in self.feed:
+                raise UnsupportedFeed(f"repeated {element.tag}")
+            self.feed[key] = self.__text(element)
+        elif element.tag == "category":
+            # feedparser skips the empty categories
+            if category := self.__text(element):
+                self.feed.setdefault("category", category)
+        elif element.tag not in RSS_CHANNEL_ELEMENTS:
+            raise UnsupportedFeed(f"channel element {element.tag}")
+        return None
+
+    def __atom_feed_element(self, element: Element) -> Optional[Dict[str, Any]]:
+        """
+        Reads an element of the feed
+        :param element: the element
+        :return: the entry of an entry element or None
+        """
+        if element.tag == f"{ATOM}entry":
+            return self.__atom_entry(element)
+        if (key := ATOM_FEED_FIELDS.get(element.tag)) is not None:
+            if key in self.feed:
+                raise UnsupportedFeed(f"repeated {element.tag}")
+            self.feed[key] = self.__text(element, atom=True)
+        elif element.tag == f"{ATOM}category":
+            if not (term := element.get("term", "").strip()):
+                raise UnsupportedFeed("category without term")
+            self.feed.setdefault("category", term)
+        elif element.tag not in ATOM_FEED_ELEMENTS:
+            raise UnsupportedFeed(f"feed element {element.tag}")
+        return None
+
+    def __start(self, element: Element) -> None:
+        """
+        Checks an element when it starts
+        :param element: the element
+        :return: None
+        """
+        if f"{XML}base" in element.attrib:
+            raise UnsupportedFeed("xml:base")
+        if not self.__stack:
+            if element.tag == "rss" and element.get("version") == "2.0":
+                self.__kind = "rss"
+            elif element.tag == f"{ATOM}feed":
+                self.__kind = "atom"
+                if language := element.get(f"{XML}lang"):
+                    self.feed["language"] = language
+            else:
+                raise UnsupportedFeed(f"root {element.tag}")
+        elif len(self.__stack) == 1 and self.__kind == "rss" and element.tag != "channel":
+            raise UnsupportedFeed(f"rss element {element.tag}")
+        if self.__kind == "rss" and f"{XML}lang" in element.attrib:
+            raise UnsupportedFeed("xml:lang")
+        self.__stack.append(element)
+
+    def __end(self, element: Element) -> Optional[Dict[str, Any]]:
+        """
+        Reads an element of the channel when it ends and drops it
+        :param element: the element
+        :return: the entry of an item or None
+        """
+        self.__stack.pop()
+        if self.__kind == "rss" and len(self.__stack) == 2:
+            entry = self.__rss_channel_element(element)
+        elif self.__kind == "atom" and len(self.__stack) == 1:
+            entry = self.__atom_feed_element(element)
+        else:
+            return None
+        self.__stack[-1].remove(element)
+        return entry
+
+    def __read_events(self) -> List[Dict[str, Any]]:
+        """
+        Handles the events of the bytes fed so far
+        :return: the entries of the items which have ended
+        """
+        entries = []
+        try:
+            for event, element in self.__parser.read_events():
+                if event == "start":
+                    self.__start(element)
+                elif (entry := self.__end(element)) is not None:
+                    entries.append(entry)
+        except ParseError as error:
+            raise UnsupportedFeed(str(error)) from error
+        return entries
+
+    def __check_encoding(self, data: bytes, final: bool = False) -> None:
+        """
+        Checks the encoding of the XML declaration once its bytes have come, expat and feedparser only agree on UTF-8
+        :param data: the next bytes of the document
+        :param final: whether the document ends
+        :return: None
+        """
+        self.__head = (self.__head or b"") + data[:256]
+        if len(self.__head) < 256 and not final:
+            return
+        declared = XML_DECLARATION.match(self.__head)
+        if declared and declared.group(1).lower() not in (b"utf-8", b"utf8"):
+            raise UnsupportedFeed(f"encoding {declared.group(1).decode()}")
+        self.__head = None
+
+    def feed_bytes(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Parses the next bytes of the document
+        :param data: the bytes
+        :return: the entries of the items which have ended within them
+        """
+        if self.__head is not None:
+            self.__check_encoding(data)
+        try:
+            self.__parser.feed(data)
+        except ParseError as error:
+            raise UnsupportedFeed(str(error)) from error
+        return self.__read_events()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Ends the document
+        :return: the entries of the last items
+        """
+        if self.__head is not None:
+            self.__check_encoding(b"", final=True)
+        try:
+            self.__parser.close()
+        except ParseError as error:
+            raise UnsupportedFeed(str(error)) from error
+        entries = self.__read_events()
+        if self.__kind is None or self.__stack:
+            raise UnsupportedFeed("incomplete document")
+        return entries
+
+
+def parse_fast(body: bytes) -> Dict[str, Any]:
+    """
+    Parses a document with the fast path
+    :param body: the document
+    :return: the feed and its entries as feedparser returns them
+    """
+    parser, entries, size = FastFeedParser(), [], settings.feed_parse_chunk_size
+    # the document is fed in chunks so the tree never holds more than the items of a chunk
+    for start in range(0, len(body), size):
+        entries += parser.feed_bytes(body[start : start + size])
+    entries += parser.close()
+    return {"bozo": False, "feed": parser.feed, "entries": entries}
+
+
+def is_fast_path_encoding(encoding: Optional[str]) -> bool:
+    """
+    Checks if a document of the given encoding may be parsed by the fast path
+    :param encoding: the charset of the response, None when it declares none and the document is read as UTF-8
+    :return: True for UTF-8 and its ASCII subset
+    """
+    return encoding is None or encoding.lower().replace("_", "-") in ("utf-8", "utf8", "ascii", "us-ascii")
+
+
+def parse_feed_document(body: bytes, encoding: Optional[str], fast: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Parses a document with the fast path when settings.fast_feed_parser is set, with feedparser otherwise or when the
+    fast path gives up. Feedparser gets the bytes, so the encoding the document declares is used when the response
+    declares none
+    :param body: the document
+    :param encoding: the charset of the response, None when it declares none
+    :param fast: whether the fast path may be tried, settings.fast_feed_parser by default
+    :return: the feed and its entries as feedparser returns them
+    """
+    if (settings.fast_feed_parser if fast is None else fast) and is_fast_path_encoding(encoding):
+        try:
+            return parse_fast(body)
+        except UnsupportedFeed as error:
+            logger.debug("[DEBUG] Feed falls back to feedparser: %s", error)
+    # a content type without charset is not passed on, feedparser reads text/xml without one as ASCII
+    headers = None if encoding is None else {"content-type": f"application/xml; charset={encoding}"}
+    return feedparser.parse(body, response_headers=headers)
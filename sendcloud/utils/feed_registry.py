@@ -0,0 +1,159 @@
+"""
+Feed registry module. The scheduler keeps the schedulable feeds in a registry of typed arrays instead of a list of rows:
+the pk, the interned id of the host, the next due time and the number of failed refreshes of every feed take 22 bytes.
+The arrays are sorted by pk, the autoincrement pks of the new feeds are appended and a feed is found by bisection, so
+there is no object per feed at all. The links are not kept, the scheduler loads them for the due feeds only.
+"""
+import math
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+# the due time of a feed which has been deactivated, it is never due until the next full sync drops it
+PARKED = math.inf
+
+
+class ScheduledFeed(NamedTuple):
+    """
+    A due feed which is handed to a task of the scheduler
+    """
+
+    pk: int
+    link: str
+
+
+class FeedRegistry:
+    """
+    The schedulable feeds of the scheduler, sorted by pk
+    """
+
+    __slots__ = ("__pks", "__host_ids", "__due", "__failures", "__hosts", "__netlocs", "__host_names")
+
+    def __init__(self) -> None:
+        """
+        Constructor
+        """
+        self.__pks = array("q")
+        self.__host_ids = array("I")
+        self.__due = array("d")
+        self.__failures = array("H")
+        self.__hosts: Dict[str, int] = {}
+        # the ids of the hosts by the network location of the links, so a link is only parsed for a new one
+        self.__netlocs: Dict[str, int] = {}
+        self.__host_names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.__pks)
+
+    def __position(self, feed_pk: int) -> Optional[int]:
+        """
+        The position of a feed in the arrays
+        :param feed_pk: the feed
+        :return: the position or None when it is not registered
+        """
+        position = bisect_left(self.__pks, feed_pk)
+        return position if position < len(self.__pks) and self.__pks[position] == feed_pk else None
+
+    def __host_id(self, link: str) -> int:
+        """
+        Interns the host of a link
+        :param link: the link of a feed
+        :return: the id of its host
+        """
+        netloc = link.partition("//")[2].partition("/")[0]
+        if (host_id := self.__netlocs.get(netloc)) is not None:
+            return host_id
+        host = urlsplit(link).hostname or ""
+        if (host_id := self.__hosts.get(host)) is None:
+            host_id = self.__hosts[host] = len(self.__host_names)
+            self.__host_names.append(host)
+        self.__netlocs[netloc] = host_id
+        return host_id
+
+    def upsert(self, feed_pk: int, link: str, due: float) -> None:
+        """
+        Registers a feed or updates its host and its due time, the failures of a registered feed are kept
+        :param feed_pk: the feed
+        :param link: its link
+        :param due: the epoch time at which it has to be refreshed
+        :return: None
+        """
+        host_id = self.__host_id(link)
+        # the pks of a sync come in ascending order, they are appended without a search
+        if not self.__pks or feed_pk > self.__pks[-1]:
+            self.__pks.append(feed_pk)
+            self.__host_ids.append(host_id)
+            self.__due.append(due)
+            self.__failures.append(0)
+        elif (position := self.__position(feed_pk)) is not None:
+            self.__host_ids[position], self.__due[position] = host_id, due
+        else:
+            position = bisect_left(self.__pks, feed_pk)
+            self.__pks.insert(position, feed_pk)
+            self.__host_ids.insert(position, host_id)
+            self.__due.insert(position, due)
+            self.__failures.insert(position, 0)
+
+    def take_due(self, now: float, next_due: float) -> List[int]:
+        """
+        The feeds which are due, their due time is moved to next_due so they are not taken again while they run
+        :param now: the current epoch time
+        :param next_due: the next due time of the taken feeds
+        :return: their pks
+        """
+        due = self.__due
+        positions = [position for position, value in enumerate(due) if value <= now]
+        for position in positions:
+            due[position] = next_due
+        return [self.__pks[position] for position in positions]
+
+    def record_success(self, feed_pk: int) -> None:
+        """
+        Resets the failures of a refreshed feed
+        :param feed_pk: the feed
+        :return: None
+        """
+        if (position := self.__position(feed_pk)) is not None:
+            self.__failures[position] = 0
+
+    def record_failure(self, feed_pk: int) -> None:
+        """
+        Counts a failed refresh, the feed has been deactivated so it is parked
+        :param feed_pk: the feed
+        :return: None
+        """
+        if (position := self.__position(feed_pk)) is not None:
+            self.__failures[position] = min(self.__failures[position] + 1, 2**16 - 1)
+            self.__due[position] = PARKED
+
+    def get(self, feed_pk: int) -> Optional[Tuple[int, str, float, int]]:
+        """
+        A registered feed
+        :param feed_pk: the feed
+        :return: the pk, the host, the due time and the failures or None when it is not registered
+        """
+        if (position := self.__position(feed_pk)) is None:
+            return None
+        host = self.__host_names[self.__host_ids[position]]
+        return feed_pk, host, self.__due[position], self.__failures[position]
+
+    @property
+    def last_pk(self) -> int:
+        """
+        The highest registered pk
+        :return: the pk or 0 when the registry is empty
+        """
+        return self.__pks[-1] if self.__pks else 0
+
+    def clear(self) -> None:
+        """
+        Forgets all the feeds and the hosts
+        :return: None
+        """
+        arrays: Tuple[array, ...] = (self.__pks, self.__host_ids, self.__due, self.__failures)
+        for values in arrays:
+            del values[:]
+        self.__hosts.clear()
+        self.__netlocs.clear()
+        self.__host_names.clear()
@@ -0,0 +1,49 @@
+"""
+Module for the conditional requests of the read endpoints, the responses carry a weak ETag which is derived from a
+cheap version token, so an unchanged response can be answered with 304 before it is queried and serialized
+"""
+from hashlib import blake2b
+from typing import Any, Optional
+from fastapi import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Builds a weak entity tag for the given parts, e.g. a version token and the query string of the request
+    :param parts: everything the response depends on
+    :return: the ETag header value
+    """
+    return f'W/"{blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Checks the If-None-Match header of a request with the weak comparison of RFC 9110
+    :param if_none_match: the header value, it may contain many tags or *
+    :param etag: the current ETag
+    :return: True if the client already has the current representation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """
+    The response for a client which already has the current representation
+    :param etag: the current ETag
+    :return: an empty 304 response
+    """
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def cache_headers(etag: str) -> dict:
+    """
+    The headers which let the clients revalidate their copy on every request
+    :param etag: the current ETag
+    :return: the response headers
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
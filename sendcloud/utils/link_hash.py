@@ -0,0 +1,57 @@
+"""
+Link hash module. The feeds and the postings are looked up and deduplicated through a fixed width 64-bit hash of their
+link instead of the link itself. Two links can share a hash, so a lookup always compares the link as well, and a link
+whose hash is already taken by another link is stored with the hash of its next probe
+"""
+from hashlib import blake2b
+from typing import Any, List
+
+# the hashes a link can be stored with, a lookup checks all of them
+LINK_HASH_PROBES = 3
+
+
+def link_hash(link: str, probe: int = 0) -> int:
+    """
+    The signed 64-bit hash of a link, it fits into a BIGINT column
+    :param link: the link
+    :param probe: the probe, 0 unless the hash of the previous probe is taken by another link
+    :return: the hash
+    """
+    salt = probe.to_bytes(8, "big") if probe else b""
+    return int.from_bytes(blake2b(link.encode(), digest_size=8, salt=salt).digest(), "big", signed=True)
+
+
+def link_hashes(link: str) -> List[int]:
+    """
+    All the hashes a link can be stored with
+    :param link: the link
+    :return: the hashes of every probe
+    """
+    return [link_hash(link, probe) for probe in range(LINK_HASH_PROBES)]
+
+
+def probe_link_hashes(links: List[str]) -> List[int]:
+    """
+    Assigns a distinct hash to each of the distinct links, a link takes the first probe which is still free
+    :param links: the distinct links of a unique scope, e.g. the postings of a feed
+    :return: the hashes in the order of the links
+    :raise ValueError: in case all the probes of a link are taken
+    """
+    taken = set()
+    hashes = []
+    for link in links:
+        free = next((value for value in link_hashes(link) if value not in taken), None)
+        if free is None:
+            raise ValueError(f"no free link hash for {link}")
+        taken.add(free)
+        hashes.append(free)
+    return hashes
+
+
+def link_hash_default(context: Any) -> int:
+    """
+    Column default of the link hash of an inserted row, the first probe of its link
+    :param context: the execution context of the insert
+    :return: the hash
+    """
+    return link_hash(context.get_current_parameters()["link"])
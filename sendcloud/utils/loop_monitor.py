@@ -0,0 +1,84 @@
+"""
+Loop monitor module. Both services run on a single event loop, so a blocking call, e.g. the parsing of a large feed,
+stalls every request and every task. The monitor task sleeps settings.loop_monitor_interval seconds in a loop, the
+time it wakes up late is the lag of the loop and it is added to the event_loop_lag_seconds histogram of the metrics.
+The api exposes the metrics at /metrics and the scheduler logs them every settings.metrics_log_interval seconds.
+
+A stalled loop cannot run the monitor task, so a watchdog thread checks its heartbeat. When the loop has not come back
+within settings.loop_lag_threshold, the watchdog logs the stack of the loop thread, which is the stack of the coroutine
+that blocks it.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .metrics import metrics
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+# the monitor is only run, the watchdog thread is private to it
+class LoopMonitor:  # pylint: disable=too-few-public-methods
+    """
+    Measures the lag of the running event loop and reports the calls which block it
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None):
+        """
+        Constructor
+        :param interval: seconds between two measures, settings.loop_monitor_interval by default
+        :param threshold: a longer lag in seconds is reported, settings.loop_lag_threshold by default
+        """
+        self.__interval = interval or settings.loop_monitor_interval
+        self.__threshold = threshold or settings.loop_lag_threshold
+        self.__heartbeat = time.monotonic()
+        self.__reported = False
+        self.__stopped = threading.Event()
+        self.blocking_stack: Optional[str] = None
+
+    def __watch(self, thread_id: int) -> None:
+        """
+        Logs the stack of the loop thread once per stall
+        :param thread_id: the thread of the event loop
+        :return: None
+        """
+        while not self.__stopped.wait(self.__interval):
+            stalled = time.monotonic() - self.__heartbeat - self.__interval
+            if stalled < self.__threshold or self.__reported:
+                continue
+            frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+            if frame is None:
+                continue
+            self.__reported = True
+            self.blocking_stack = "".join(traceback.format_stack(frame))
+            logger.warning("[WARNING] Event loop blocked for more than %.3fs in:\n%s", stalled, self.blocking_stack)
+
+    async def run(self) -> None:
+        """
+        Entry point of the monitor, it runs until it is cancelled
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        watchdog = threading.Thread(
+            target=self.__watch, args=(threading.get_ident(),), name="loop watchdog", daemon=True
+        )
+        watchdog.start()
+        logger.info("[INFO] Loop monitor is running ... ")
+        try:
+            while True:
+                expected = loop.time() + self.__interval
+                self.__heartbeat, self.__reported = time.monotonic(), False
+                await asyncio.sleep(self.__interval)
+                lag = max(0.0, loop.time() - expected)
+                metrics.observe("event_loop_lag_seconds", lag, settings.loop_lag_buckets)
+                if lag >= self.__threshold:
+                    logger.warning("[WARNING] Event loop lagged %.3fs", lag)
+        finally:
+            self.__stopped.set()
+            # the watchdog wakes up within an interval, the loop is not blocked while it is waited for
+            await asyncio.to_thread(watchdog.join)
@@ -0,0 +1,82 @@
+"""
+Metrics module, counters, gauges and histograms which are kept in the memory of the running process
+"""
+from collections import defaultdict
+from typing import Dict, Sequence
+
+
+class Metrics:
+    """
+    A registry of named values, counters only grow while gauges keep the latest value
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor
+        """
+        self.__values: Dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Adds to a counter
+        :param name: the name of the counter
+        :param value: the amount to be added
+        :return: None
+        """
+        self.__values[name] += value
+
+    def set(self, name: str, value: float) -> None:
+        """
+        Sets a gauge
+        :param name: the name of the gauge
+        :param value: the new value
+        :return: None
+        """
+        self.__values[name] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float]) -> None:
+        """
+        Adds a value to a histogram, the counter of every bucket is the number of the values up to its bound
+        :param name: the name of the histogram
+        :param value: the observed value
+        :param buckets: the upper bounds of the buckets
+        :return: None
+        """
+        for bucket in buckets:
+            if value <= bucket:
+                self.__values[f'{name}_bucket{{le="{bucket}"}}'] += 1
+        self.__values[f'{name}_bucket{{le="+Inf"}}'] += 1
+        self.__values[f"{name}_sum"] += value
+        self.__values[f"{name}_count"] += 1
+
+    def get(self, name: str) -> float:
+        """
+        Reads a counter or a gauge
+        :param name: the name of the value
+        :return: the value or 0 if it has never been set
+        """
+        return self.__values.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Copies all the values
+        :return: the values by their names
+        """
+        return dict(self.__values)
+
+    def exposition(self) -> str:
+        """
+        Renders all the values in the text format of prometheus, the samples of a histogram stay next to each other
+        :return: one line per value
+        """
+        return "".join(f"{name} {value}\n" for name, value in sorted(self.__values.items()))
+
+    def clear(self) -> None:
+        """
+        Forgets all the values
+        :return: None
+        """
+        self.__values.clear()
+
+
+metrics = Metrics()
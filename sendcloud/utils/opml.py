@@ -0,0 +1,23 @@
+"""
+Module to read the feed links of an OPML subscription list
+"""
+from typing import List
+from xml.etree import ElementTree
+
+
+def parse_opml(content: bytes) -> List[str]:
+    """
+    Collects the feed links of all the outlines, outlines can be nested in categories at any depth
+    :param content: the OPML document
+    :return: the unique feed links in the order of the document
+    :raise ValueError: in case the document is not a valid OPML
+    """
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError as error:
+        raise ValueError(f"invalid OPML document: {error}") from error
+    if root.tag != "opml" or root.find("body") is None:
+        raise ValueError("invalid OPML document: missing opml body")
+
+    links = (outline.get("xmlUrl", "").strip() for outline in root.iter("outline"))
+    return list(dict.fromkeys(link for link in links if link))
@@ -0,0 +1,130 @@
+"""
+Partitions module. On Postgres the postings table is partitioned by hash of feed_id, so the postings of a feed always
+live in the same partition and the per-feed scans, the vacuum and the index maintenance only touch one partition.
+A unique constraint of a partitioned table has to include the partition key, so the link key is unique per feed and
+the upsert of a feed refresh keeps updating the postings of the feed in place.
+
+The partitions are created together with the table by the partitioning migration, the tooling creates the missing
+ones again with the modulus of the remaining ones and reports the rows of every partition:
+
+    python -m sendcloud.utils.partitions
+"""
+import asyncio
+import json
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import Connection, text
+
+from .db_manager import get_db_engine
+from .settings import settings
+
+# the bound of a hash partition, e.g. FOR VALUES WITH (modulus 16, remainder 3)
+__MODULUS = re.compile(r"modulus (\d+)", re.IGNORECASE)
+
+
+def postings_partition_name(remainder: int) -> str:
+    """
+    The name of a partition of the postings
+    :param remainder: the remainder of the hash of feed_id which is stored in the partition
+    :return: the table name
+    """
+    return f"postings_p{remainder}"
+
+
+def create_postings_partitions(connection: Connection, modulus: int, table: str = "postings") -> List[str]:
+    """
+    Creates the partitions of the postings which do not exist yet
+    :param connection: a connection to Postgres
+    :param modulus: number of partitions, it must be the modulus the table has been partitioned with
+    :param table: the partitioned table
+    :return: names of the created partitions
+    """
+    existing = set(postings_partitions(connection, table))
+    created = []
+    for remainder in range(modulus):
+        if (name := postings_partition_name(remainder)) not in existing:
+            connection.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+                )
+            )
+            created.append(name)
+    return created
+
+
+def is_partitioned(connection: Connection, table: str = "postings") -> bool:
+    """
+    Checks whether a table is partitioned
+    :param connection: a connection to Postgres
+    :param table: the table name
+    :return: True if the table is partitioned
+    """
+    stmt = text(
+        "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+        "WHERE pg_class.relname = :table"
+    )
+    return connection.execute(stmt, {"table": table}).first() is not None
+
+
+def postings_partitions(connection: Connection, table: str = "postings") -> Dict[str, int]:
+    """
+    Estimates the rows of every partition from the statistics of Postgres
+    :param connection: a connection to Postgres
+    :param table: the partitioned table
+    :return: the estimated rows by partition name
+    """
+    stmt = text(
+        "SELECT child.relname, child.reltuples::bigint FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    )
+    return {name: max(int(rows), 0) for name, rows in connection.execute(stmt, {"table": table})}
+
+
+def postings_partitions_modulus(connection: Connection, table: str = "postings") -> Optional[int]:
+    """
+    The modulus a table has been partitioned with, it is read from the bounds of its partitions
+    :param connection: a connection to Postgres
+    :param table: the partitioned table
+    :return: the modulus or None if the table has no partition left
+    """
+    stmt = text(
+        "SELECT pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    )
+    for bound in connection.execute(stmt, {"table": table}).scalars():
+        if match := __MODULUS.search(bound):
+            return int(match.group(1))
+    return None
+
+
+async def ensure_postings_partitions() -> Dict[str, int]:
+    """
+    Creates the missing partitions with the modulus of the existing ones, nothing is done when the postings are not
+    partitioned, e.g. on other databases than Postgres
+    :return: the estimated rows by partition name
+    """
+    engine = get_db_engine(settings.database_url)
+    partitions: Dict[str, int] = {}
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            if await conn.run_sync(is_partitioned):
+                if (modulus := await conn.run_sync(postings_partitions_modulus)) is not None:
+                    await conn.run_sync(create_postings_partitions, modulus)
+                partitions = await conn.run_sync(postings_partitions)
+    await engine.dispose()
+    return partitions
+
+
+def main() -> None:
+    """Command line entry point"""
+    print(json.dumps(asyncio.run(ensure_postings_partitions()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
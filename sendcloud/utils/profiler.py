@@ -0,0 +1,198 @@
+"""
+Profiler module. A sampling profiler which is started on demand for a request of the api or a cycle of the scheduler,
+nothing runs unless a profile is asked for. A thread of its own reads the stack of the event loop thread every
+settings.profile_interval seconds, and the profile is written to settings.profile_dir as a speedscope file or as
+collapsed stacks for flamegraph.pl.
+
+A request is profiled when its X-Profile header matches settings.profile_token or at random with
+settings.profile_sample_rate, only the samples which run inside the request are kept. A cycle of the scheduler is
+profiled with settings.profile_scheduler or after a SIGUSR1 of the scheduler service, every sample of the loop is kept
+until the tasks of the cycle are done.
+"""
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from types import FrameType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[str, str, int]
+
+
+# the sampler thread keeps its state on the profiler
+class SamplingProfiler:  # pylint: disable=too-many-instance-attributes
+    """
+    Samples the stack of a thread until it is stopped
+    """
+
+    def __init__(self, name: str, root: Optional[FrameType] = None, interval: Optional[float] = None):
+        """
+        Constructor
+        :param name: the name of the profile, it is part of the file name
+        :param root: only the stacks which run through this frame are kept, all of them when not given
+        :param interval: seconds between two samples, settings.profile_interval by default
+        """
+        self.name = name
+        self.samples: Counter = Counter()
+        self.path = os.path.join(
+            settings.profile_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-')}-{os.getpid()}"
+            + (".speedscope.json" if settings.profile_format == "speedscope" else ".collapsed"),
+        )
+        self.__root = root
+        self.__interval = interval or settings.profile_interval
+        self.__thread_id = threading.get_ident()
+        self.__stopped = threading.Event()
+        self.__sampler = threading.Thread(target=self.__sample, name=f"profiler {name}", daemon=True)
+        self.__seconds = 0.0
+
+    def __sample(self) -> None:
+        started = time.perf_counter()
+        while not self.__stopped.wait(self.__interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self.__thread_id)  # pylint: disable=protected-access
+            stack: List[Frame] = []
+            kept = self.__root is None
+            while frame is not None:
+                kept = kept or frame is self.__root
+                code = frame.f_code
+                stack.append(
+                    (f"{frame.f_globals.get('__name__')}.{code.co_qualname}", code.co_filename, frame.f_lineno)
+                )
+                frame = frame.f_back
+            if kept and stack:
+                self.samples[tuple(reversed(stack))] += 1
+        self.__seconds = time.perf_counter() - started
+
+    def start(self) -> "SamplingProfiler":
+        """
+        Starts sampling the thread which calls it
+        :return: the profiler
+        """
+        self.__sampler.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops sampling
+        :return: None
+        """
+        self.__stopped.set()
+        self.__sampler.join()
+
+    def collapsed(self) -> str:
+        """
+        The samples as collapsed stacks, one line per stack with its number of samples
+        :return: the lines
+        """
+        return "".join(
+            f"{';'.join(name for name, _, _ in stack)} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+    def speedscope(self) -> Dict:
+        """
+        The samples in the sampled profile format of speedscope
+        :return: the profile
+        """
+        frames: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.__interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": settings.app_name,
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(self.__seconds, 6),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+    def write(self) -> str:
+        """
+        Writes the profile to its path in settings.profile_format
+        :return: the path
+        """
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as output:
+            if settings.profile_format == "speedscope":
+                json.dump(self.speedscope(), output)
+            else:
+                output.write(self.collapsed())
+        logger.info("[INFO] Profile of %s written to %s", self.name, self.path)
+        return self.path
+
+
+@contextmanager
+def profiled(name: str, root: Optional[FrameType] = None) -> Iterator[SamplingProfiler]:
+    """
+    Profiles the code which runs within the context and writes the profile at the end
+    :param name: the name of the profile
+    :param root: only the stacks which run through this frame are kept, all of them when not given
+    :return: the profiler
+    """
+    profiler = SamplingProfiler(name, root).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write()
+
+
+# the middleware only profiles the requests it is called with
+class ProfilingMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware which profiles the requests with a matching X-Profile header and a sample of the others, the file
+    of the profile is returned in the X-Profile-File header
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    @staticmethod
+    def __wanted(scope: Dict) -> bool:
+        token = Headers(scope=scope).get("x-profile")
+        if settings.profile_token and token and hmac.compare_digest(token, settings.profile_token):
+            return True
+        return random.random() < settings.profile_sample_rate
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if (
+            scope["type"] != "http"
+            or not (settings.profile_token or settings.profile_sample_rate)
+            or not self.__wanted(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        with profiled(
+            f"{scope['method']} {scope['path']}", sys._getframe()  # pylint: disable=protected-access
+        ) as profiler:
+
+            async def send_with_profile(message: Dict) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)["X-Profile-File"] = os.path.basename(profiler.path)
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
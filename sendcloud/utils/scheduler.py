@@ -6,20 +6,31 @@ Scheduler Module:
         scheduled again. 3 more attempts will be made to update the feed, if the task is successful, it will be
         activated again, otherwise, the feed will remain inactive.
     Scheduler:
-        The scheduler loads all active feeds once every X-time and creates a task for each of them. Since the tasks are
+        The scheduler keeps the active feeds in a compact FeedRegistry which is synced incrementally from the database,
+        once every X-time it creates a task for each of the feeds which are due. Since the tasks are
         executed in async, then the IO will not be blocked. Since the tasks are mostly IO-band factor, it is better to
         use async instead of multiprocessing as long as the 'xml parsing part' is not the case of CPU-bound factor.
+    FeedJobRunner:
+        The runner claims the feed jobs which are enqueued by the api (follow and force-update in async mode) and runs
+        a batch of them at the same time, so the api never waits for the hosts of the feeds.
+    RetentionRunner:
+        The runner prunes the old postings once every settings.retention_interval, in small batches with a pause
+        between them, so it never holds long locks on the postings which are read by the api.
 """
 import asyncio
+import time
 from asyncio import sleep
-from typing import List, Tuple, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple, Optional, Union
 import logging
 from sqlalchemy.ext.asyncio import async_scoped_session
 
-from sendcloud.utils import fetch_feed, get_session
-from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.utils import fetch_feed, get_session, settings, track_queries, log_query_stats, SamplingProfiler, span
+from sendcloud.utils import FeedRegistry, ScheduledFeed
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate, FeedJobKind, RetentionStats
 from sendcloud.services import feeds_services as feed_services
-from sendcloud.models import Feed
+from sendcloud.services import jobs_services, retention_services
+from sendcloud.models import Feed, FeedJob
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -30,8 +41,14 @@ class Task:
     A task is created to update a feed
     """
 
-    def __init__(self, feed: Feed):
+    def __init__(self, feed: Union[Feed, ScheduledFeed], registry: Optional[FeedRegistry] = None):
+        """
+        Constructor
+        :param feed: the feed to be updated
+        :param registry: the registry of the scheduler which is told about the outcome
+        """
         self.__feed = feed
+        self.__registry = registry
 
     async def __on_task_success(self, loaded_feed: Tuple[FeedItemCreate, List[PostingItemCreate]]) -> None:
         """
@@ -63,14 +80,21 @@ class Task:
         :return: None
         """
         for retry in range(2, 9, 3):
-            loaded_feed = await fetch_feed(str(self.__feed.link))
+            with track_queries() as stats, span("refresh_task", link=str(self.__feed.link), attempt=retry // 3 + 1):
+                loaded_feed = await fetch_feed(str(self.__feed.link))
+                if loaded_feed != (None, None):
+                    await self.__on_task_success(loaded_feed)  # type: ignore
+                    if self.__registry is not None:
+                        self.__registry.record_success(int(self.__feed.pk))
+                elif retry == 2:
+                    # in case the feed is not available we immediately make it deactivate to prevent from being
+                    # scheduled while it still needs to be retried
+                    await self.__on_task_failure()
+                    if self.__registry is not None:
+                        self.__registry.record_failure(int(self.__feed.pk))
+            log_query_stats(f"task {self.__feed.link}", stats)
             if loaded_feed != (None, None):
-                await self.__on_task_success(loaded_feed)  # type: ignore
                 break
-            if retry == 2:
-                # in case the feed is not available we immediately make it deactivate to prevent from being scheduled
-                # while it still needs to be retried
-                await self.__on_task_failure()
             _LOGGER.debug("[DEBUG] Task failed for link : %s , sleeping for %s", self.__feed.link, retry * 60)
             await sleep(retry * 60)
 
@@ -81,26 +105,108 @@ class Scheduler:
     Crates task for each feed once every X-time
     """
 
-    def __init__(self, time_interval: int, loop: Optional[asyncio.AbstractEventLoop]):
+    def __init__(
+        self,
+        time_interval: int,
+        loop: Optional[asyncio.AbstractEventLoop],
+        registry: Optional[FeedRegistry] = None,
+    ):
         """
         Constructor
         :param time_interval: sleep time for scheduler between each scheduling iteration in second
         :param loop: async loop
+        :param registry: the registry of the schedulable feeds, an empty one by default
         """
         self.__time_interval = time_interval
         self.__loop = loop or asyncio.get_running_loop()
+        self.__profile_next_cycle = False
+        self.__registry = registry if registry is not None else FeedRegistry()
+        # the start of the last sync and of the last full sync of the registry
+        self.__synced_at: Optional[datetime] = None
+        self.__fully_synced_at: Optional[datetime] = None
 
-    @staticmethod
-    async def __load_feeds_to_be_scheduled() -> List[Feed]:
+    def profile_next_cycle(self) -> None:
+        """
+        Profiles the next cycle of the scheduler, e.g. on a signal of the scheduler service
+        :return: None
+        """
+        self.__profile_next_cycle = True
+
+    async def __write_profile(self, profiler: SamplingProfiler, tasks: List[asyncio.Task]) -> None:
+        """
+        Writes the profile of a cycle once its tasks are done, the retries of the failed feeds are not waited for
+        :param profiler: the profiler of the cycle
+        :param tasks: the tasks of the cycle
+        :return: None
+        """
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.__time_interval)
+        profiler.stop()
+        profiler.write()
+
+    def __due_time(self, refreshed_at: Optional[datetime]) -> float:
+        """
+        The due time of a feed
+        :param refreshed_at: the last refresh of the feed
+        :return: the epoch time of its next refresh, now when it has never been refreshed
+        """
+        if refreshed_at is None:
+            return 0.0
+        return refreshed_at.replace(tzinfo=timezone.utc).timestamp() + self.__time_interval
+
+    async def __sync_registry(self) -> None:
+        """
+        Syncs the registry: all the active feeds at the first and every full sync, otherwise the feeds which have been
+        created or refreshed, e.g. followed through the api, since the last sync
+        :return: None
         """
-        Loads all active feeds
+        started = datetime.utcnow()
+        full = (
+            self.__fully_synced_at is None
+            or started - self.__fully_synced_at >= settings.feed_registry_full_sync_interval
+        )
+        if full:
+            self.__registry.clear()
+            self.__fully_synced_at = started
+        synced_pk, batch = self.__registry.last_pk, settings.feed_registry_sync_batch
+        session: async_scoped_session
+        async with get_session() as session:
+            after_pk = 0
+            while not full and (
+                rows := await feed_services.get_schedulable_feeds(
+                    after_pk, batch, session, refreshed_since=self.__synced_at, up_to_pk=synced_pk
+                )
+            ):
+                for feed_pk, link, refreshed_at in rows:
+                    self.__registry.upsert(feed_pk, link, self.__due_time(refreshed_at))
+                after_pk = rows[-1][0]
+            after_pk = synced_pk
+            while rows := await feed_services.get_schedulable_feeds(after_pk, batch, session):
+                for feed_pk, link, refreshed_at in rows:
+                    self.__registry.upsert(feed_pk, link, self.__due_time(refreshed_at))
+                after_pk = rows[-1][0]
+        self.__synced_at = started
+        _LOGGER.debug("[DEBUG] %s feeds are registered, full sync: %s", len(self.__registry), full)
+
+    async def __load_feeds_to_be_scheduled(self) -> List[ScheduledFeed]:
+        """
+        Takes the due feeds from the registry and loads their links
         :return: list of feeds
         """
+        await self.__sync_registry()
+        now = time.time()
+        # a feed which falls due during the next sleep is taken now rather than a whole interval late
+        due = self.__registry.take_due(now + self.__time_interval / 2, now + self.__time_interval)
+        feeds: List[ScheduledFeed] = []
         session: async_scoped_session
         async with get_session() as session:
-            feeds = await feed_services.get_feeds_to_be_scheduled(session)
-            _LOGGER.debug("[DEBUG] %s feeds are ready to be scheduled", len(feeds))
-            return feeds
+            for start in range(0, len(due), settings.feed_registry_sync_batch):
+                rows = await feed_services.get_feed_links(
+                    due[start : start + settings.feed_registry_sync_batch], session
+                )
+                feeds.extend(ScheduledFeed(pk, link) for pk, link in rows)
+        _LOGGER.debug("[DEBUG] %s feeds are ready to be scheduled", len(feeds))
+        return feeds
 
     async def run(self) -> None:
         """
@@ -110,9 +216,114 @@ class Scheduler:
         """
         _LOGGER.info("[INFO] Scheduler is running ... ")
         while True:
+            profiler: Optional[SamplingProfiler] = None
+            if settings.profile_scheduler or self.__profile_next_cycle:
+                self.__profile_next_cycle = False
+                profiler = SamplingProfiler("scheduler cycle").start()
             feeds_to_be_scheduled = await self.__load_feeds_to_be_scheduled()
+            tasks = []
             for feed in feeds_to_be_scheduled:
-                task = Task(feed)
-                self.__loop.create_task(task.start())
+                task = Task(feed, self.__registry)
+                tasks.append(self.__loop.create_task(task.start()))
+            if profiler:
+                self.__loop.create_task(self.__write_profile(profiler, tasks))
             _LOGGER.debug("[DEBUG] sleeping for %s", self.__time_interval)
             await sleep(self.__time_interval)
+
+
+class FeedJobRunner:
+    """
+    Runs the feed jobs which are stored by the api
+    """
+
+    def __init__(self, poll_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        """
+        Constructor
+        :param poll_interval: sleep time in seconds when there is no job, settings.feed_job_poll_interval by default
+        :param batch_size: jobs which run at the same time, settings.feed_job_batch_size by default
+        """
+        self.__poll_interval = poll_interval or settings.feed_job_poll_interval
+        self.__batch_size = batch_size or settings.feed_job_batch_size
+
+    @staticmethod
+    async def run_job(job: FeedJob) -> None:
+        """
+        Runs one job and stores its result
+        :param job: the claimed job
+        :return: None
+        """
+        session: async_scoped_session
+        with track_queries() as stats:
+            async with get_session() as session:
+                error: Optional[str] = None
+                try:
+                    if job.kind == FeedJobKind.FOLLOW.value:
+                        if await feed_services.follow_new_feed(str(job.username), str(job.link), session) is None:
+                            error = "feed or user not found"
+                    elif not await feed_services.force_update_feed(str(job.username), str(job.link), session):
+                        error = "Unfortunately update was not successful"
+                except Exception as exception:  # pylint: disable=broad-exception-caught
+                    _LOGGER.error("[ERROR] Feed job %s failed, kind: %s", job.job_id, type(exception))
+                    await session.rollback()
+                    error = str(exception)
+                await jobs_services.finish_feed_job(int(job.pk), error, session)
+                _LOGGER.debug("[DEBUG] Feed job %s finished, error: %s", job.job_id, error)
+        log_query_stats(f"job {job.job_id}", stats)
+
+    async def run_once(self) -> int:
+        """
+        Claims a batch of jobs and runs them
+        :return: number of jobs which have been run
+        """
+        session: async_scoped_session
+        async with get_session() as session:
+            jobs = await jobs_services.claim_feed_jobs(self.__batch_size, session)
+        await asyncio.gather(*[self.run_job(job) for job in jobs])
+        return len(jobs)
+
+    async def run(self) -> None:
+        """
+        Entry point of the job runner, it keeps running batches of jobs and sleeps when there is none
+        :return: None
+        """
+        _LOGGER.info("[INFO] Feed job runner is running ... ")
+        while True:
+            if not await self.run_once():
+                await sleep(self.__poll_interval)
+
+
+class RetentionRunner:
+    """
+    Prunes the postings with the retention policies of the feeds
+    """
+
+    def __init__(self, interval: Optional[timedelta] = None):
+        """
+        Constructor
+        :param interval: sleep time between two runs, settings.retention_interval by default
+        """
+        self.__interval = interval or settings.retention_interval
+
+    @staticmethod
+    async def run_once() -> RetentionStats:
+        """
+        Runs the retention of all the feeds
+        :return: the stats of the run
+        """
+        session: async_scoped_session
+        async with get_session() as session:
+            return await retention_services.apply_retention(session)
+
+    async def run(self) -> None:
+        """
+        Entry point of the retention runner, a failed run is logged and the next one runs after the interval
+        :return: None
+        """
+        _LOGGER.info("[INFO] Retention runner is running ... ")
+        while True:
+            try:
+                stats = await self.run_once()
+                _LOGGER.debug("[DEBUG] Retention run finished: %s", stats)
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                _LOGGER.error("[ERROR] Retention run failed, kind: %s", type(exception))
+            await sleep(self.__interval.total_seconds())
@@ -1,4 +1,6 @@
 """Setting module"""
+from datetime import timedelta
+from typing import Dict, List, Optional
 from pydantic import BaseSettings
 
 
@@ -10,6 +12,110 @@ class Settings(BaseSettings):
 
     app_name: str = "SendCloud"
     database_url: str = "sqlite+aiosqlite:///database.db"
+    # read-only replicas of database_url, the read-only service functions use them in turn, e.g. '["postgresql+..."]'
+    database_replica_urls: List[str] = []
+    # the reads of a user go to the primary for this time after the user's own writes, while the replicas catch up
+    replica_sticky_window: timedelta = timedelta(seconds=5)
+    # a SQLite database file is opened in the embedded mode, one serialized writer connection and a pool of readers
+    sqlite_embedded: bool = True
+    # pragmas of every connection of the embedded mode, the WAL journal lets the readers run next to the writer and
+    # the busy timeout makes the writers of the api and the scheduler processes wait for each other
+    sqlite_pragmas: Dict[str, str] = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "5000",
+        "cache_size": "-16000",
+        "temp_store": "MEMORY",
+        "mmap_size": "134217728",
+    }
+    # reader connections of the embedded mode
+    sqlite_reader_pool_size: int = 4
+    # a session waits this time in seconds for the writer connection of the embedded mode before it fails
+    sqlite_writer_timeout: float = 30.0
+    # rows fetched from the server side cursor per round trip when exporting postings
+    export_batch_size: int = 1000
+    # feeds fetched at the same time while importing an OPML subscription list
+    opml_import_concurrency: int = 20
+    # a stored feed which has been refreshed within this window is followed without fetching it again
+    feed_freshness_window: timedelta = timedelta(hours=1)
+    # a feed fetch fails when the host has not sent the whole feed within this time in seconds
+    feed_fetch_timeout: float = 30.0
+    # the result of a feed fetch is shared with the callers which ask for the same feed within this time
+    single_flight_ttl: timedelta = timedelta(seconds=5)
+    # the scheduler service looks for new feed jobs this often in seconds when there is nothing to do
+    feed_job_poll_interval: float = 1.0
+    # rows per query while the scheduler syncs its feed registry and loads the links of the due feeds
+    feed_registry_sync_batch: int = 5000
+    # the registry of the scheduler is loaded from scratch this often, in between only the new and the refreshed feeds
+    # are synced, so the feeds which have been deactivated by another scheduler service are dropped
+    feed_registry_full_sync_interval: timedelta = timedelta(hours=6)
+    # feed jobs run at the same time by a scheduler service
+    feed_job_batch_size: int = 10
+    # a running feed job is considered lost after this time, e.g. when its scheduler service has been stopped
+    feed_job_timeout: timedelta = timedelta(minutes=10)
+    # postings published before this age are pruned by the retention of the scheduler service, kept forever when not set
+    retention_max_age: Optional[timedelta] = None
+    # only the latest postings of every feed are kept by the retention, all of them when not set
+    retention_max_postings: Optional[int] = None
+    # the pruned postings are moved to the postings_archive table instead of being dropped
+    retention_archive: bool = False
+    # postings deleted per transaction by the retention
+    retention_batch_size: int = 500
+    # sleep time in seconds between two batches of the retention, so it does not starve the api of the database
+    retention_batch_pause: float = 0.1
+    # the retention runs this often in the scheduler service
+    retention_interval: timedelta = timedelta(hours=6)
+    # the statements of every api request and scheduler task are counted and timed, the stats are logged as JSON
+    sql_stats: bool = False
+    # the stats of a request are returned in its X-DB-* response headers as well, for debugging only
+    sql_stats_headers: bool = False
+    # a statement shape which runs this often within a request or a task is logged as a likely N+1 query
+    sql_n_plus_one_threshold: int = 5
+    # directory the profiles of the requests and the scheduler cycles are written to
+    profile_dir: str = "profiles"
+    # format of the profiles, "speedscope" JSON files or "collapsed" stacks for flamegraph.pl
+    profile_format: str = "speedscope"
+    # seconds between two samples of the stack of the event loop while profiling
+    profile_interval: float = 0.005
+    # a request with this value in its X-Profile header is profiled, no request is profiled by the header when not set
+    profile_token: Optional[str] = None
+    # share of the requests which are profiled at random
+    profile_sample_rate: float = 0.0
+    # every cycle of the scheduler is profiled, a SIGUSR1 of the scheduler service profiles its next cycle only
+    profile_scheduler: bool = False
+    # the lag of the event loop of the api and the scheduler services is measured by a monitor task
+    loop_monitor: bool = True
+    # the monitor measures the lag this often in seconds
+    loop_monitor_interval: float = 0.1
+    # a lag longer than this in seconds is logged with the stack of the call which blocks the loop
+    loop_lag_threshold: float = 0.1
+    # upper bounds in seconds of the buckets of the event_loop_lag_seconds histogram
+    loop_lag_buckets: List[float] = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+    # the scheduler, which has no http endpoint, logs its metrics this often in seconds
+    metrics_log_interval: float = 60
+    # the steps of the requests and of the follow and refresh pipelines are recorded as spans of a trace
+    tracing: bool = False
+    # "memory" keeps the latest spans in the process, "file" appends them to tracing_file as JSON lines
+    tracing_exporter: str = "memory"
+    # file of the spans of the "file" exporter
+    tracing_file: str = "spans.jsonl"
+    # spans kept by the "memory" exporter
+    tracing_memory_spans: int = 10000
+    # well-formed RSS 2.0 and Atom feeds are parsed by the fast path, anything else by feedparser
+    fast_feed_parser: bool = True
+    # bytes handed to the incremental parser of the fast path at a time
+    feed_parse_chunk_size: int = 64 * 2**10
+    # the body of a feed is fed to the fast path as it is downloaded instead of being read whole first
+    feed_streaming: bool = True
+    # a feed the fast path has given up on while it streamed is read whole for feedparser this long, the fast path is
+    # tried again afterwards in case the feed has changed
+    feedparser_fallback_ttl: timedelta = timedelta(days=1)
+    # feeds remembered to be read whole for feedparser, the ones which have fallen back the longest ago are forgotten
+    feedparser_fallback_max_links: int = 10000
+    # the download of a larger feed is stopped and the feed fails, whether it is streamed or read for feedparser
+    feed_max_bytes: int = 16 * 2**20
+    # postings kept of a feed, a streamed feed stops once they have been read, all of them are kept by default
+    feed_max_entries: Optional[int] = None
 
 
 settings = Settings()
@@ -0,0 +1,66 @@
+"""
+Single flight module, the concurrent calls for the same key share one execution instead of running it again
+"""
+import asyncio
+from datetime import timedelta
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Runs at most one call per key at a time in the running process. The callers which arrive while a call is in flight
+    await its result, and the result is kept for a short time after it has completed, so the callers which retry right
+    after it do not run it again. Exceptions are shared by the waiting callers but they are not kept
+    """
+
+    def __init__(self, ttl: timedelta):
+        """
+        Constructor
+        :param ttl: how long the result of a completed call is kept
+        """
+        self.__ttl = ttl.total_seconds()
+        self.__in_flight: Dict[str, "asyncio.Task[T]"] = {}
+        self.__results: Dict[str, Tuple[float, T]] = {}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs the call unless one is in flight or has just completed for the same key
+        :param key: the key of the call
+        :param call: creates the awaitable to be run
+        :return: the result of the shared call
+        """
+        if (result := self.__results.get(key)) is not None:
+            if result[0] > monotonic():
+                return result[1]
+            del self.__results[key]
+
+        if (task := self.__in_flight.get(key)) is None:
+            task = asyncio.ensure_future(call())
+            self.__in_flight[key] = task
+            task.add_done_callback(lambda done: self.__on_done(key, done))
+        # a cancelled caller does not cancel the call for the other callers
+        return await asyncio.shield(task)
+
+    def __on_done(self, key: str, task: "asyncio.Task[T]") -> None:
+        """
+        Keeps the result of a successful call and forgets the expired results
+        :param key: the key of the call
+        :param task: the completed call
+        :return: None
+        """
+        del self.__in_flight[key]
+        now = monotonic()
+        for expired in [item for item, (expires_at, _) in self.__results.items() if expires_at <= now]:
+            del self.__results[expired]
+        if self.__ttl > 0 and not task.cancelled() and task.exception() is None:
+            self.__results[key] = (now + self.__ttl, task.result())
+
+    def clear(self) -> None:
+        """
+        Forgets the kept results, the calls in flight are not affected
+        :return: None
+        """
+        self.__results.clear()
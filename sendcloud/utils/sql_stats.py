@@ -0,0 +1,162 @@
+"""
+SQL stats module. The statements of every api request and every scheduler task are counted and timed through the
+events of the engines when settings.sql_stats is set. The stats are logged as JSON at the end of the request or the
+task, and a statement shape which repeats within it, i.e. the same statement with other values, is flagged as a likely
+N+1 query
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """
+    The statements of a request or a task
+    """
+
+    count: int = 0
+    seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str = ""
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        """
+        Adds a statement
+        :param statement: the sql of the statement
+        :param seconds: its execution time
+        :return: None
+        """
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds, self.slowest_statement = seconds, statement
+
+    def repeated_shapes(self) -> Dict[str, int]:
+        """
+        The shapes which repeat at least settings.sql_n_plus_one_threshold times
+        :return: the number of statements by shape
+        """
+        return {shape: count for shape, count in self.shapes.items() if count >= settings.sql_n_plus_one_threshold}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        The stats as they are logged
+        :return: the stats
+        """
+        return {
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 3),
+            "slowest_ms": round(self.slowest_seconds * 1000, 3),
+            "slowest_statement": statement_shape(self.slowest_statement),
+            "n_plus_one": self.repeated_shapes(),
+        }
+
+    def headers(self) -> Dict[str, str]:
+        """
+        The stats as debug response headers
+        :return: the headers
+        """
+        return {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Time-Ms": f"{self.seconds * 1000:.3f}",
+            "X-DB-Slowest-Ms": f"{self.slowest_seconds * 1000:.3f}",
+            "X-DB-N-Plus-One": str(len(self.repeated_shapes())),
+        }
+
+
+# the stats of the running request or task, the events of the engines run in its context
+__current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    The shape of a statement, the statements which only differ by their values and the length of their IN lists share
+    the same shape
+    :param statement: the sql of the statement
+    :return: the shape
+    """
+    shape = re.sub(r"\$\d+", "?", " ".join(statement.split()))
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?", shape)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def __before_cursor_execute(conn: Any, *_: Any) -> None:
+    if __current_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def __after_cursor_execute(conn: Any, _: Any, statement: str, *__: Any) -> None:
+    if (stats := __current_stats.get()) is not None and conn.info.get("query_started"):
+        stats.record(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collects the statements which run within the context, nothing is collected unless settings.sql_stats is set
+    :return: the stats
+    """
+    stats = QueryStats()
+    if not settings.sql_stats:
+        yield stats
+        return
+    token = __current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        __current_stats.reset(token)
+
+
+def log_query_stats(name: str, stats: QueryStats) -> None:
+    """
+    Logs the stats of a request or a task as JSON, as a warning when it looks like an N+1 query
+    :param name: the request or the task
+    :param stats: its stats
+    :return: None
+    """
+    if settings.sql_stats:
+        level = logging.WARNING if stats.repeated_shapes() else logging.DEBUG
+        logger.log(level, "[SQL] %s", json.dumps({"name": name, **stats.as_dict()}))
+
+
+# an ASGI middleware is only called by the application it wraps
+class QueryStatsMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware which collects the stats of every request, logs them and returns them in the X-DB-* headers when
+    settings.sql_stats_headers is set. The statements of a streamed body which run after the headers are only logged
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not settings.sql_stats:
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_stats(message: Dict) -> None:
+                if message["type"] == "http.response.start" and settings.sql_stats_headers:
+                    MutableHeaders(scope=message).update(stats.headers())
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+        log_query_stats(f"{scope['method']} {scope['path']}", stats)
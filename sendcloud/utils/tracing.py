@@ -0,0 +1,253 @@
+"""
+Tracing module. The steps of the follow and refresh pipelines run in nested spans when settings.tracing is set, a span
+knows its trace and its parent through a context variable, so the spans of a task created within a span belong to the
+same trace. The finished spans are handed to an exporter, the built-in ones keep them in memory or append them to a
+JSON lines file, so tracing works without any collector. Every log record carries the trace_id and span_id of the
+running span once install_trace_log_records has been called.
+"""
+import json
+import logging
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+# the fields of a span are the ones it is exported with
+@dataclass
+class Span:  # pylint: disable=too-many-instance-attributes
+    """
+    A timed step of a trace
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """
+        Sets an attribute of the span, e.g. the link of the feed or the number of entries
+        :param key: the name of the attribute
+        :param value: its value
+        :return: None
+        """
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        """
+        The duration of a finished span
+        :return: milliseconds or None while it runs
+        """
+        return None if self.end is None else round((self.end - self.start) * 1000, 3)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        The span as it is exported
+        :return: the span
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# an exporter only receives the spans
+class SpanExporter:  # pylint: disable=too-few-public-methods
+    """
+    Receives the finished spans, an exporter to another backend overrides export
+    """
+
+    def export(self, finished_span: Span) -> None:
+        """
+        Exports a finished span
+        :param finished_span: the span
+        :return: None
+        """
+        raise NotImplementedError
+
+
+class InMemoryExporter(SpanExporter):
+    """
+    Keeps the latest finished spans in the memory of the process
+    """
+
+    def __init__(self, max_spans: Optional[int] = None):
+        """
+        Constructor
+        :param max_spans: spans which are kept, settings.tracing_memory_spans by default
+        """
+        self.spans: Deque[Span] = deque(maxlen=max_spans or settings.tracing_memory_spans)
+
+    def export(self, finished_span: Span) -> None:
+        self.spans.append(finished_span)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        """
+        The kept spans of a trace
+        :param trace_id: the trace
+        :return: the spans in the order they have finished
+        """
+        return [item for item in self.spans if item.trace_id == trace_id]
+
+
+class FileExporter(SpanExporter):  # pylint: disable=too-few-public-methods
+    """
+    Appends the finished spans to a file, one JSON object per line
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Constructor
+        :param path: the file, settings.tracing_file by default
+        """
+        self.path = path or settings.tracing_file
+        self.__lock = threading.Lock()
+
+    def export(self, finished_span: Span) -> None:
+        with self.__lock, open(self.path, "a", encoding="utf-8") as output:
+            output.write(json.dumps(finished_span.as_dict(), default=str) + "\n")
+
+
+# the span which runs in the current context
+__current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# the exporter of the finished spans, it is created from the settings on first use
+__exporters: List[SpanExporter] = []
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """
+    Replaces the exporter of the finished spans
+    :param exporter: the new exporter
+    :return: None
+    """
+    __exporters[:] = [exporter]
+
+
+def get_exporter() -> SpanExporter:
+    """
+    The exporter of the finished spans, a FileExporter when settings.tracing_exporter is "file", an InMemoryExporter
+    otherwise
+    :return: the exporter
+    """
+    if not __exporters:
+        __exporters.append(FileExporter() if settings.tracing_exporter == "file" else InMemoryExporter())
+    return __exporters[0]
+
+
+def current_span() -> Optional[Span]:
+    """
+    The span which runs in the current context
+    :return: the span or None
+    """
+    return __current_span.get()
+
+
+@contextmanager
+def span(
+    name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes: Any
+) -> Iterator[Span]:
+    """
+    Runs the code within the context in a span, it is the child of the running span unless a trace is given. Nothing
+    is recorded unless settings.tracing is set
+    :param name: the name of the step
+    :param trace_id: the trace of a remote parent, e.g. from a traceparent header
+    :param parent_id: the span of the remote parent
+    :param attributes: the attributes of the span
+    :return: the span
+    """
+    if not settings.tracing:
+        yield Span(name, "-", "-", attributes=attributes)
+        return
+    parent = __current_span.get()
+    if trace_id is None and parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    new_span = Span(name, trace_id or secrets.token_hex(16), secrets.token_hex(8), parent_id, attributes=attributes)
+    token = __current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as error:
+        new_span.status = "error"
+        new_span.set_attribute("error", type(error).__name__)
+        raise
+    finally:
+        new_span.end = time.time()
+        __current_span.reset(token)
+        try:
+            get_exporter().export(new_span)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.error("[ERROR] Span %s couldn't be exported, kind: %s", new_span.name, type(error))
+
+
+def install_trace_log_records() -> None:
+    """
+    Adds the trace_id and the span_id of the running span to every log record, "-" outside of a span, so the format of
+    the logs can show them with %(trace_id)s
+    :return: None
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "traced", False):
+        return
+
+    def traced_factory(*args: Any, **kwargs: Any) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        running = __current_span.get()
+        record.trace_id = running.trace_id if running else "-"
+        record.span_id = running.span_id if running else "-"
+        return record
+
+    traced_factory.traced = True  # type: ignore
+    logging.setLogRecordFactory(traced_factory)
+
+
+# version-trace_id-parent_id-flags of the W3C trace context
+TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+# the middleware only runs the requests in their spans
+class TracingMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware which runs every request in a root span, it continues the trace of a traceparent header and
+    returns the trace in the X-Trace-Id header
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not settings.tracing:
+            await self.app(scope, receive, send)
+            return
+
+        remote = TRACEPARENT.match(Headers(scope=scope).get("traceparent", ""))
+        with span(f"{scope['method']} {scope['path']}", *(remote.groups() if remote else ())) as request_span:
+
+            async def send_with_trace(message: Dict) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("status_code", message["status"])
+                    MutableHeaders(scope=message)["X-Trace-Id"] = request_span.trace_id
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
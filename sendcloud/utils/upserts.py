@@ -0,0 +1,56 @@
+"""
+Upserts module. Postgres and SQLite both support INSERT ... ON CONFLICT, but Postgres names the conflict target by its
+constraint while SQLite only takes the columns of a unique index, so the services build their upserts through these
+helpers and stay the same on both databases
+"""
+from typing import Any, Dict, Type, Union, cast
+
+from sqlalchemy import PrimaryKeyConstraint, Table
+from sqlalchemy.sql.schema import ColumnCollectionConstraint
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_scoped_session
+
+from .db_manager import Base
+
+
+def __table(model: Union[Table, Type[Base]]) -> Table:
+    """
+    The table of a model
+    :param model: a mapped class or a table
+    :return: the table
+    """
+    if isinstance(model, Table):
+        return model
+    return cast(Table, model.__table__)
+
+
+def upsert_insert(model: Union[Table, Type[Base]], session: async_scoped_session) -> Any:
+    """
+    An INSERT of the dialect of the session which supports on_conflict_do_update and on_conflict_do_nothing
+    :param model: a mapped class or a table
+    :param session: database session
+    :return: the insert statement
+    """
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def conflict_target(model: Union[Table, Type[Base]], constraint: str, session: async_scoped_session) -> Dict[str, Any]:
+    """
+    The arguments of on_conflict_do_update and on_conflict_do_nothing which target a unique constraint
+    :param model: a mapped class or a table
+    :param constraint: the constraint name, the primary key is named <table>_pkey as on Postgres
+    :param session: database session
+    :return: the constraint on Postgres, the columns of the constraint on SQLite
+    :raise ValueError: in case the table has no such constraint
+    """
+    if session.bind.dialect.name != "sqlite":
+        return {"constraint": constraint}
+    table = __table(model)
+    for item in table.constraints:
+        if not isinstance(item, ColumnCollectionConstraint):
+            continue
+        if item.name == constraint or (isinstance(item, PrimaryKeyConstraint) and constraint == f"{table.name}_pkey"):
+            return {"index_elements": [column.name for column in item.columns]}
+    raise ValueError(f"{table.name} has no constraint {constraint}")
@@ -207,7 +207,7 @@ async def test_create_feed_for_user() -> None:
         retrieved_user_feed = (await session.execute(stmt)).one_or_none()
 
         assert retrieved_user_feed is not None, "The relationship between user and feed should exist"
-        assert retrieved_user_feed.tuple() == (1, 1)
+        assert retrieved_user_feed.tuple() == (1, 1, None)
 
 
 @pytest.mark.asyncio
@@ -252,7 +252,7 @@ async def test_read_posting_by_user() -> None:
         retrieved_user_feed = (await session.execute(stmt)).one_or_none()
 
         assert retrieved_user_feed is not None, "The posting should had been saved as read"
-        assert retrieved_user_feed.tuple() == (1, 1)
+        assert retrieved_user_feed.tuple() == (1, 1, True)
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,219 @@
+"""test feeds routers"""
+from collections import namedtuple
+from datetime import datetime
+from unittest.mock import patch, MagicMock, AsyncMock
+import pytest
+from fastapi.testclient import TestClient
+
+from sendcloud.apps.api_service import app
+from sendcloud.models import FeedJob
+from sendcloud.schemas import ImportJob
+
+fastapi_client = TestClient(app)
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.make_postings_read", return_value=3)
+async def test_mark_postings_read(make_postings_read_mocker: MagicMock) -> None:
+    """test can mark many postings read"""
+    result = fastapi_client.patch(
+        "/v1.0/feeds/postings/read/bulk", json={"username": "testuser1", "feed_link": "test_link1"}
+    )
+
+    assert result.status_code == 200
+    assert result.json() == {"affected": 3}
+    make_postings_read_mocker.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.make_postings_unread", return_value=0)
+async def test_mark_postings_unread_without_filters(make_postings_unread_mocker: MagicMock) -> None:
+    """test bulk unread needs at least one filter"""
+    result = fastapi_client.patch("/v1.0/feeds/postings/unread/bulk", json={"username": "testuser1"})
+
+    assert result.status_code == 400
+    make_postings_unread_mocker.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch(
+    "sendcloud.services.feeds_services.get_following_postings_version",
+    new=AsyncMock(return_value=(1, 0, 1, None, None, 1)),
+)
+@patch("sendcloud.services.feeds_services.filter_following_feed_postings")
+async def test_get_all_following_feed_postings(filter_mocker: MagicMock) -> None:
+    """test the posting rows are encoded without the response model"""
+    posting = namedtuple("posting", ["link", "title", "author", "published_at", "updated_at", "description"])
+    filter_mocker.return_value = [
+        posting("test_link1", "title", "author", datetime(2023, 1, 1), datetime(2023, 1, 2, 3, 4, 5), "description")
+    ]
+    result = fastapi_client.get("/v1.0/feeds/following/postings", params={"username": "testuser1"})
+
+    assert result.status_code == 200
+    assert result.json() == {
+        "postings": [
+            {
+                "link": "test_link1",
+                "title": "title",
+                "author": "author",
+                "published_at": "2023-01-01T00:00:00",
+                "updated_at": "2023-01-02T03:04:05",
+                "description": "description",
+            }
+        ]
+    }
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.stream_following_feed_postings")
+async def test_export_following_feed_postings(stream_mocker: MagicMock) -> None:
+    """test the exported postings are streamed as one json object per line"""
+    posting = namedtuple("posting", ["link", "published_at"])
+
+    async def batches():
+        yield [posting("test_link1", datetime(2023, 1, 1)), posting("test_link2", datetime(2023, 1, 2))]
+        yield [posting("test_link3", datetime(2023, 1, 3))]
+
+    stream_mocker.return_value = batches()
+    result = fastapi_client.get("/v1.0/feeds/following/postings/export", params={"username": "testuser1"})
+
+    assert result.status_code == 200
+    assert result.headers["content-type"] == "application/x-ndjson"
+    assert result.text.splitlines() == [
+        '{"link":"test_link1","published_at":"2023-01-01T00:00:00"}',
+        '{"link":"test_link2","published_at":"2023-01-02T00:00:00"}',
+        '{"link":"test_link3","published_at":"2023-01-03T00:00:00"}',
+    ]
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.jobs_services.get_import_job")
+@patch("sendcloud.services.jobs_services.create_import_job")
+@patch("sendcloud.services.feeds_services.import_feeds")
+@patch("sendcloud.services.users_services.get_user_by_username")
+async def test_import_opml(
+    get_user_mocker: MagicMock, import_feeds_mocker: MagicMock, create_job_mocker: MagicMock, get_job_mocker: MagicMock
+) -> None:
+    """test an import returns its job immediately and the job can be followed"""
+    get_user_mocker.return_value = MagicMock()
+    create_job_mocker.side_effect = lambda username, total, session: ImportJob(
+        job_id="a" * 32, username=username, total=total
+    )
+    get_job_mocker.side_effect = lambda job_id, session: ImportJob(job_id=job_id, username="testuser1")
+    opml = b'<opml version="2.0"><body><outline xmlUrl="test_link1" /><outline xmlUrl="test_link2" /></body></opml>'
+    result = fastapi_client.post("/v1.0/feeds/import/opml", params={"username": "testuser1"}, content=opml)
+
+    assert result.status_code == 202
+    job = result.json()
+    assert (job["username"], job["status"], job["total"]) == ("testuser1", "pending", 2)
+    assert import_feeds_mocker.call_args.args == (job["job_id"], ["test_link1", "test_link2"])
+
+    result = fastapi_client.get(f"/v1.0/feeds/import/jobs/{job['job_id']}")
+    assert result.status_code == 200
+    assert result.json()["job_id"] == job["job_id"]
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.jobs_services.get_import_job", return_value=None)
+@patch("sendcloud.services.feeds_services.import_feeds")
+async def test_import_opml_with_invalid_document(import_feeds_mocker: MagicMock, get_job_mocker: MagicMock) -> None:
+    """test an invalid OPML document is rejected"""
+    result = fastapi_client.post("/v1.0/feeds/import/opml", params={"username": "testuser1"}, content=b"<opml")
+
+    assert result.status_code == 400
+    import_feeds_mocker.assert_not_called()
+    assert fastapi_client.get("/v1.0/feeds/import/jobs/unknown").status_code == 400
+    get_job_mocker.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.jobs_services.enqueue_feed_job")
+async def test_follow_new_feed_async(enqueue_mocker: MagicMock) -> None:
+    """test an async follow returns its pending job"""
+    now = datetime(2023, 1, 1)
+    enqueue_mocker.return_value = FeedJob(
+        job_id="a" * 32,
+        kind="follow",
+        username="testuser1",
+        link="test_link1",
+        status="pending",
+        attempts=0,
+        created_at=now,
+        updated_at=now,
+    )
+    result = fastapi_client.post("/v1.0/feeds/follow/async", json={"username": "testuser1", "link": "test_link1"})
+
+    assert result.status_code == 202
+    assert result.json()["job_id"] == "a" * 32
+    assert result.json()["status"] == "pending"
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.jobs_services.enqueue_feed_job", return_value=None)
+async def test_force_update_feed_async_when_user_doesnt_exist(enqueue_mocker: MagicMock) -> None:
+    """test an async force update is rejected for an invalid user"""
+    result = fastapi_client.post(
+        "/v1.0/feeds/feed/force-update/async", json={"username": "testuser1", "link": "test_link1"}
+    )
+
+    assert result.status_code == 400
+    enqueue_mocker.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.jobs_services.get_feed_job", return_value=None)
+async def test_get_feed_job_which_doesnt_exist(get_feed_job_mocker: MagicMock) -> None:
+    """test an unknown job is rejected"""
+    assert fastapi_client.get("/v1.0/feeds/jobs/unknown").status_code == 400
+    get_feed_job_mocker.assert_called()
+
+
+@pytest.mark.asyncio
+@patch(
+    "sendcloud.services.feeds_services.get_following_postings_version",
+    new=AsyncMock(return_value=(1, 0, 1, None, None, 1)),
+)
+@patch("sendcloud.services.feeds_services.filter_following_feed_postings")
+async def test_get_all_following_feed_postings_with_fields(filter_mocker: MagicMock) -> None:
+    """test only the requested fields are passed down and returned"""
+    posting = namedtuple("posting", ["title", "link"])
+    filter_mocker.return_value = [posting("title", "test_link1")]
+    result = fastapi_client.get(
+        "/v1.0/feeds/following/postings", params={"username": "testuser1", "fields": "title, link"}
+    )
+
+    assert result.status_code == 200
+    assert result.json() == {"postings": [{"title": "title", "link": "test_link1"}]}
+    assert filter_mocker.call_args.args[-1] == ["title", "link"]
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.get_following_postings_version")
+@patch("sendcloud.services.feeds_services.filter_following_feed_postings", return_value=[])
+async def test_get_all_following_feed_postings_not_modified(
+    filter_mocker: MagicMock, version_mocker: MagicMock
+) -> None:
+    """test an unchanged version is answered with 304 without querying the postings"""
+    version_mocker.return_value = (1, 0, 1, None, None, 1)
+    result = fastapi_client.get("/v1.0/feeds/following/postings", params={"username": "testuser1"})
+    etag = result.headers["etag"]
+    assert result.status_code == 200 and etag.startswith('W/"')
+
+    result = fastapi_client.get(
+        "/v1.0/feeds/following/postings", params={"username": "testuser1"}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 304
+    assert result.headers["etag"] == etag
+    assert filter_mocker.call_count == 1
+
+    result = fastapi_client.get(
+        "/v1.0/feeds/following/postings", params={"username": "testuser1", "limit": 5}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 200, "another page has another ETag"
+
+    version_mocker.return_value = (1, 1, 1, None, None, 1)
+    result = fastapi_client.get(
+        "/v1.0/feeds/following/postings", params={"username": "testuser1"}, headers={"If-None-Match": etag}
+    )
+    assert result.status_code == 200, "a new version has another ETag"
+    assert filter_mocker.call_count == 3
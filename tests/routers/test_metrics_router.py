@@ -0,0 +1,21 @@
+"""test metrics router"""
+from fastapi.testclient import TestClient
+
+from sendcloud.apps.api_service import app
+from sendcloud.utils import metrics
+
+fastapi_client = TestClient(app)
+
+
+def test_get_metrics() -> None:
+    """check if the metrics of the process are exposed in the text format of prometheus"""
+    metrics.clear()
+    metrics.observe("event_loop_lag_seconds", 0.002, [0.001, 0.005])
+
+    result = fastapi_client.get("/metrics")
+
+    assert result.status_code == 200
+    assert result.headers["content-type"].startswith("text/plain")
+    assert 'event_loop_lag_seconds_bucket{le="0.005"} 1.0\n' in result.text
+    assert "event_loop_lag_seconds_count 1.0\n" in result.text
+    metrics.clear()
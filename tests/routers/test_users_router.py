@@ -76,3 +76,18 @@ async def test_create_user(get_users_mocker: MagicMock):
 
     assert result.status_code == 201
     get_users_mocker.assert_called()
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.users_services.get_users", return_value=__get_users_with_feeds())
+@setup_tests()
+async def test_get_all_users_not_modified(get_users_mocker: MagicMock) -> None:
+    """test an unchanged user list is answered with 304 without querying the users"""
+    result = fastapi_client.get("/v1.0/users/")
+    etag = result.headers["etag"]
+
+    result = fastapi_client.get("/v1.0/users/", headers={"If-None-Match": etag})
+
+    assert result.status_code == 304
+    assert result.content == b""
+    assert get_users_mocker.call_count == 1
@@ -0,0 +1,55 @@
+"""helpers shared by the tests of the services"""
+import datetime
+from sqlalchemy.ext.asyncio import async_scoped_session
+
+from sendcloud.models import User, Feed, Posting
+
+
+async def create_followed_and_unfollowed_postings(session: async_scoped_session) -> None:
+    """
+    create a user which follows "followed_feed" with two postings and doesn't follow "other_feed" with one posting
+    :param session: database session
+    :return: None
+    """
+    followed_feed = Feed(
+        title="Test Feed",
+        description="Test Feed Description",
+        category="Test Feed Category",
+        lang="Dutch",
+        link="followed_feed",
+        copyright_text="Copyright (c) 2010",
+    )
+    other_feed = Feed(
+        title="Test Feed",
+        description="Test Feed Description",
+        category="Test Feed Category",
+        lang="Dutch",
+        link="other_feed",
+        copyright_text="Copyright (c) 2010",
+    )
+    session.add_all([followed_feed, other_feed])
+    await session.commit()
+
+    session.add_all(
+        [
+            Posting(
+                title="Test Posting",
+                description="Test Posting Description",
+                link=link,
+                author="test author",
+                published_at=published_at,
+                feed_id=feed_id,
+            )
+            for link, published_at, feed_id in [
+                ("posting_link1", datetime.datetime(2023, 1, 1), 1),
+                ("posting_link2", datetime.datetime(2023, 2, 1), 1),
+                ("posting_link3", datetime.datetime(2023, 1, 1), 2),
+            ]
+        ]
+    )
+    await session.commit()
+
+    user = User(username="test_username")
+    user.followed_feeds.append(followed_feed)
+    session.add(user)
+    await session.commit()
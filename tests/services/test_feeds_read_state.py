@@ -0,0 +1,412 @@
+"""test the read state of the postings in feeds services"""
+import datetime
+from typing import List
+from unittest.mock import patch
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_scoped_session
+from fastapi import HTTPException
+
+from sendcloud.utils import get_session, setup_tests
+from sendcloud.models import User, Feed, Posting
+from sendcloud.schemas import OrderByLastUpdate
+from sendcloud.services import feeds_services as feed_services
+from tests.services.helpers import create_followed_and_unfollowed_postings
+
+
+async def __read_links(username: str, session: async_scoped_session) -> List[str]:
+    """
+    the links of the postings which are read by the user
+    :param username: user unique identifier
+    :param session: database session
+    :return: sorted links
+    """
+    postings = await feed_services.filter_following_feed_postings(
+        username, None, True, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session, limit=100
+    )
+    return sorted(posting.link for posting in postings)
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_which_exists_read() -> None:
+    """check if we can make a posting which exists read"""
+    session: async_scoped_session
+    async with get_session() as session:
+        feed = Feed(
+            title="Test Feed",
+            description="Test Feed Description",
+            category="Test Feed Category",
+            lang="Dutch",
+            link="test_link1",
+            copyright_text="Copyright (c) 2010",
+        )
+        session.add(feed)
+        await session.commit()
+
+        posting = Posting(
+            title="Test Posting",
+            description="Test Posting Description",
+            link="posting_link1",
+            author="test author",
+            published_at=datetime.datetime.now(),
+            feed_id=1,
+        )
+        session.add(posting)
+
+        await session.commit()
+
+        user = User(username="test_username")
+        user.followed_feeds.append(feed)
+        session.add(user)
+        await session.commit()
+
+        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert res
+
+        read_posting_stmt = text("select * from read_postings")
+        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
+        assert read_posting is not None
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_which_doesnt_exists_read() -> None:
+    """check if we get prevented of reading a posting which does not exist"""
+    session: async_scoped_session
+    async with get_session() as session:
+        user = User(username="test_username")
+        session.add(user)
+        await session.commit()
+
+        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert not res
+
+        read_posting_stmt = text("select * from read_postings")
+        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
+        assert read_posting is None
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_read_for_invalid_user() -> None:
+    """check if we get prevented of reading a posting which does not exist"""
+    session: async_scoped_session
+    async with get_session() as session:
+        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert not res
+
+        read_posting_stmt = text("select * from read_postings")
+        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
+        assert read_posting is None
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_which_exists_unread() -> None:
+    """check if we can make a posting which exists unread"""
+    session: async_scoped_session
+    async with get_session() as session:
+        feed = Feed(
+            title="Test Feed",
+            description="Test Feed Description",
+            category="Test Feed Category",
+            lang="Dutch",
+            link="test_link1",
+            copyright_text="Copyright (c) 2010",
+        )
+        session.add(feed)
+        await session.commit()
+
+        posting = Posting(
+            title="Test Posting",
+            description="Test Posting Description",
+            link="posting_link1",
+            author="test author",
+            published_at=datetime.datetime.now(),
+            feed_id=1,
+        )
+        session.add(posting)
+        await session.commit()
+
+        user = User(username="test_username")
+        user.followed_feeds.append(feed)
+        session.add(user)
+        await session.commit()
+
+        read_posting_stmt = text("insert into read_postings (posting_pk, user_pk) values (1,1)")
+        await session.execute(read_posting_stmt)
+
+        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
+        assert res
+
+        read_posting_stmt = text("select * from read_postings where is_read")
+        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
+        assert read_posting is None
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_which_doesnt_exist_unread() -> None:
+    """check if we can make a posting which doesn't exist unread"""
+    session: async_scoped_session
+    async with get_session() as session:
+        user = User(username="test_username")
+        session.add(user)
+        await session.commit()
+
+        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
+        assert not res
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_unread_when_user_not_found() -> None:
+    """check if we can make a posting unread when user not found"""
+    session: async_scoped_session
+    async with get_session() as session:
+        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
+        assert not res
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_read_by_links() -> None:
+    """check if only the postings of the followed feeds become read in bulk"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        affected = await feed_services.make_postings_read(
+            "test_username", session, links=["posting_link1", "posting_link3", "not_existing_link"]
+        )
+        assert affected == 1
+        assert await __read_links("test_username", session) == ["posting_link1"]
+
+        read_posting_stmt = text("select posting_pk, is_read from read_postings")
+        assert (await session.execute(read_posting_stmt)).all() == [(1, True)]
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_read_by_feed_and_until() -> None:
+    """check if postings can become read for a whole feed or up to a moment by moving the read watermark"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        affected = await feed_services.make_postings_read(
+            "test_username", session, until=datetime.datetime(2023, 1, 15)
+        )
+        assert affected == 1
+        assert await __read_links("test_username", session) == ["posting_link1"]
+
+        affected = await feed_services.make_postings_read("test_username", session, feed_link="followed_feed")
+        assert affected == 1
+        assert await __read_links("test_username", session) == ["posting_link1", "posting_link2"]
+
+        affected = await feed_services.make_postings_read("test_username", session, feed_link="other_feed")
+        assert affected == 0, "not followed feed can't be read"
+
+        read_posting_stmt = text("select count(*) from read_postings")
+        assert (await session.execute(read_posting_stmt)).scalar() == 0, "watermark needs no read_postings rows"
+
+        read_until_stmt = text("select read_until from user_feed")
+        assert str((await session.execute(read_until_stmt)).scalar()).startswith("2023-02-01 00:00:00")
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_read_drops_covered_exceptions() -> None:
+    """check if moving the read watermark removes the exceptions it covers"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await feed_services.make_posting_unread("test_username", "posting_link1", session)
+        await feed_services.make_posting_read("test_username", "posting_link2", session)
+
+        affected = await feed_services.make_postings_read("test_username", session, feed_link="followed_feed")
+        assert affected == 3
+        assert await __read_links("test_username", session) == ["posting_link1", "posting_link2"]
+
+        read_posting_stmt = text("select count(*) from read_postings")
+        assert (await session.execute(read_posting_stmt)).scalar() == 0
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_read_for_invalid_user() -> None:
+    """check if nothing is affected for a user which does not exist"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        affected = await feed_services.make_postings_read("invalid_username", session, feed_link="followed_feed")
+        assert affected == 0
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_unread() -> None:
+    """check if postings can become unread in bulk"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await feed_services.make_postings_read("test_username", session, feed_link="followed_feed")
+
+        affected = await feed_services.make_postings_unread(
+            "test_username", session, links=["posting_link2", "posting_link3"]
+        )
+        assert affected == 1
+        assert await __read_links("test_username", session) == ["posting_link1"]
+
+        affected = await feed_services.make_postings_unread("test_username", session, feed_link="followed_feed")
+        assert affected == 2, "the watermark and the exception are removed"
+        assert await __read_links("test_username", session) == []
+
+        read_posting_stmt = text("select count(*) from read_postings")
+        assert (await session.execute(read_posting_stmt)).scalar() == 0
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_postings_unread_until() -> None:
+    """check if postings up to a moment become unread while the watermark keeps the newer ones read"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await feed_services.make_postings_read("test_username", session, feed_link="followed_feed")
+
+        affected = await feed_services.make_postings_unread(
+            "test_username", session, until=datetime.datetime(2023, 1, 15)
+        )
+        assert affected == 1
+        assert await __read_links("test_username", session) == ["posting_link2"]
+
+        affected = await feed_services.make_postings_unread(
+            "test_username", session, until=datetime.datetime(2023, 3, 1)
+        )
+        assert affected == 2, "the watermark is reset and the exception is removed"
+        assert await __read_links("test_username", session) == []
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_read_is_idempotent_and_needs_following() -> None:
+    """check if an already read posting is still allowed and a posting of a not followed feed is not"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        assert await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert not await feed_services.make_posting_read("test_username", "posting_link3", session)
+
+        read_posting_stmt = text("select count(*) from read_postings")
+        assert (await session.execute(read_posting_stmt)).scalar() == 1
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_make_posting_unread_keeps_other_users_read_marks() -> None:
+    """check if making a posting unread only touches the read marks of the given user"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        other_user = User(username="other_username")
+        session.add(other_user)
+        await session.commit()
+        await session.execute(text("insert into user_feed (feed_pk, user_pk) values (1, 2)"))
+        await session.commit()
+
+        assert await feed_services.make_posting_read("test_username", "posting_link1", session)
+        assert await feed_services.make_posting_read("other_username", "posting_link1", session)
+        assert await feed_services.make_posting_unread("test_username", "posting_link1", session)
+
+        assert await __read_links("test_username", session) == []
+        assert await __read_links("other_username", session) == ["posting_link1"]
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_filter_following_feed_postings_read_state() -> None:
+    """check if the read state combines the read watermark with the exceptions"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await feed_services.make_postings_read("test_username", session, until=datetime.datetime(2023, 1, 15))
+        await feed_services.make_posting_unread("test_username", "posting_link1", session)
+        await feed_services.make_posting_read("test_username", "posting_link2", session)
+
+        unread_postings = await feed_services.filter_following_feed_postings(
+            "test_username", "followed_feed", False, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session
+        )
+        assert [posting.link for posting in unread_postings] == ["posting_link1"]
+        assert await __read_links("test_username", session) == ["posting_link2"]
+
+        all_postings = await feed_services.filter_following_feed_postings(
+            "test_username", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session
+        )
+        assert len(all_postings) == 2, "postings of not followed feeds are not listed"
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_filter_following_feed_postings_with_fields() -> None:
+    """check if only the requested fields are selected"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        postings = await feed_services.filter_following_feed_postings(
+            "test_username", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session, fields=["title", "link"]
+        )
+        assert [posting._fields for posting in postings] == [("title", "link"), ("title", "link")]
+
+        with pytest.raises(HTTPException):
+            await feed_services.filter_following_feed_postings(
+                "test_username", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session, fields=["feed_id"]
+            )
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_filter_following_feed_postings_for_invalid_user() -> None:
+    """check if an invalid user is rejected"""
+    session: async_scoped_session
+    async with get_session() as session:
+        with pytest.raises(HTTPException):
+            await feed_services.filter_following_feed_postings(
+                "invalid_username", None, None, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session
+            )
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_stream_following_feed_postings() -> None:
+    """check if the export streams the followed postings in batches with the read state and time filters"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await feed_services.make_posting_read("test_username", "posting_link2", session)
+
+        with patch.object(feed_services.settings, "export_batch_size", 1):
+            batches = await feed_services.stream_following_feed_postings(
+                "test_username", None, None, None, None, session
+            )
+            assert [[posting.link for posting in batch] async for batch in batches] == [
+                ["posting_link1"],
+                ["posting_link2"],
+            ]
+
+        batches = await feed_services.stream_following_feed_postings(
+            "test_username", "followed_feed", False, None, None, session
+        )
+        assert [posting.link async for batch in batches for posting in batch] == ["posting_link1"]
+
+        batches = await feed_services.stream_following_feed_postings(
+            "test_username", None, None, datetime.datetime(2023, 1, 15), datetime.datetime(2023, 2, 1), session
+        )
+        assert [posting.link async for batch in batches for posting in batch] == ["posting_link2"]
+
+        with pytest.raises(HTTPException):
+            await feed_services.stream_following_feed_postings("invalid_username", None, None, None, None, session)
@@ -1,16 +1,21 @@
 """test feed services"""
+import asyncio
 import datetime
-from typing import List
-from unittest.mock import patch, MagicMock
+from typing import List, Optional
+from unittest.mock import patch, MagicMock, AsyncMock
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_scoped_session
 
 from sendcloud.utils import get_session
-from sendcloud.utils import setup_tests
-from sendcloud.models import User, Feed, Posting
-from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.utils import setup_tests, link_hash, LINK_HASH_PROBES
+from sendcloud.models import User, Feed
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate, OrderByLastUpdate, JobStatus
 from sendcloud.services import feeds_services as feed_services
+from sendcloud.services import jobs_services
+from tests.services.helpers import create_followed_and_unfollowed_postings
 
 
 def __create_feed_and_posting_schemas(feed_link: str, posting_links: List[str]):
@@ -142,6 +147,59 @@ async def test_insert_or_update_with_duplicate_data() -> None:
         assert postings[1].title == "posting 2 title should had been changed to me!"
 
 
+def __colliding_link_hash(link: str, probe: int = 0) -> int:
+    """
+    a link hash where the first probe of every link collides
+    :param link: the link
+    :param probe: the probe
+    :return: the hash
+    """
+    return 42 if probe == 0 else link_hash(link, probe)
+
+
+@pytest.mark.asyncio
+@patch(
+    "sendcloud.services.feeds_services.link_hashes",
+    side_effect=lambda link: [__colliding_link_hash(link, probe) for probe in range(LINK_HASH_PROBES)],
+)
+@setup_tests()
+async def test_insert_or_update_with_colliding_link_hashes(_: MagicMock) -> None:
+    """check if the postings whose link hashes collide are stored, updated and looked up by their own link"""
+    session: async_scoped_session
+    async with get_session() as session:
+        session.add(User(username="test_username"))
+        await session.commit()
+        feed, posting_items = __create_feed_and_posting_schemas("feed_link", ["posting_link1", "posting_link2"])
+        await feed_services.insert_or_update_feed(feed, posting_items, session)
+        posting_items[1].title = "posting 2 title should had been changed to me!"
+        await feed_services.insert_or_update_feed(feed, posting_items, session)
+
+        postings = (await session.execute(text("select link, title, link_hash from postings order by pk"))).all()
+        assert [(link, title) for link, title, _ in postings] == [
+            ("posting_link1", "posting_title"),
+            ("posting_link2", "posting 2 title should had been changed to me!"),
+        ]
+        assert [value for _, _, value in postings] == [42, link_hash("posting_link2", 1)]
+
+        assert await feed_services.follow_new_feed("test_username", "feed_link", session) is not None
+        assert await feed_services.make_posting_read("test_username", "posting_link2", session)
+        read = await feed_services.filter_following_feed_postings(
+            "test_username", None, True, OrderByLastUpdate.LAST_UPDATE_DESCENDING, session
+        )
+        assert [posting.link for posting in read] == ["posting_link2"]
+
+        # the posting which took the first probe is pruned, the other one is still updated with its stored hash
+        await session.execute(text("delete from postings where link = 'posting_link1'"))
+        await session.commit()
+        posting_items[1].title = "posting 2 title should had been changed again!"
+        await feed_services.insert_or_update_feed(feed, posting_items[1:], session)
+
+        postings = (await session.execute(text("select link, title, link_hash from postings order by pk"))).all()
+        assert [tuple(posting) for posting in postings] == [
+            ("posting_link2", "posting 2 title should had been changed again!", link_hash("posting_link2", 1))
+        ]
+
+
 @pytest.mark.asyncio
 @patch(
     "sendcloud.services.feeds_services.fetch_feed",
@@ -217,6 +275,96 @@ async def test_follow_new_feed_which_already_exists(feed_fetch_mock: MagicMock)
         assert user_feed_count == 1, "we should have added one relationship"
 
 
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.refresh_feed", new_callable=AsyncMock)
+@patch("sendcloud.services.feeds_services.fetch_feed")
+@setup_tests()
+async def test_follow_new_feed_which_is_stored_and_fresh(feed_fetch_mock: MagicMock, refresh_mock: AsyncMock) -> None:
+    """check if a fresh stored feed is followed from the database without fetching it"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        await session.execute(text("update feeds set refreshed_at = :now"), {"now": datetime.datetime.utcnow()})
+        await session.commit()
+
+        feed = await feed_services.follow_new_feed("test_username", "other_feed", session)
+
+        assert feed is not None and feed.link == "other_feed"
+        feed_fetch_mock.assert_not_called()
+        refresh_mock.assert_not_called()
+        user_feed_stmt = text("select count(*) from user_feed where user_pk=1 and feed_pk=2")
+        assert (await session.execute(user_feed_stmt)).scalar() == 1
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.refresh_feed", new_callable=AsyncMock)
+@patch("sendcloud.services.feeds_services.fetch_feed")
+@setup_tests()
+async def test_follow_new_feed_which_is_stored_and_stale(feed_fetch_mock: MagicMock, refresh_mock: AsyncMock) -> None:
+    """check if a stale stored feed is followed right away and refreshed in the background"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        feed = await feed_services.follow_new_feed("test_username", "other_feed", session)
+        await asyncio.sleep(0)
+
+        assert feed is not None and [posting.link for posting in feed.postings] == ["posting_link3"]
+        feed_fetch_mock.assert_not_called()
+        refresh_mock.assert_awaited_once_with("other_feed")
+        user_feed_stmt = text("select count(*) from user_feed where user_pk=1 and feed_pk=2")
+        assert (await session.execute(user_feed_stmt)).scalar() == 1
+
+
+STUB_RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+    <channel>
+        <title>stub feed</title>
+        <link>https://stub.example.com</link>
+        <description>stub description</description>
+        <item>
+            <title>stub posting</title>
+            <link>https://stub.example.com/posting1</link>
+            <description>stub posting description</description>
+            <pubDate>Thu, 01 Jun 2023 10:00:00 GMT</pubDate>
+        </item>
+    </channel>
+</rss>"""
+
+
+@pytest.mark.asyncio
+@setup_tests(feed_services.feed_refreshes.clear)
+async def test_follow_new_feed_concurrently_fetches_once() -> None:
+    """check if concurrent follows of the same unknown feed make one request to the feed host"""
+    requests = []
+
+    async def handler(request: web.Request) -> web.Response:
+        requests.append(request.path)
+        await asyncio.sleep(0.1)
+        return web.Response(text=STUB_RSS, content_type="application/rss+xml")
+
+    stub_app = web.Application()
+    stub_app.router.add_get("/feed.rss", handler)
+    async with TestServer(stub_app) as server:
+        link = str(server.make_url("/feed.rss"))
+        session: async_scoped_session
+        async with get_session() as session:
+            session.add_all([User(username=f"test_username{index}") for index in range(10)])
+            await session.commit()
+
+        async def follow(username: str) -> Optional[Feed]:
+            async with get_session() as user_session:
+                return await feed_services.follow_new_feed(username, link, user_session)
+
+        feeds = await asyncio.gather(*[follow(f"test_username{index}") for index in range(10)])
+
+    assert requests == ["/feed.rss"]
+    assert all(feed is not None and feed.link == link for feed in feeds)
+    async with get_session() as session:
+        assert (await session.execute(text("select count(*) from user_feed"))).scalar() == 10
+        assert (await session.execute(text("select count(*) from postings"))).scalar() == 1
+
+
 @pytest.mark.asyncio
 @setup_tests()
 async def test_follow_new_feed_when_user_doesnt_exist() -> None:
@@ -285,148 +433,6 @@ async def test_unfollow_feed_which_doesnt_exists() -> None:
         assert not res
 
 
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_which_exists_read() -> None:
-    """check if we can make a posting which exists read"""
-    session: async_scoped_session
-    async with get_session() as session:
-        feed = Feed(
-            title="Test Feed",
-            description="Test Feed Description",
-            category="Test Feed Category",
-            lang="Dutch",
-            link="test_link1",
-            copyright_text="Copyright (c) 2010",
-        )
-        session.add(feed)
-        await session.commit()
-
-        posting = Posting(
-            title="Test Posting",
-            description="Test Posting Description",
-            link="posting_link1",
-            author="test author",
-            published_at=datetime.datetime.now(),
-            feed_id=1,
-        )
-        session.add(posting)
-
-        await session.commit()
-
-        user = User(username="test_username")
-        user.followed_feeds.append(feed)
-        session.add(user)
-        await session.commit()
-
-        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
-        assert res
-
-        read_posting_stmt = text("select * from read_postings")
-        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
-        assert read_posting is not None
-
-
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_which_doesnt_exists_read() -> None:
-    """check if we get prevented of reading a posting which does not exist"""
-    session: async_scoped_session
-    async with get_session() as session:
-        user = User(username="test_username")
-        session.add(user)
-        await session.commit()
-
-        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
-        assert not res
-
-        read_posting_stmt = text("select * from read_postings")
-        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
-        assert read_posting is None
-
-
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_read_for_invalid_user() -> None:
-    """check if we get prevented of reading a posting which does not exist"""
-    session: async_scoped_session
-    async with get_session() as session:
-        res = await feed_services.make_posting_read("test_username", "posting_link1", session)
-        assert not res
-
-        read_posting_stmt = text("select * from read_postings")
-        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
-        assert read_posting is None
-
-
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_which_exists_unread() -> None:
-    """check if we can make a posting which exists unread"""
-    session: async_scoped_session
-    async with get_session() as session:
-        feed = Feed(
-            title="Test Feed",
-            description="Test Feed Description",
-            category="Test Feed Category",
-            lang="Dutch",
-            link="test_link1",
-            copyright_text="Copyright (c) 2010",
-        )
-        session.add(feed)
-        await session.commit()
-
-        posting = Posting(
-            title="Test Posting",
-            description="Test Posting Description",
-            link="posting_link1",
-            author="test author",
-            published_at=datetime.datetime.now(),
-            feed_id=1,
-        )
-        session.add(posting)
-        await session.commit()
-
-        user = User(username="test_username")
-        user.followed_feeds.append(feed)
-        session.add(user)
-        await session.commit()
-
-        read_posting_stmt = text("insert into read_postings values (1,1)")
-        await session.execute(read_posting_stmt)
-
-        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
-        assert res
-
-        read_posting_stmt = text("select * from read_postings")
-        read_posting = (await session.execute(read_posting_stmt)).one_or_none()
-        assert read_posting is None
-
-
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_which_doesnt_exist_unread() -> None:
-    """check if we can make a posting which doesn't exist unread"""
-    session: async_scoped_session
-    async with get_session() as session:
-        user = User(username="test_username")
-        session.add(user)
-        await session.commit()
-
-        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
-        assert not res
-
-
-@pytest.mark.asyncio
-@setup_tests()
-async def test_make_posting_unread_when_user_not_found() -> None:
-    """check if we can make a posting unread when user not found"""
-    session: async_scoped_session
-    async with get_session() as session:
-        res = await feed_services.make_posting_unread("test_username", "posting_link1", session)
-        assert not res
-
-
 @pytest.mark.asyncio
 @setup_tests()
 async def test_get_feed_to_be_updated():
@@ -552,6 +558,88 @@ async def test_force_update(feed_fetch_mock: MagicMock) -> None:
         assert feeds[0].active
 
 
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.fetch_feed")
+@setup_tests()
+async def test_import_feeds(feed_fetch_mock: MagicMock) -> None:
+    """check if an import reuses the stored feeds, fetches the unknown ones and follows all of them in bulk"""
+    feed_fetch_mock.side_effect = lambda link, client: (
+        __create_feed_and_posting_schemas(link, [f"{link}_posting1", f"{link}_posting2"])
+        if link != "broken_feed"
+        else (None, None)
+    )
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+
+        job = await jobs_services.create_import_job("test_username", 4, session)
+        links = ["followed_feed", "other_feed", "new_feed", "broken_feed"]
+        await feed_services.import_feeds(job.job_id, links)
+
+        assert sorted(call.args[0] for call in feed_fetch_mock.call_args_list) == ["broken_feed", "new_feed"]
+        stored = await jobs_services.get_import_job(job.job_id, session)
+        assert stored is not None and stored.status == JobStatus.COMPLETED
+        assert (stored.reused, stored.fetched, stored.failed_links, stored.followed) == (2, 1, ["broken_feed"], 3)
+
+        user_feed_stmt = text("select f.link from user_feed uf join feeds f on f.pk = uf.feed_pk order by f.link")
+        assert (await session.execute(user_feed_stmt)).scalars().all() == ["followed_feed", "new_feed", "other_feed"]
+
+        postings_stmt = text("select p.link from postings p join feeds f on f.pk = p.feed_id where f.link = 'new_feed'")
+        assert sorted((await session.execute(postings_stmt)).scalars().all()) == [
+            "new_feed_posting1",
+            "new_feed_posting2",
+        ]
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_import_feeds_when_user_doesnt_exist() -> None:
+    """check if the import job fails for an invalid user"""
+    session: async_scoped_session
+    async with get_session() as session:
+        job = await jobs_services.create_import_job("invalid_username", 1, session)
+        await feed_services.import_feeds(job.job_id, ["new_feed"])
+
+        stored = await jobs_services.get_import_job(job.job_id, session)
+        assert stored is not None and stored.status == JobStatus.FAILED
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.fetch_feed")
+@setup_tests()
+async def test_import_feeds_when_job_doesnt_exist(feed_fetch_mock: MagicMock) -> None:
+    """check if an unknown import job is not run"""
+    await feed_services.import_feeds("a" * 32, ["new_feed"])
+
+    feed_fetch_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_get_following_postings_version() -> None:
+    """check if the version token changes with the read state, the follows and the refreshes of the followed feeds"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await create_followed_and_unfollowed_postings(session)
+        assert await feed_services.get_following_postings_version("invalid_username", session) is None
+
+        versions = [await feed_services.get_following_postings_version("test_username", session)]
+        await feed_services.make_posting_read("test_username", "posting_link1", session)
+        versions.append(await feed_services.get_following_postings_version("test_username", session))
+        await feed_services.make_posting_read("test_username", "posting_link3", session)
+        versions.append(await feed_services.get_following_postings_version("test_username", session))
+        assert versions[-1] == versions[-2], "reading a posting of a feed which is not followed changes nothing"
+
+        await feed_services.unfollow_feed("test_username", "followed_feed", session)
+        versions.append(await feed_services.get_following_postings_version("test_username", session))
+        await session.execute(text("update feeds set refreshed_at = :now"), {"now": datetime.datetime.utcnow()})
+        await session.commit()
+        versions.append(await feed_services.get_following_postings_version("test_username", session))
+        assert versions[-1] == versions[-2], "refreshing a feed which is not followed changes nothing"
+
+        assert len(set(versions)) == 3
+
+
 #
 # @pytest.mark.asyncio
 # @setup_tests()
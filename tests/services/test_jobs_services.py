@@ -0,0 +1,95 @@
+"""test jobs services"""
+import datetime
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_scoped_session
+
+from sendcloud.utils import get_session
+from sendcloud.utils import setup_tests
+from sendcloud.models import User
+from sendcloud.schemas import FeedJobKind, JobStatus
+from sendcloud.services import jobs_services
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_import_jobs_are_stored() -> None:
+    """check if the import jobs and their progress can be retrieved from any session"""
+    session: async_scoped_session
+    async with get_session() as session:
+        job = await jobs_services.create_import_job("test_username", 3, session)
+        assert (job.status, job.total) == (JobStatus.PENDING, 3)
+
+        job.status, job.fetched, job.failed_links = JobStatus.RUNNING, 1, ["link2"]
+        await jobs_services.save_import_job(job, session)
+        await session.commit()
+
+    async with get_session() as session:
+        stored = await jobs_services.get_import_job(job.job_id, session)
+        assert stored is not None and stored.dict() == job.dict()
+        assert await jobs_services.get_import_job("unknown", session) is None
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_enqueue_and_claim_feed_jobs() -> None:
+    """check if the stored jobs are claimed once in the order they have been enqueued"""
+    session: async_scoped_session
+    async with get_session() as session:
+        session.add(User(username="test_username"))
+        await session.commit()
+
+        follow_job = await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, "test_username", "link1", session)
+        update_job = await jobs_services.enqueue_feed_job(FeedJobKind.FORCE_UPDATE, "test_username", "link2", session)
+        assert follow_job is not None and update_job is not None
+        assert follow_job.status == JobStatus.PENDING.value and len(follow_job.job_id) == 32
+
+        claimed = await jobs_services.claim_feed_jobs(1, session)
+        assert [(job.job_id, job.status, job.attempts) for job in claimed] == [(follow_job.job_id, "running", 1)]
+        claimed = await jobs_services.claim_feed_jobs(10, session)
+        assert [job.job_id for job in claimed] == [update_job.job_id]
+        assert not await jobs_services.claim_feed_jobs(10, session)
+
+        await jobs_services.finish_feed_job(int(follow_job.pk), None, session)
+        await jobs_services.finish_feed_job(int(update_job.pk), "not found", session)
+        stored = await jobs_services.get_feed_job(str(follow_job.job_id), session)
+        assert stored is not None and stored.status == JobStatus.COMPLETED.value
+        stored = await jobs_services.get_feed_job(str(update_job.job_id), session)
+        assert stored is not None and (stored.status, stored.error) == (JobStatus.FAILED.value, "not found")
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_claim_timed_out_feed_jobs() -> None:
+    """check if the lost running jobs are claimed again until they have no attempts left"""
+    session: async_scoped_session
+    async with get_session() as session:
+        session.add(User(username="test_username"))
+        await session.commit()
+        first_job = await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, "test_username", "link1", session)
+        last_job = await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, "test_username", "link2", session)
+        assert first_job is not None and last_job is not None
+        await jobs_services.claim_feed_jobs(10, session)
+
+        lost_at = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        await session.execute(
+            text("update feed_jobs set updated_at = :lost_at, attempts = case when pk = 1 then 1 else 3 end"),
+            {"lost_at": lost_at},
+        )
+        await session.commit()
+
+        claimed = await jobs_services.claim_feed_jobs(10, session)
+        assert [(job.job_id, job.attempts) for job in claimed] == [(first_job.job_id, 2)]
+        stored = await jobs_services.get_feed_job(str(last_job.job_id), session)
+        await session.refresh(stored)
+        assert stored is not None and (stored.status, stored.error) == (JobStatus.FAILED.value, "timed out")
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_enqueue_feed_job_when_user_doesnt_exist() -> None:
+    """check if no job is stored for an invalid user"""
+    session: async_scoped_session
+    async with get_session() as session:
+        assert await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, "invalid_username", "link1", session) is None
+        assert (await session.execute(text("select count(*) from feed_jobs"))).scalar() == 0
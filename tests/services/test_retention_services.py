@@ -0,0 +1,173 @@
+"""test retention services"""
+import datetime
+from typing import List
+from unittest.mock import patch
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_scoped_session
+
+from sendcloud.utils import get_session, setup_tests, settings, metrics
+from sendcloud.models import User, Feed, Posting, read_postings
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.services import retention_services, feeds_services
+
+
+async def __create_feeds_with_postings(session: async_scoped_session) -> None:
+    """
+    create two feeds with three postings each, the first posting of every feed is read by a user
+    :param session: database session
+    :return: None
+    """
+    session.add_all(
+        [
+            Feed(
+                title="Test Feed",
+                description="Test Feed Description",
+                category="Test Feed Category",
+                lang="Dutch",
+                link=link,
+                copyright_text="Copyright (c) 2010",
+                retention_max_postings=max_postings,
+            )
+            for link, max_postings in [("feed_link1", None), ("feed_link2", 1)]
+        ]
+    )
+    session.add(User(username="test_username"))
+    await session.commit()
+
+    session.add_all(
+        [
+            Posting(
+                title="Test Posting",
+                description="Test Posting Description",
+                link=f"posting_link{feed_id}_{month}",
+                author="test author",
+                published_at=datetime.datetime(2023, month, 1),
+                feed_id=feed_id,
+            )
+            for feed_id in (1, 2)
+            for month in (1, 2, 3)
+        ]
+    )
+    await session.commit()
+    await session.execute(
+        read_postings.insert().values([{"posting_pk": 1, "user_pk": 1}, {"posting_pk": 4, "user_pk": 1}])
+    )
+    await session.commit()
+
+
+async def __remaining_links(session: async_scoped_session) -> List[str]:
+    """
+    the links of the stored postings
+    :param session: database session
+    :return: sorted links
+    """
+    return sorted((await session.scalars(text("select link from postings"))).all())
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_apply_retention_with_feed_policy() -> None:
+    """check if only the feeds with a policy are pruned when there is no global policy"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await __create_feeds_with_postings(session)
+        with patch.object(settings, "retention_max_age", None), patch.object(settings, "retention_max_postings", None):
+            stats = await retention_services.apply_retention(session)
+
+        assert (stats.feeds, stats.pruned, stats.read_marks, stats.archived) == (1, 2, 1, 0)
+        assert await __remaining_links(session) == [
+            "posting_link1_1",
+            "posting_link1_2",
+            "posting_link1_3",
+            "posting_link2_3",
+        ]
+        assert (await session.scalars(text("select posting_pk from read_postings"))).all() == [1]
+        pruned_at = (await session.execute(text("select pk from feeds where pruned_at is not null"))).scalars().all()
+        assert pruned_at == [2]
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_apply_retention_with_global_policy_in_batches() -> None:
+    """check if the global policy prunes every feed batch by batch and archives the postings"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await __create_feeds_with_postings(session)
+        pruned_before = metrics.get("retention_postings_pruned_total")
+        with patch.object(settings, "retention_max_age", datetime.datetime.utcnow() - datetime.datetime(2023, 2, 15)):
+            with patch.object(settings, "retention_archive", True), patch.object(settings, "retention_batch_size", 1):
+                with patch.object(settings, "retention_batch_pause", 0):
+                    stats = await retention_services.apply_retention(session)
+
+        # feed_link1 keeps the postings younger than the max age, feed_link2 keeps only its latest posting
+        assert (stats.feeds, stats.pruned, stats.archived, stats.read_marks, stats.batches) == (2, 4, 4, 2, 4)
+        assert await __remaining_links(session) == ["posting_link1_3", "posting_link2_3"]
+        archived = (await session.execute(text("select posting_pk, link from postings_archive order by pk"))).all()
+        assert archived == [
+            (1, "posting_link1_1"),
+            (2, "posting_link1_2"),
+            (4, "posting_link2_1"),
+            (5, "posting_link2_2"),
+        ]
+        assert (await session.scalars(text("select count(*) from read_postings"))).one() == 0
+        assert metrics.get("retention_postings_pruned_total") == pruned_before + 4
+        assert metrics.get("retention_last_run_seconds") == stats.seconds
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_refresh_skips_the_postings_the_retention_prunes() -> None:
+    """check if a refresh does not store again the postings which the policy of the feed would prune"""
+    session: async_scoped_session
+    async with get_session() as session:
+        await __create_feeds_with_postings(session)
+        with patch.object(settings, "retention_max_age", None), patch.object(settings, "retention_max_postings", None):
+            await retention_services.apply_retention(session)
+            feed = FeedItemCreate(
+                link="feed_link2",
+                title="Test Feed",
+                lang="Dutch",
+                copyright_text="Copyright (c) 2010",
+                description="Test Feed Description",
+                category="Test Feed Category",
+            )
+            postings = [
+                PostingItemCreate(
+                    link=f"posting_link2_{month}",
+                    title="Test Posting",
+                    description="Test Posting Description",
+                    published_at=datetime.datetime(2023, month, 1),
+                    author="test author",
+                )
+                for month in (1, 2, 3)
+            ]
+            await feeds_services.insert_or_update_feed(feed, postings, session)
+
+        assert await __remaining_links(session) == [
+            "posting_link1_1",
+            "posting_link1_2",
+            "posting_link1_3",
+            "posting_link2_3",
+        ]
+
+
+def test_retained_postings() -> None:
+    """check if the postings older than the max age or not among the latest ones are left out in their order"""
+    postings = [
+        PostingItemCreate(
+            link=f"posting_link{month}",
+            title="Test Posting",
+            description="Test Posting Description",
+            published_at=datetime.datetime(2023, month, 1),
+            author="test author",
+        )
+        for month in (3, 1, 4, 2)
+    ]
+    now = datetime.datetime(2023, 5, 1)
+
+    assert retention_services.retained_postings(postings, None, None, now) == postings
+    kept = retention_services.retained_postings(postings, now - datetime.datetime(2023, 1, 15), 2, now)
+    assert [posting.link for posting in kept] == ["posting_link3", "posting_link4"]
+    kept = retention_services.retained_postings(postings, now - datetime.datetime(2023, 1, 15), None, now)
+    assert [posting.link for posting in kept] == ["posting_link3", "posting_link4", "posting_link2"]
@@ -8,7 +8,9 @@ from fastapi.exceptions import HTTPException
 from sendcloud.utils import get_session
 from sendcloud.utils import setup_tests
 from sendcloud.models import User, Feed
+from sendcloud.schemas import FeedItemCreate
 from sendcloud.services import users_services as user_services
+from sendcloud.services import feeds_services
 
 
 async def __add_user_wit_feed(username: str, feed_link: str, session: async_scoped_session) -> None:
@@ -101,3 +103,34 @@ async def test_create_duplicate_user() -> None:
             user_stmt = text("select count(1) from users")
             user_counts = (await session.execute(user_stmt)).scalar()
             assert user_counts == 1
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_get_users_version() -> None:
+    """check if the version of the user list changes with a new user, a follow, a new feed title and an unfollow"""
+    session: async_scoped_session
+    async with get_session() as session:
+        versions = [await user_services.get_users_version(session)]
+        await user_services.create_user("test_user1", session)
+        versions.append(await user_services.get_users_version(session))
+        feed = FeedItemCreate(
+            link="http://testfeed.com/feeds/1",
+            title="Test title",
+            lang="Dutch",
+            copyright_text="Copyright (c) 2010",
+            description="Test Feed Description",
+            category="Test Feed Category",
+        )
+        await feeds_services.insert_or_update_feed(feed, [], session)
+        versions.append(await user_services.get_users_version(session))
+        await feeds_services.insert_or_update_feed(feed, [], session)
+        versions.append(await user_services.get_users_version(session))
+        await feeds_services.follow_new_feed("test_user1", feed.link, session)
+        versions.append(await user_services.get_users_version(session))
+        await feeds_services.insert_or_update_feed(feed.copy(update={"title": "New title"}), [], session)
+        versions.append(await user_services.get_users_version(session))
+        await feeds_services.unfollow_feed("test_user1", feed.link, session)
+        versions.append(await user_services.get_users_version(session))
+
+        assert versions == [0, 1, 1, 1, 2, 3, 4]
@@ -1,11 +1,18 @@
 """test_db_manager"""
 import os
+from typing import Any
+from unittest.mock import patch
 import pytest
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, select, literal_column, table, Select
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from sendcloud.models import User
+from sendcloud.services import users_services, feeds_services
+from sendcloud.utils import Base, settings, setup_tests
 from sendcloud.utils.db_manager import (
     get_db_engine,
+    get_replica_engine,
     get_session,
     update_async_database_tables,
     EDatabaseManipulationType,
@@ -21,6 +28,7 @@ async def test_get_engine() -> None:
     async with engine.connect() as connection:
         assert not connection.closed, "connection should be opened"
     assert connection.closed, "connection should be closed"
+    await engine.dispose()
     os.remove(".sql_app.db")
 
 
@@ -32,6 +40,7 @@ async def test_get_session() -> None:
     async with get_session(engine) as session:
         res = (await session.execute(text("select 1"))).scalar()
         assert res == 1, "result should be 1"
+    await engine.dispose()
     os.remove(".sql_app.db")
 
 
@@ -43,3 +52,76 @@ async def test_update_async_database_tables() -> None:
     async with get_session() as session:
         res = (await session.execute(text("select count(1) from users"))).scalar()
         assert res == 0, "result should be 0"
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_read_only_functions_use_the_replica() -> None:
+    """check if the read-only functions read from the replica until the user writes to the primary"""
+    replica = get_db_engine("sqlite+aiosqlite:///.replica.db")
+    async with replica.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(text("insert into users (pk, username, version) values (1, 'replica_reader', 5)"))
+        await connection.execute(text("insert into users (pk, username, version) values (2, 'replica_user', 0)"))
+
+    session: async_scoped_session
+    with patch.object(settings, "database_replica_urls", ["sqlite+aiosqlite:///.replica.db"]):
+        async with get_session() as session:
+            session.add(User(username="replica_reader"))
+            await session.commit()
+
+            assert [user.username for user in await users_services.get_users(session)] == [
+                "replica_reader",
+                "replica_user",
+            ]
+            version = await feeds_services.get_following_postings_version("replica_reader", session)
+            assert version is not None and version[1] == 5
+            assert (await session.execute(text("select count(*) from users"))).scalar() == 1, "the rest uses primary"
+
+            await users_services.bump_user_version("replica_reader", session)
+            await session.commit()
+            version = await feeds_services.get_following_postings_version("replica_reader", session)
+            assert version is not None and version[1] == 1
+            assert len(await users_services.get_users(session)) == 2, "other reads still go to the replica"
+
+    await replica.dispose()
+    os.remove(".replica.db")
+
+
+@pytest.mark.asyncio
+async def test_replica_engines_are_shared() -> None:
+    """check if the sessions of a loop share the engine, and so the pool, of every replica"""
+    replica_url = "sqlite+aiosqlite:///:memory:"
+    engine = get_replica_engine(replica_url)
+
+    assert get_replica_engine(replica_url) is engine
+    assert get_replica_engine("sqlite+aiosqlite://") is not engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_embedded_mode_reads_from_the_readers_until_the_transaction_writes() -> None:
+    """check if the embedded mode serializes the writes on one connection and reads from the readers otherwise"""
+    query_only: Select[Any] = select(literal_column("query_only")).select_from(table("pragma_query_only"))
+    writer = get_db_engine()
+    assert isinstance(writer.pool, AsyncAdaptedQueuePool) and writer.pool.size() == 1, "there is a single writer"
+    async with writer.connect() as connection:
+        assert (await connection.execute(text("pragma journal_mode"))).scalar() == "wal"
+
+    session: AsyncSession
+    async with get_session() as session:
+        assert (await session.execute(query_only)).scalar() == 1, "a read goes to the readers"
+
+        session.add(User(username="embedded_writer"))
+        await session.flush()
+        assert (await session.execute(query_only)).scalar() == 0, "the transaction reads its own writes"
+        assert len(await users_services.get_users(session)) == 1
+
+        await session.commit()
+        assert (await session.execute(query_only)).scalar() == 1, "the next transaction reads from the readers"
+        assert len(await users_services.get_users(session)) == 1
+
+        await session.commit()
+        assert (await session.execute(query_only.with_for_update())).scalar() == 0, "a locking read goes to the writer"
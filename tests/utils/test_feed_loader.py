@@ -0,0 +1,134 @@
+"""test feed loader"""
+import asyncio
+from datetime import timedelta
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Union
+from unittest.mock import patch
+import pytest
+from aiohttp import web
+
+from benchmarks.feed_stub import StubConfig, render_rss
+from sendcloud.utils import fetch_feed, settings
+
+
+@pytest.mark.asyncio
+async def test_fetch_feed_timeout() -> None:
+    """check if a host which does not answer in time fails the fetch"""
+
+    async def hang(_: web.Request) -> web.Response:
+        await asyncio.sleep(1)
+        return web.Response(text="<rss/>")
+
+    app = web.Application()
+    app.router.add_get("/feed", hang)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        with patch.object(settings, "feed_fetch_timeout", 0.1):
+            assert await fetch_feed(f"http://127.0.0.1:{runner.addresses[0][1]}/feed") == (None, None)
+    finally:
+        await runner.cleanup()
+
+
+# a large RSS feed and an RSS feed the fast path gives up on
+DOCUMENTS: Dict[str, Union[str, bytes]] = {
+    "large": render_rss(1, 0, StubConfig(entries=2000), "http://example.com"),
+    "podcast": render_rss(2, 0, StubConfig(entries=20), "http://example.com").replace(
+        "<channel>",
+        '<channel><itunes:author xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">a</itunes:author>',
+    ),
+    # served without a charset, the document declares its encoding itself
+    "latin-1": (
+        '<?xml version="1.0" encoding="ISO-8859-1"?><rss version="2.0"><channel><title>Caf\xe9</title>'
+        "<item><title>cr\xe8me br\xfbl\xe9e</title><link>http://example.com/1</link>"
+        "<pubDate>Mon, 02 Jan 2023 10:00:00 GMT</pubDate></item></channel></rss>"
+    ).encode("latin-1"),
+}
+
+
+@asynccontextmanager
+async def __serve_feeds(requests: Counter) -> AsyncIterator[str]:
+    """serves the documents, counting the requests"""
+
+    async def feed(request: web.Request) -> web.Response:
+        requests[request.match_info["name"]] += 1
+        if isinstance(document := DOCUMENTS[request.match_info["name"]], bytes):
+            return web.Response(body=document, content_type="application/rss+xml")
+        return web.Response(text=document, content_type="application/rss+xml")
+
+    app = web.Application()
+    app.router.add_get("/{name}", feed)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{runner.addresses[0][1]}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_streamed_feed_is_read_as_a_whole_one() -> None:
+    """check if a streamed feed gives the postings of the whole document, and of feedparser after a refetch"""
+    requests: Counter = Counter()
+    async with __serve_feeds(requests) as url:
+        for name in ["large", "podcast"]:
+            streamed = await fetch_feed(f"{url}/{name}")
+            with patch.object(settings, "feed_streaming", False), patch.object(settings, "fast_feed_parser", False):
+                assert await fetch_feed(f"{url}/{name}") == streamed
+        assert requests == {"large": 2, "podcast": 3}
+        # the fast path is not tried again on the feed it has given up on
+        assert await fetch_feed(f"{url}/podcast") == streamed
+    assert streamed[1] is not None and len(streamed[1]) == 20
+    assert requests == {"large": 2, "podcast": 4}
+
+
+@pytest.mark.asyncio
+async def test_streamed_feed_stops_at_limits() -> None:
+    """check if a streamed feed stops at the maximum entries and fails beyond the maximum bytes like a buffered one"""
+    async with __serve_feeds(Counter()) as url:
+        _, postings = await fetch_feed(f"{url}/large")
+        assert postings is not None and len(postings) == 2000
+
+        with patch.object(settings, "feed_max_entries", 10):
+            feed, postings = await fetch_feed(f"{url}/large")
+        assert feed is not None and feed.title == "feed 1"
+        assert postings is not None and [posting.title for posting in postings] == [
+            f"entry {number} of feed 1" for number in range(1999, 1989, -1)
+        ]
+
+        with patch.object(settings, "feed_max_bytes", 100000), patch.object(settings, "feed_parse_chunk_size", 4096):
+            assert await fetch_feed(f"{url}/large") == (None, None)
+            with patch.object(settings, "feed_streaming", False):
+                assert await fetch_feed(f"{url}/large") == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_feed_declaring_its_encoding() -> None:
+    """check if a feed served without a charset is read with the encoding its XML declaration gives"""
+    async with __serve_feeds(Counter()) as url:
+        for streaming in [True, False]:
+            with patch.object(settings, "feed_streaming", streaming):
+                feed, postings = await fetch_feed(f"{url}/latin-1")
+            assert feed is not None and feed.title == "Caf\xe9"
+            assert postings is not None and [posting.title for posting in postings] == ["cr\xe8me br\xfbl\xe9e"]
+
+
+@pytest.mark.asyncio
+async def test_feedparser_fallbacks_are_bounded() -> None:
+    """check if the feeds which have fallen back are forgotten after a while and beyond the maximum number"""
+    requests: Counter = Counter()
+    async with __serve_feeds(requests) as url:
+        with patch.object(settings, "feedparser_fallback_max_links", 1):
+            await fetch_feed(f"{url}/podcast")
+            await fetch_feed(f"{url}/latin-1")
+            # the podcast has been forgotten for the latin-1 feed, so it is streamed and fetched again
+            await fetch_feed(f"{url}/podcast")
+        assert requests["podcast"] == 4
+        with patch.object(settings, "feedparser_fallback_ttl", timedelta(0)):
+            await fetch_feed(f"{url}/podcast")
+        assert requests["podcast"] == 6
@@ -0,0 +1,112 @@
+"""test feed parser"""
+from unittest.mock import patch
+import feedparser
+import pytest
+
+from benchmarks.feed_stub import StubConfig, render_atom, render_rss
+from sendcloud.utils import UnsupportedFeed, parse_fast, parse_feed_document, settings
+
+RSS = (
+    '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"'
+    ' xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>Feed &amp; co</title>'
+    "<link>https://example.com</link><description>about</description><language>en-us</language>"
+    "<copyright>2023</copyright><category></category><category>news</category>{items}</channel></rss>"
+)
+ITEM = "<item><title>{title}</title><link> https://example.com/1 </link>{extra}<pubDate>{date}</pubDate></item>"
+ATOM = (
+    '<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom" xml:lang="nl">'
+    '<title type="html">Feed &amp;amp; co</title><rights>2023</rights><category term="news"/>{entries}</feed>'
+)
+ENTRY = (
+    '<entry><title>{title}</title><link rel="self" href="https://example.com/self"/>'
+    '<link href="https://example.com/1"/><published>{date}</published>{extra}</entry>'
+)
+RSS_DATE, ATOM_DATE = "Mon, 02 Jan 2023 10:00:00 +0200", "2023-01-02T10:00:00.5-05:30"
+
+# documents which the fast path has to read exactly as feedparser does
+FAST_CORPUS = {
+    "stub rss": render_rss(1, 2, StubConfig(entries=10), "https://example.com"),
+    "stub atom": render_atom(1, 2, StubConfig(entries=10), "https://example.com"),
+    "rss": RSS.format(
+        items=ITEM.format(title="a &lt;b&gt;bold&lt;/b&gt; title", date=RSS_DATE, extra="<author>a@b.c (A)</author>")
+        + ITEM.format(
+            title="<![CDATA[Tom & Jerry]]>",
+            date="02 Jan 2023 10:00:00 GMT",
+            extra="<description>&lt;p&gt;1 &amp;lt; 2&lt;br /&gt;&lt;/p&gt;</description>"
+            "<content:encoded>&lt;p&gt;full&lt;/p&gt;</content:encoded><dc:creator>Jane</dc:creator>"
+            '<guid isPermaLink="false">1</guid><category>c</category>',
+        )
+    ),
+    "atom": ATOM.format(
+        entries=ENTRY.format(
+            title="1 &amp;lt; 2", date=ATOM_DATE, extra="<author><name>A</name><email>a@b.c</email></author>"
+        )
+        + ENTRY.format(
+            title="", date="2023-01-02T10:00:00Z", extra='<summary type="html">&lt;em&gt;e&lt;/em&gt;</summary>'
+        )
+    ),
+    "empty": RSS.format(items=""),
+}
+# documents which the fast path leaves to feedparser
+FALLBACK_CORPUS = {
+    "latin-1": RSS.format(items="").replace("UTF-8", "ISO-8859-1"),
+    "rss 0.91": RSS.format(items="").replace('version="2.0"', 'version="0.91"'),
+    "unknown element": RSS.format(items=ITEM.format(title="t", date=RSS_DATE, extra="<media:x xmlns:media='m'/>")),
+    "rewritten markup": RSS.format(items=ITEM.format(title="&lt;P&gt;t", date=RSS_DATE, extra="")),
+    "attributes": RSS.format(items=ITEM.format(title="&lt;a href='/x'&gt;t&lt;/a&gt;", date=RSS_DATE, extra="")),
+    "date format": RSS.format(items=ITEM.format(title="t", date="2023-01-02 10:00", extra="")),
+    "invalid date": RSS.format(items=ITEM.format(title="t", date="Thu, 30 Feb 2023 10:00:00 GMT", extra="")),
+    "guid as link": RSS.format(items=ITEM.format(title="t", date=RSS_DATE, extra="").replace("link>", "guid>")),
+    "content only": ATOM.format(entries=ENTRY.format(title="t", date=ATOM_DATE, extra="<content>c</content>")),
+    "xhtml": ATOM.format(entries=ENTRY.format(title="t", date=ATOM_DATE, extra='<summary type="xhtml"/>')),
+    "relative link": ATOM.format(entries=ENTRY.format(title="t", date=ATOM_DATE, extra="")).replace(
+        "https://example.com/1", "/1"
+    ),
+    "undefined entity": RSS.format(items=ITEM.format(title="&nbsp;", date=RSS_DATE, extra="")),
+    "truncated": RSS.format(items=ITEM.format(title="t", date=RSS_DATE, extra=""))[:-30],
+}
+
+
+def __fields(parsed: dict) -> tuple:
+    """the fields the loader keeps, with its defaults"""
+    feed = parsed["feed"]
+    return (
+        [feed.get(key, "-") for key in ["title", "language", "copyright", "summary", "category"]],
+        [
+            [entry.get(key, "-") for key in ["link", "title", "summary", "published_parsed", "author"]]
+            for entry in parsed["entries"]
+        ],
+    )
+
+
+@pytest.mark.parametrize("name", list(FAST_CORPUS))
+def test_fast_path_parity(name: str) -> None:
+    """check if the fast path reads a well-formed document exactly as feedparser"""
+    document = FAST_CORPUS[name]
+    expected = feedparser.parse(document)
+    assert not expected.bozo
+    assert __fields(parse_fast(document.encode())) == __fields(expected)
+
+
+@pytest.mark.parametrize("name", list(FALLBACK_CORPUS))
+def test_fallback_parity(name: str) -> None:
+    """check if the fast path gives up on an unusual document, which is then parsed by feedparser"""
+    encoding = "latin-1" if name == "latin-1" else "utf-8"
+    document = FALLBACK_CORPUS[name].encode(encoding)
+    with pytest.raises(UnsupportedFeed):
+        parse_fast(document)
+    expected = feedparser.parse(document.decode(encoding))
+    parsed = parse_feed_document(document, encoding)
+    assert parsed.get("bozo") == expected.get("bozo")
+    assert expected.bozo or __fields(parsed) == __fields(expected)
+
+
+def test_chunks_and_setting() -> None:
+    """check if a document fed in small chunks is read the same and the fast path can be turned off"""
+    document = FAST_CORPUS["rss"].encode()
+    with patch.object(settings, "feed_parse_chunk_size", 7):
+        assert __fields(parse_fast(document)) == __fields(feedparser.parse(document))
+    with patch("sendcloud.utils.feed_parser.parse_fast") as fast:
+        with patch.object(settings, "fast_feed_parser", False):
+            assert __fields(parse_feed_document(document, "utf-8")) == __fields(feedparser.parse(document))
+        fast.assert_not_called()
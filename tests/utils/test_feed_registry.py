@@ -0,0 +1,88 @@
+"""test feed registry"""
+import asyncio
+import math
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import update
+
+from sendcloud.models import Feed
+from sendcloud.utils import FeedRegistry, get_session, setup_tests
+from sendcloud.utils.scheduler import Scheduler
+
+
+def test_registry_keeps_feeds_sorted_by_pk() -> None:
+    """check if the feeds are found whatever the order they are registered in"""
+    registry = FeedRegistry()
+    for feed_pk in [5, 1, 9, 3]:
+        registry.upsert(feed_pk, f"https://host{feed_pk % 2}.example.com/{feed_pk}.rss", float(feed_pk))
+    registry.upsert(3, "https://other.example.com/3.rss", 30.0)
+
+    assert len(registry) == 4 and registry.last_pk == 9
+    assert registry.get(3) == (3, "other.example.com", 30.0, 0)
+    assert registry.get(9) == (9, "host1.example.com", 9.0, 0)
+    assert registry.get(4) is None
+
+
+def test_take_due_and_outcomes() -> None:
+    """check if the due feeds are taken once and a failed feed is parked"""
+    registry = FeedRegistry()
+    for feed_pk in range(1, 5):
+        registry.upsert(feed_pk, "https://example.com/feed", float(feed_pk * 10))
+
+    assert registry.take_due(25.0, 100.0) == [1, 2]
+    assert registry.take_due(25.0, 100.0) == []
+    registry.record_failure(3)
+    registry.record_failure(3)
+    assert registry.get(3) == (3, "example.com", math.inf, 2)
+    registry.record_success(3)
+    assert registry.get(3) == (3, "example.com", math.inf, 0)
+    assert registry.take_due(1000.0, 2000.0) == [1, 2, 4]
+
+    registry.clear()
+    assert len(registry) == 0 and registry.last_pk == 0
+
+
+def __feed(link: str) -> Feed:
+    """creates a sample feed"""
+    return Feed(title="t", description="d", category="c", lang="en", link=link, copyright_text="-")
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.utils.scheduler.Task.start", return_value=MagicMock())
+@setup_tests()
+async def test_scheduler_syncs_registry_incrementally(_: MagicMock) -> None:
+    """check if the new and the refreshed feeds are synced into the registry between the cycles"""
+    async with get_session() as session:
+        session.add_all([__feed("https://a.example.com/1"), __feed("https://b.example.com/2")])
+        await session.commit()
+
+    registry = FeedRegistry()
+    cycles = []
+
+    async def next_cycle(_: float) -> None:
+        cycles.append([registry.get(feed_pk) for feed_pk in range(1, 4)])
+        if len(cycles) == 2:
+            raise asyncio.CancelledError
+        async with get_session() as session:
+            session.add(__feed("https://a.example.com/3"))
+            await session.execute(update(Feed).where(Feed.pk == 1).values(refreshed_at=datetime(2100, 1, 1)))
+            await session.commit()
+
+    loop = MagicMock()
+    # the coroutines of the mocked tasks are never run
+    loop.create_task.side_effect = lambda coroutine: coroutine.close()
+    with patch("sendcloud.utils.scheduler.sleep", side_effect=next_cycle):
+        with pytest.raises(asyncio.CancelledError):
+            await Scheduler(300, loop, registry).run()
+
+    assert loop.create_task.call_count == 3
+    assert len(cycles) == 2
+    first_a, first_b, first_c = cycles[0]
+    second_a, second_b, second_c = cycles[1]
+    assert first_a is not None and first_b is not None and first_c is None
+    assert (first_a[1], first_b[1]) == ("a.example.com", "b.example.com")
+    assert second_a is not None and second_b is not None and second_c is not None
+    assert second_a[2] == datetime(2100, 1, 1, 0, 5, tzinfo=timezone.utc).timestamp()
+    assert second_b[2] == first_b[2]
+    assert second_c[1] == "a.example.com"
@@ -0,0 +1,23 @@
+"""test link hash"""
+from unittest.mock import patch
+import pytest
+
+from sendcloud.utils import link_hash, link_hashes, probe_link_hashes, LINK_HASH_PROBES
+
+
+def test_link_hash_is_a_signed_64_bit_integer():
+    """check if the hash is stable, fits into a BIGINT and changes with the probe"""
+    value = link_hash("https://feeds.example.com/1.rss")
+
+    assert value == link_hash("https://feeds.example.com/1.rss")
+    assert -(2**63) <= value < 2**63
+    assert len(set(link_hashes("https://feeds.example.com/1.rss"))) == LINK_HASH_PROBES
+    assert link_hashes("https://feeds.example.com/1.rss")[0] == value
+
+
+def test_probe_link_hashes_on_collision() -> None:
+    """check if a link whose hash is taken gets the hash of its next probe"""
+    with patch("sendcloud.utils.link_hash.link_hash", side_effect=lambda link, probe=0: probe):
+        assert probe_link_hashes(["link1", "link2", "link3"]) == [0, 1, 2]
+        with pytest.raises(ValueError):
+            probe_link_hashes(["link1", "link2", "link3", "link4"])
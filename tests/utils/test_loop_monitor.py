@@ -0,0 +1,33 @@
+"""test loop monitor"""
+import asyncio
+import logging
+import time
+import pytest
+
+from sendcloud.utils import LoopMonitor, metrics
+
+
+def blocking_call() -> None:
+    """blocks the event loop"""
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_blocking_call(caplog: pytest.LogCaptureFixture) -> None:
+    """check if the lag is measured and the stack of a blocking call is logged"""
+    metrics.clear()
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    with caplog.at_level(logging.WARNING, "sendcloud.utils.loop_monitor"):
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert metrics.get("event_loop_lag_seconds_count") >= 3
+    assert metrics.get('event_loop_lag_seconds_bucket{le="0.1"}') < metrics.get("event_loop_lag_seconds_count")
+    assert metrics.get("event_loop_lag_seconds_sum") >= 0.25
+    assert monitor.blocking_stack is not None and "in blocking_call" in monitor.blocking_stack
+    assert any("Event loop blocked" in record.getMessage() for record in caplog.records)
+    metrics.clear()
@@ -0,0 +1,47 @@
+"""test metrics"""
+from sendcloud.utils import Metrics
+
+
+def test_counters_and_gauges() -> None:
+    """check if the counters are added up and the gauges keep the latest value"""
+    registry = Metrics()
+    registry.increment("pruned_total", 3)
+    registry.increment("pruned_total")
+    registry.set("last_run_seconds", 2.5)
+    registry.set("last_run_seconds", 1.5)
+
+    assert registry.get("pruned_total") == 4
+    assert registry.get("unknown") == 0
+    assert registry.snapshot() == {"pruned_total": 4, "last_run_seconds": 1.5}
+    registry.clear()
+    assert not registry.snapshot()
+
+
+def test_histogram() -> None:
+    """check if the buckets of a histogram count the values up to their bounds"""
+    registry = Metrics()
+    for value in [0.005, 0.05, 2]:
+        registry.observe("lag_seconds", value, [0.01, 0.1])
+
+    assert registry.snapshot() == {
+        'lag_seconds_bucket{le="0.01"}': 1,
+        'lag_seconds_bucket{le="0.1"}': 2,
+        'lag_seconds_bucket{le="+Inf"}': 3,
+        "lag_seconds_sum": 2.055,
+        "lag_seconds_count": 3,
+    }
+
+
+def test_exposition() -> None:
+    """check if the values are rendered one per line in the text format of prometheus"""
+    registry = Metrics()
+    registry.increment("pruned_total", 3)
+    registry.observe("lag_seconds", 0.05, [0.1])
+
+    assert registry.exposition() == (
+        'lag_seconds_bucket{le="+Inf"} 1.0\n'
+        'lag_seconds_bucket{le="0.1"} 1.0\n'
+        "lag_seconds_count 1.0\n"
+        "lag_seconds_sum 0.05\n"
+        "pruned_total 3.0\n"
+    )
@@ -0,0 +1,29 @@
+"""tests for opml module"""
+import pytest
+
+from sendcloud.utils import parse_opml
+
+
+def test_parse_opml() -> None:
+    """checks if the feed links of nested outlines are collected once in the order of the document"""
+    content = b"""<?xml version="1.0" encoding="UTF-8"?>
+    <opml version="2.0">
+        <head><title>subscriptions</title></head>
+        <body>
+            <outline text="news">
+                <outline type="rss" text="nu" xmlUrl="https://www.nu.nl/rss/Algemeen" />
+                <outline type="rss" text="tweakers" xmlUrl="https://feeds.feedburner.com/tweakers/mixed" />
+            </outline>
+            <outline type="rss" text="nu again" xmlUrl="https://www.nu.nl/rss/Algemeen" />
+            <outline text="without link" />
+        </body>
+    </opml>"""
+
+    assert parse_opml(content) == ["https://www.nu.nl/rss/Algemeen", "https://feeds.feedburner.com/tweakers/mixed"]
+
+
+@pytest.mark.parametrize("content", [b"not xml at all", b"<rss><channel /></rss>"])
+def test_parse_opml_with_invalid_document(content: bytes) -> None:
+    """checks if an invalid document is rejected"""
+    with pytest.raises(ValueError):
+        parse_opml(content)
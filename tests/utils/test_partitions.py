@@ -0,0 +1,35 @@
+"""test partitions"""
+from unittest.mock import MagicMock
+import pytest
+
+from sendcloud.utils.partitions import create_postings_partitions, ensure_postings_partitions
+from sendcloud.utils.partitions import postings_partitions_modulus
+
+
+def test_create_missing_postings_partitions() -> None:
+    """check if only the missing hash partitions are created with the modulus of the table"""
+    connection = MagicMock()
+    connection.execute.return_value = [("postings_p0", 10), ("postings_p2", 20)]
+
+    assert create_postings_partitions(connection, 4) == ["postings_p1", "postings_p3"]
+    statements = [str(call.args[0]) for call in connection.execute.call_args_list[1:]]
+    assert statements == [
+        "CREATE TABLE postings_p1 PARTITION OF postings FOR VALUES WITH (MODULUS 4, REMAINDER 1)",
+        "CREATE TABLE postings_p3 PARTITION OF postings FOR VALUES WITH (MODULUS 4, REMAINDER 3)",
+    ]
+
+
+def test_postings_partitions_modulus() -> None:
+    """check if the modulus is read from the bounds of the existing partitions"""
+    connection = MagicMock()
+    connection.execute.return_value.scalars.return_value = ["FOR VALUES WITH (modulus 32, remainder 5)"]
+    assert postings_partitions_modulus(connection) == 32
+
+    connection.execute.return_value.scalars.return_value = []
+    assert postings_partitions_modulus(connection) is None
+
+
+@pytest.mark.asyncio
+async def test_ensure_postings_partitions_without_postgres() -> None:
+    """check if nothing is done on the databases which do not support partitioning"""
+    assert await ensure_postings_partitions() == {}
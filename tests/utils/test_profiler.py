@@ -0,0 +1,81 @@
+"""test profiler"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+import pytest
+from fastapi.testclient import TestClient
+
+from sendcloud.apps.api_service import app
+from sendcloud.utils import SamplingProfiler, profiled, settings, setup_tests
+from sendcloud.utils.scheduler import Scheduler
+
+fastapi_client = TestClient(app)
+
+
+def busy_function(seconds: float) -> None:
+    """keeps the thread busy"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+def test_profiled_writes_collapsed_stacks(tmp_path: Path) -> None:
+    """check if the stacks of the profiled thread are written as collapsed stacks"""
+    with patch.object(settings, "profile_dir", str(tmp_path)), patch.object(settings, "profile_format", "collapsed"):
+        with profiled("busy") as profiler:
+            busy_function(0.1)
+
+    assert profiler.path.endswith(".collapsed")
+    lines = Path(profiler.path).read_text(encoding="utf-8").splitlines()
+    assert any("test_profiler.busy_function" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_speedscope_profile(tmp_path: Path) -> None:
+    """check if the samples are exported in the sampled format of speedscope"""
+    with patch.object(settings, "profile_dir", str(tmp_path)):
+        profiler = SamplingProfiler("busy", interval=0.001).start()
+        busy_function(0.05)
+        profiler.stop()
+        profile = json.loads(Path(profiler.write()).read_text(encoding="utf-8"))
+
+    frames = profile["shared"]["frames"]
+    sampled = profile["profiles"][0]
+    assert sampled["type"] == "sampled"
+    assert len(sampled["samples"]) == len(sampled["weights"]) > 0
+    assert any(frames[index]["name"].endswith("busy_function") for stack in sampled["samples"] for index in stack)
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_profile_request_with_token(tmp_path: Path) -> None:
+    """check if only the requests with the token are profiled"""
+    with patch.object(settings, "profile_dir", str(tmp_path)), patch.object(settings, "profile_token", "secret"):
+        result = fastapi_client.get("/v1.0/users/", headers={"X-Profile": "secret"})
+        assert result.status_code == 200
+        assert os.listdir(tmp_path) == [result.headers["X-Profile-File"]]
+
+        result = fastapi_client.get("/v1.0/users/", headers={"X-Profile": "wrong"})
+        assert "X-Profile-File" not in result.headers
+        assert len(os.listdir(tmp_path)) == 1
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.utils.scheduler.Task.start", return_value=MagicMock())
+@setup_tests()
+async def test_profile_next_scheduler_cycle(_: MagicMock, tmp_path: Path) -> None:
+    """check if the cycle after profile_next_cycle is profiled"""
+    scheduler = Scheduler(300, asyncio.get_running_loop())
+    scheduler.profile_next_cycle()
+    with patch.object(settings, "profile_dir", str(tmp_path)), patch(
+        "sendcloud.utils.scheduler.sleep", side_effect=asyncio.CancelledError
+    ):
+        with pytest.raises(asyncio.CancelledError):
+            await scheduler.run()
+        await asyncio.sleep(0.05)
+
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].endswith(f"scheduler-cycle-{os.getpid()}.speedscope.json")
@@ -9,9 +9,10 @@ from sqlalchemy.ext.asyncio import async_scoped_session
 
 from sendcloud.utils import get_session
 from sendcloud.utils import setup_tests
-from sendcloud.models import Feed
-from sendcloud.utils.scheduler import Task, Scheduler
-from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.models import Feed, User
+from sendcloud.utils.scheduler import Task, Scheduler, FeedJobRunner, RetentionRunner
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate, FeedJobKind, RetentionStats
+from sendcloud.services import jobs_services
 
 
 async def mock_coroutine(error: bool = False) -> None:
@@ -108,7 +109,7 @@ async def test_task_on_failure() -> None:
         retrieved_feed = (await session.execute(retrieved_feed_stmt)).one_or_none()
 
         assert retrieved_feed is not None
-        assert not retrieved_feed[-1]
+        assert not retrieved_feed.active
 
 
 @pytest.mark.asyncio
@@ -196,7 +197,7 @@ async def test_task_on_success_after_retry() -> None:
         retrieved_feed = (await session.execute(retrieved_feed_stmt)).one_or_none()
 
         assert retrieved_feed is not None
-        assert retrieved_feed[-1]
+        assert retrieved_feed.active
         assert retrieved_feed[2] == "should be changed to me!"
 
 
@@ -273,3 +274,41 @@ async def test_task_start_can_retry_on_failure_no_success(sleep_mock: MagicMock,
     assert __on_task_failure.call_count == 1
     assert sleep_mock.call_count == 3
     __on_task_success.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.services.feeds_services.force_update_feed", return_value=False)
+@patch("sendcloud.services.feeds_services.follow_new_feed", return_value=MagicMock())
+@setup_tests()
+async def test_feed_job_runner(follow_mock: MagicMock, force_update_mock: MagicMock) -> None:
+    """Check if the job runner runs the claimed jobs and stores their results"""
+    session: async_scoped_session
+    async with get_session() as session:
+        session.add(User(username="test_username"))
+        await session.commit()
+        follow_job = await jobs_services.enqueue_feed_job(FeedJobKind.FOLLOW, "test_username", "link1", session)
+        update_job = await jobs_services.enqueue_feed_job(FeedJobKind.FORCE_UPDATE, "test_username", "link2", session)
+    assert follow_job is not None and update_job is not None
+
+    runner = FeedJobRunner(poll_interval=0.01, batch_size=10)
+    assert await runner.run_once() == 2
+    assert await runner.run_once() == 0
+
+    follow_mock.assert_called_once()
+    assert follow_mock.call_args.args[:2] == ("test_username", "link1")
+    force_update_mock.assert_called_once()
+    async with get_session() as session:
+        statuses = (await session.execute(text("select job_id, status from feed_jobs order by pk"))).all()
+    assert statuses == [(follow_job.job_id, "completed"), (update_job.job_id, "failed")]
+
+
+@pytest.mark.asyncio
+@patch("sendcloud.utils.scheduler.sleep", side_effect=mock_coroutine(True))
+@patch("sendcloud.services.retention_services.apply_retention", return_value=RetentionStats(pruned=3))
+async def test_retention_runner(apply_mock: MagicMock, sleep_mock: MagicMock) -> None:
+    """Check if the retention runner runs the retention and sleeps for the interval"""
+    assert (await RetentionRunner.run_once()).pruned == 3
+    with pytest.raises(Exception):
+        await RetentionRunner(datetime.timedelta(minutes=1)).run()
+    assert apply_mock.call_count == 2
+    sleep_mock.assert_called_once_with(60)
@@ -0,0 +1,59 @@
+"""tests for single flight module"""
+import asyncio
+from datetime import timedelta
+import pytest
+
+from sendcloud.utils import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_the_call() -> None:
+    """checks if the concurrent calls and the calls right after them share one execution"""
+    calls = []
+
+    async def call() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    flight: SingleFlight[int] = SingleFlight(timedelta(seconds=60))
+    assert await asyncio.gather(*[flight.run("key", call) for _ in range(10)]) == [1] * 10
+    assert await flight.run("key", call) == 1, "the result is kept after the call"
+    assert await flight.run("other_key", call) == 2
+
+    flight.clear()
+    assert await flight.run("key", call) == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_does_not_keep_exceptions() -> None:
+    """checks if an exception reaches every waiting caller but the next call runs again"""
+    calls = []
+
+    async def call() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise ValueError("failed")
+        return len(calls)
+
+    flight: SingleFlight[int] = SingleFlight(timedelta(seconds=60))
+    results = await asyncio.gather(*[flight.run("key", call) for _ in range(3)], return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert await flight.run("key", call) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_a_cancelled_caller() -> None:
+    """checks if cancelling one caller does not cancel the call for the others"""
+
+    async def call() -> str:
+        await asyncio.sleep(0.01)
+        return "done"
+
+    flight: SingleFlight[str] = SingleFlight(timedelta(0))
+    first = asyncio.ensure_future(flight.run("key", call))
+    second = asyncio.ensure_future(flight.run("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
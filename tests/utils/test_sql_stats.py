@@ -0,0 +1,66 @@
+"""test sql stats"""
+import logging
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from sendcloud.apps.api_service import app
+from sendcloud.models import User
+from sendcloud.utils import get_session, settings, setup_tests, statement_shape, track_queries, log_query_stats
+
+fastapi_client = TestClient(app)
+
+
+def test_statement_shape() -> None:
+    """check if the statements which only differ by their values share a shape"""
+    assert statement_shape("SELECT *\n  FROM users WHERE pk IN (?, ?, ?)") == "SELECT * FROM users WHERE pk IN (?)"
+    assert statement_shape("SELECT * FROM users WHERE pk IN ($1, $2)") == "SELECT * FROM users WHERE pk IN (?)"
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_track_queries_flags_repeated_statements(caplog: pytest.LogCaptureFixture) -> None:
+    """check if the statements are counted and a statement run once per user is logged as a likely N+1 query"""
+    async with get_session() as session:
+        session.add_all([User(username=f"user{index}") for index in range(5)])
+        await session.commit()
+
+    with patch.object(settings, "sql_stats", True), caplog.at_level(logging.DEBUG, "sendcloud.utils.sql_stats"):
+        with track_queries() as stats:
+            async with get_session() as session:
+                for index in range(5):
+                    await session.execute(select(User).where(User.username == f"user{index}"))
+        log_query_stats("users", stats)
+
+    assert stats.count == 5
+    assert stats.seconds >= stats.slowest_seconds > 0
+    assert stats.slowest_statement.startswith("SELECT users.pk")
+    assert list(stats.repeated_shapes().values()) == [5]
+    assert stats.headers()["X-DB-N-Plus-One"] == "1"
+    assert caplog.records[-1].levelno == logging.WARNING
+    assert '"queries": 5' in caplog.records[-1].getMessage()
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_track_queries_is_disabled_by_default() -> None:
+    """check if nothing is collected unless settings.sql_stats is set"""
+    with track_queries() as stats:
+        async with get_session() as session:
+            await session.execute(select(User))
+    assert stats.count == 0
+
+
+@pytest.mark.asyncio
+@setup_tests()
+async def test_query_stats_headers() -> None:
+    """check if the stats of a request are returned in its debug headers"""
+    with patch.object(settings, "sql_stats", True), patch.object(settings, "sql_stats_headers", True):
+        result = fastapi_client.get("/v1.0/users/")
+    assert result.status_code == 200
+    assert int(result.headers["X-DB-Query-Count"]) >= 1
+    assert float(result.headers["X-DB-Time-Ms"]) >= float(result.headers["X-DB-Slowest-Ms"]) > 0
+    assert result.headers["X-DB-N-Plus-One"] == "0"
+
+    assert "X-DB-Query-Count" not in fastapi_client.get("/v1.0/users/").headers
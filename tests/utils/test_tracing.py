@@ -0,0 +1,116 @@
+"""test tracing"""
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
+import pytest
+
+from sendcloud.models import User
+from sendcloud.schemas import FeedItemCreate, PostingItemCreate
+from sendcloud.services import feeds_services as feed_services
+from sendcloud.utils import FileExporter, InMemoryExporter, get_exporter, set_exporter, settings, setup_tests, span
+from sendcloud.utils import get_session, install_trace_log_records
+
+
+@pytest.fixture(name="exporter")
+def exporter_fixture() -> Iterator[InMemoryExporter]:
+    """records the spans in memory while tracing is on"""
+    previous, exporter = get_exporter(), InMemoryExporter()
+    set_exporter(exporter)
+    with patch.object(settings, "tracing", True):
+        yield exporter
+    set_exporter(previous)
+
+
+def test_nested_spans(exporter: InMemoryExporter) -> None:
+    """check if the nested spans share the trace of their parent and a failed span is marked"""
+    with span("parent", link="feed_link") as parent:
+        with span("child") as child:
+            child.set_attribute("entries", 3)
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("failed")
+
+    assert [item.name for item in exporter.trace(parent.trace_id)] == ["child", "failing", "parent"]
+    failing = exporter.spans[1]
+    assert child.parent_id == failing.parent_id == parent.span_id
+    assert child.attributes == {"entries": 3} and parent.attributes == {"link": "feed_link"}
+    assert (failing.status, failing.attributes["error"]) == ("error", "ValueError")
+    assert parent.duration_ms is not None and child.duration_ms is not None
+    assert parent.duration_ms >= child.duration_ms
+
+
+def test_spans_are_not_recorded_by_default() -> None:
+    """check if nothing is exported unless tracing is set"""
+    exporter = InMemoryExporter()
+    previous = get_exporter()
+    set_exporter(exporter)
+    with span("step"):
+        pass
+    set_exporter(previous)
+    assert not exporter.spans
+
+
+def test_file_exporter(tmp_path: Path, exporter: InMemoryExporter) -> None:
+    """check if the spans are appended to the file as JSON lines"""
+    set_exporter(FileExporter(str(tmp_path / "spans.jsonl")))
+    with span("parent"):
+        with span("child", bytes=10):
+            pass
+
+    lines = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [line["name"] for line in lines] == ["child", "parent"]
+    assert lines[0]["parent_id"] == lines[1]["span_id"] and lines[0]["attributes"] == {"bytes": 10}
+    assert not exporter.spans
+
+
+def test_trace_ids_in_logs(exporter: InMemoryExporter, caplog: pytest.LogCaptureFixture) -> None:
+    """check if the log records carry the trace of the running span"""
+    install_trace_log_records()
+    with caplog.at_level(logging.INFO):
+        with span("step") as step:
+            logging.getLogger("sendcloud").info("inside")
+        logging.getLogger("sendcloud").info("outside")
+
+    # the attributes are set by the log record factory
+    assert [(getattr(record, "trace_id"), getattr(record, "span_id")) for record in caplog.records] == [
+        (step.trace_id, step.span_id),
+        ("-", "-"),
+    ]
+    assert exporter.spans
+
+
+@pytest.mark.asyncio
+@patch(
+    "sendcloud.services.feeds_services.fetch_feed",
+    return_value=(
+        FeedItemCreate(link="feed_link", title="t", lang="en", copyright_text="-", description="-", category="-"),
+        [PostingItemCreate(link="posting_link", title="t", description="-", author="-", published_at=datetime.now())],
+    ),
+)
+@setup_tests()
+async def test_follow_trace(_, exporter: InMemoryExporter) -> None:
+    """check if the steps of a follow are spans of the same trace"""
+    async with get_session() as session:
+        session.add(User(username="test_username"))
+        await session.commit()
+        with span("request") as request:
+            assert await feed_services.follow_new_feed("test_username", "feed_link", session) is not None
+
+    spans = {item.name: item for item in exporter.trace(request.trace_id)}
+    assert list(spans) == [
+        "get_user",
+        "lookup_feed",
+        "upsert_feed",
+        "refresh_feed",
+        "get_feed_by_pk",
+        "insert_follow",
+        "follow_new_feed",
+        "request",
+    ]
+    assert spans["upsert_feed"].parent_id == spans["refresh_feed"].span_id
+    assert spans["refresh_feed"].parent_id == spans["follow_new_feed"].span_id
+    assert spans["upsert_feed"].attributes == {"link": "feed_link", "entries": 1}
+    assert spans["follow_new_feed"].attributes["stored"] is False
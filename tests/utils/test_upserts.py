@@ -0,0 +1,29 @@
+"""test upserts"""
+from unittest.mock import MagicMock
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from sendcloud.models import Posting, user_feed
+from sendcloud.utils import get_session, conflict_target, upsert_insert
+
+
+@pytest.mark.asyncio
+async def test_conflict_target_of_sqlite() -> None:
+    """check if a constraint is replaced by its columns on SQLite"""
+    async with get_session() as session:
+        assert conflict_target(Posting, "postings_link_hash_key", session) == {
+            "index_elements": ["link_hash", "feed_id"]
+        }
+        assert sorted(conflict_target(user_feed, "user_feed_pkey", session)["index_elements"]) == ["feed_pk", "user_pk"]
+        assert upsert_insert(user_feed, session).__module__ == "sqlalchemy.dialects.sqlite.dml"
+        with pytest.raises(ValueError):
+            conflict_target(Posting, "postings_link_key", session)
+
+
+def test_conflict_target_of_postgres() -> None:
+    """check if the constraint is kept on Postgres"""
+    session = MagicMock()
+    session.bind.dialect = postgresql.dialect()
+    stmt = upsert_insert(user_feed, session).values(user_pk=1, feed_pk=2)
+    stmt = stmt.on_conflict_do_nothing(**conflict_target(user_feed, "user_feed_pkey", session))
+    assert "ON CONFLICT ON CONSTRAINT user_feed_pkey DO NOTHING" in str(stmt.compile(dialect=postgresql.dialect()))